@@ -1,12 +1,21 @@
+"""Fill in resource coordinates: GPT extracts a location, Nominatim geocodes it.
+
+With `LLM_CACHE` configured (see `app.llm_cache`), extractions are cached,
+so re-running on unchanged descriptions makes no model calls.
+
+Usage:
+    LLM_CACHE=sqlite python -m app.add_lat_lon_resources
+"""
+
 import os
 import time
 import json
 import psycopg
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
-import openai
 
-openai.api_key = os.environ.get("SECRET_KEY")
+from app import llm_client
+
 geolocator = Nominatim(user_agent="resource_populator")
 
 EXTRACTION_PROMPT = """Extract location info from this resource description.
@@ -20,8 +29,9 @@ Return JSON only:
 Description: {}"""
 
 def extract_location_with_gpt(description: str) -> dict:
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",
+    response = llm_client.create(
+        "location_extract",
+        cache="description_location:v1",
         messages=[{"role": "user", "content": EXTRACTION_PROMPT.format(description)}],
         response_format={"type": "json_object"},
     )
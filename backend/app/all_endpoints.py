@@ -4,6 +4,7 @@ This module wires routes, background scheduler jobs, and socket event handlers.
 """
 
 import asyncio
+import concurrent.futures
 import os
 import threading
 import time
@@ -11,27 +12,42 @@ import secrets
 
 from fastapi import FastAPI, Request, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field 
+from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import threading
 import time
 import socketio
-from app.phi_scrubber import PHIScrubber
 
+from app import llm_client, metrics, model_router
 from app.audit_logger import AuditLogger
-from app.submodules import construct_response
-from app.process_profiles import get_all_outreach, get_all_service_users
+from app.cancellation import CancellationToken, GenerationCancelled
+from app.generation_jobs import enqueue_job, get_job, request_cancel
+from app.generation_scheduler import GenerationScheduler, QueueFullError
+from app.session_store import create_session_store
+from app.socketio_manager import create_client_manager
+from app.streaming import TextStream
+from app.triage import classify_priority, PRIORITY_ROUTINE
+from app.generation import (
+    iter_chunk_deltas_async,
+    prepare_generation,
+    record_generation,
+    run_generation,
+)
+from app.sidebar import schedule_update_async
+from app.submodules import construct_response_async
+from app.eligibility import get_engine as get_eligibility_engine
+from app.process_profiles import get_all_outreach, get_all_service_users, get_service_user_households
 from app.login import get_current_user, UserData
 from app.login import router as auth_router
 from app.audit_viewer import router as audit_router
 
-from typing import Optional, Union
+from typing import List, Optional, Union
 import psycopg
 
 from app.database import (
-    update_conversation, 
     add_new_service_user, 
     fetch_service_user_checkins, 
     edit_service_user_outreach,
@@ -44,7 +60,6 @@ from app.database import (
 )
 from app.generate_outreach import generate_check_ins_rule_based
 from app.notifications import notification_job
-import openai 
 
 # Environment configuration
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -53,6 +68,13 @@ os.environ["MKL_DEBUG_CPU_TYPE"] = "5"
 
 scheduler = BackgroundScheduler(timezone='America/New_York')
 scheduler.add_job(notification_job, CronTrigger(minute='*/15'), id='send_notifications')
+# Only worth probing when a route can fail over to another endpoint
+if model_router.get_router().needs_health_checks() and model_router.HEALTH_CHECK_SECONDS > 0:
+    scheduler.add_job(
+        llm_client.check_model_health,
+        IntervalTrigger(seconds=model_router.HEALTH_CHECK_SECONDS),
+        id='model_health',
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -155,6 +177,12 @@ async def root():
 async def health():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process latency and counter metrics (TTFT, generation time, ...)."""
+    return metrics.snapshot()
+
 def warmup_models():
     """Background task to load embeddings after server starts"""
     try:
@@ -176,67 +204,6 @@ class NewServiceUser(BaseModel):
     followUpMessage: str
     username: str
 
-class SidebarItem(BaseModel):
-    title: str = Field(description="A short, 3-5 word title for the goal or resource.")
-    details: str = Field(description="A single actionable sentence describing the next step or key info.")
-
-class SidebarState(BaseModel):
-    goals: list[SidebarItem] = Field(description="Current, active goals based on the ENTIRE conversation.")
-    resources: list[SidebarItem] = Field(description="All relevant resources mentioned so far.")
-
-def generate_sidebar_update(all_messages, sid, loop):
-    """
-    Analyzes the FULL conversation to produce a cumulative, detailed sidebar.
-    """
-    try:
-        # 1. Use the FULL history (filter out system/tool messages to save some tokens if you want)
-        # We keep 'user' and 'assistant' to understand the flow.
-        context_messages = [
-            {"role": m["role"], "content": m["content"]}
-            for m in all_messages 
-            if m["role"] in ["user", "assistant"]
-        ]
-
-        system_prompt = (
-            "You are the state manager for a peer support dashboard. "
-            "Analyze the ENTIRE conversation history provided below.\n"
-            "1. Identify 3-5 'Active Goals'. These should be tasks the user is currently working on. "
-            "   - If a goal was completed or abandoned in the chat, DO NOT include it.\n"
-            "   - Provide a 'details' sentence for each (e.g., 'Check eligibility for SNAP, TANF, or Medicaid').\n"
-            "2. Identify 'Resources'. These are organizations, tools, or websites mentioned by the assistant. "
-            "   - Provide a 'details' sentence (e.g., 'Located at 123 Main St, open 9-5')."
-        )
-
-        messages = [{"role": "system", "content": system_prompt}] + context_messages
-
-        # 2. Call GPT-4o-mini
-        client = openai.Client(api_key=os.environ.get("SECRET_KEY"))
-        
-        completion = client.beta.chat.completions.parse(
-            model="gpt-4o-mini", 
-            messages=messages,
-            response_format=SidebarState
-        )
-        
-        state_data = completion.choices[0].message.parsed
-        
-        # 3. Serialize to dict for JSON transmission
-        # We need to convert Pydantic models to standard dicts for Socket.IO
-        update_payload = {
-            "goals": [item.model_dump() for item in state_data.goals],
-            "resources": [item.model_dump() for item in state_data.resources]
-        }
-
-        print(f"[Sidecar] Emitting update for {sid}: {len(state_data.goals)} goals")
-
-        asyncio.run_coroutine_threadsafe(
-            sio.emit("goals_update", update_payload, room=sid),
-            loop
-        )
-
-    except Exception as e:
-        print(f"[Sidecar] Error: {e}")
-        
 @app.get("/service_user_list/")
 async def service_user_list(current_user: UserData = Depends(get_current_user), req: Request = None):
     result = get_all_service_users(current_user.username, current_user.organization)
@@ -338,41 +305,27 @@ async def generate_check_ins_endpoint(request: GenerateCheckInsRequest):
 
 # Handle Socket Messages
 
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+# SOCKETIO_MESSAGE_QUEUE selects a pub/sub manager so several processes can
+# serve sockets and emit to each other's clients (see app.socketio_manager)
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    client_manager=create_client_manager(),
+)
 socket_app = socketio.ASGIApp(sio, other_asgi_app=app)
 
-# Utility functions
-def process_raw_chunk(raw_chunk: str) -> str:
-    """Remove 'data:' prefix and clean chunk."""
-    if raw_chunk.startswith("data:"):
-        return raw_chunk[len("data: "):].replace('\n', '')
-    return raw_chunk.strip()
+def _room_sender(room):
+    """`send(event, payload)` coroutine factory for a `TextStream`."""
+    async def send(event, payload):
+        await sio.emit(event, payload, room=room)
+    return send
 
-def accumulate_chunks(generator):
-    """
-    Accumulates and processes streaming text chunks from a generator.
-    
-    Yields progressively accumulated text with proper formatting.
-    """
-    accumulated = ""
-    for raw_chunk in generator:
-        token = process_raw_chunk(raw_chunk)
-        
-        if token == "[DONE]":
-            continue
-            
-        if token.startswith('#'):
-            accumulated += '\n' + token
-        elif token.endswith('<br/>'):
-            accumulated += token + '\n'
-        elif token == '<br/><br/>':
-            accumulated += '<br/>'
-        else:
-            accumulated += token
-            
-        yield accumulated
+async def _close_stream(stream):
+    """Close a `TextStream` and wait for its final emit, keeping event order."""
+    future = stream.close()
+    if future is not None:
+        await asyncio.wrap_future(future)
 
-# Background streaming
 def _background_stream(
     sid, 
     text, 
@@ -383,106 +336,124 @@ def _background_stream(
     metadata, 
     service_user_id,
     version,
+    started_at,
+    generation,
 ):
-    """Runs construct_response in its own OS thread."""
+    """Runs construct_response in its own OS thread.
+
+    `started_at` is the `time.perf_counter()` value taken when the request
+    arrived, so time-to-first-token includes scrubbing and tool turns.
+    `generation` (an `ActiveGeneration`) carries the cancel token, which stops
+    the pipeline, the emit loop and the sidebar update, and the `TextStream`
+    that emits to the generation's room. The answer is appended to the
+    session store under `metadata['conversation_id']`.
+    """
+    generation.complete_payload = run_generation(
+        text, previous_text, model, organization, metadata, service_user_id, version,
+        generation.id, generation.token, generation.stream, _room_sender(generation.id),
+        loop, session_store, started_at,
+    )
+
+# Bounded pool for blocking work (PHI scrubbing, DB writes) in the async path
+_BLOCKING_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BLOCKING_IO_WORKERS", 8)),
+    thread_name_prefix="blocking-io",
+)
+
+async def _async_stream(
+    sid,
+    text,
+    previous_text,
+    model,
+    organization,
+    metadata,
+    service_user_id,
+    version,
+    started_at,
+    generation,
+):
+    """Asyncio counterpart of `_background_stream` (GENERATION_MODE=async).
+
+    Runs as a task on the event loop: LLM calls use the async OpenAI client,
+    emits are awaited directly, and blocking helpers run on a bounded executor
+    instead of one OS thread per request.
+    """
+    loop = asyncio.get_running_loop()
+    cancel_token = generation.token
+    stream = generation.stream
     accumulated_text = ""
+    ttft = None
 
     try:
-        # Log GPT request
-        scrubbed_text = PHIScrubber.scrub_for_gpt(
-            text, 
-            patient_id=service_user_id
+        scrubbed_text, scrubbed_history = await loop.run_in_executor(
+            _BLOCKING_EXECUTOR,
+            prepare_generation, text, previous_text, metadata, service_user_id,
         )
-        
-        # Also scrub conversation history
-        scrubbed_history = []
-        for msg in previous_text:
-            if isinstance(msg, dict) and 'content' in msg:
-                scrubbed_content = PHIScrubber.scrub_for_gpt(
-                    msg['content'],
-                    patient_id=service_user_id
-                )
-                scrubbed_history.append({
-                    'role': msg['role'],
-                    'content': scrubbed_content
-                })
-            else:
-                scrubbed_history.append(msg)
-        
-        # Log what was scrubbed
-        print(f"[PHI SCRUB] Original length: {len(text)}, Scrubbed length: {len(scrubbed_text)}")
-        if len(text) != len(scrubbed_text):
-            print("[PHI SCRUB] Scrubbed {}".format(scrubbed_text))
-
-        # Log GPT request with scrubbed flag
-        AuditLogger.log_gpt_request(
-            username=metadata.get('username'),
-            user_role='provider',
-            patient_id=service_user_id,
-            conversation_id=metadata.get('conversation_id'),
-            prompt_length=len(scrubbed_text),
-            response_length=0
-        )
-        
-        # Send scrubbed content to GPT
-        gen = construct_response(
-            scrubbed_text,  # Use scrubbed text
-            scrubbed_history,  # Use scrubbed history
-            model, 
+
+        gen = construct_response_async(
+            scrubbed_text,
+            scrubbed_history,
+            model,
             organization,
             version,
+            cancel_token,
+            metadata.get('conversation_id'),
         )
-        
-        for accumulated_text in accumulate_chunks(gen):
-            asyncio.run_coroutine_threadsafe(
-                sio.emit("generation_update", {"chunk": accumulated_text}, room=sid),
-                loop
-            )
-            time.sleep(0.1)
-        
-        # Update conversation in database
-        update_conversation(
-            metadata,
-            [
-                {'role': 'user', 'content': text},
-                {'role': 'system', 'content': accumulated_text}
-            ],
-            service_user_id
+
+        async for delta in iter_chunk_deltas_async(gen):
+            cancel_token.check()
+            if ttft is None:
+                ttft = time.perf_counter() - started_at
+                metrics.observe("generation_ttft_seconds", ttft, version=version)
+                print(f"[AsyncStream] TTFT {ttft:.2f}s for {sid}")
+            stream.push(delta)
+
+        await _close_stream(stream)
+        accumulated_text = stream.text
+
+        await loop.run_in_executor(
+            _BLOCKING_EXECUTOR,
+            record_generation, text, accumulated_text, metadata, service_user_id,
         )
-        
-        # Log completion
-        AuditLogger.log_gpt_request(
-            username=metadata.get('username'),
-            user_role='provider',
-            patient_id=service_user_id,
-            conversation_id=metadata.get('conversation_id'),
-            prompt_length=len(text),
-            response_length=len(accumulated_text)
+        answer = {"role": "assistant", "content": accumulated_text}
+        await loop.run_in_executor(
+            _BLOCKING_EXECUTOR, session_store.append, metadata['conversation_id'], answer
+        )
+        print("[AsyncStream] Scheduling sidebar update...")
+        schedule_update_async(
+            metadata.get('conversation_id'),
+            previous_text + [answer],
+            lambda payload: sio.emit("goals_update", payload, room=generation.id),
+            cancel_token,
         )
-        session_histories[sid].append({"role": "assistant", "content": accumulated_text})
-        print("[Background] Triggering sidebar update...")
-        generate_sidebar_update(session_histories[sid], sid, loop)
+
+    except GenerationCancelled as e:
+        print(f"[AsyncStream] {e} for {sid}")
+        metrics.increment("generations_cancelled_total", reason=e.reason)
+        await _close_stream(stream)
+        accumulated_text = stream.text
+        if e.reason == "stop" and accumulated_text:
+            # Keep what the user already saw so follow-ups have context
+            await loop.run_in_executor(
+                _BLOCKING_EXECUTOR, session_store.append, metadata['conversation_id'],
+                {"role": "assistant", "content": accumulated_text},
+            )
 
     except Exception as e:
-        print(f"[BackgroundStream] Error: {e}")
-        asyncio.run_coroutine_threadsafe(
-            sio.emit(
-                "generation_update",
-                {"chunk": f"Sorry, something went wrong: {e}"},
-                room=sid
-            ),
-            loop
-        )
+        print(f"[AsyncStream] Error: {e}")
+        await asyncio.wrap_future(stream.replace(f"Sorry, something went wrong: {e}"))
 
     finally:
-        asyncio.run_coroutine_threadsafe(
-            sio.emit(
-                "generation_complete", 
-                {"message": "Response generation complete."}, 
-                room=sid
-            ),
-            loop
+        metrics.observe(
+            "generation_total_seconds", time.perf_counter() - started_at, version=version
         )
+        generation.complete_payload = {
+            "message": "Response generation complete.",
+            "generation_id": generation.id,
+            "ttft_ms": round(ttft * 1000) if ttft is not None else None,
+            "cancelled": cancel_token.cancelled,
+        }
+        await sio.emit("generation_complete", generation.complete_payload, room=generation.id)
 
 # Socket.IO events
 @sio.event
@@ -533,17 +504,172 @@ def submit_feedback(feedback: FeedbackRequest):
 @sio.event
 async def disconnect(sid):
     print(f"[Socket.IO] Client disconnected: {sid}")
+    generation_scheduler.cancel_waiting(sid)
+    sid_conversations.pop(sid, None)
 
-session_histories = {}  # global dict: sid -> list of messages
+    if sid in worker_jobs:
+        # Same grace period for jobs running on generation workers
+        asyncio.get_running_loop().call_later(
+            max(RESUME_GRACE_SECONDS, 0), _cancel_job_if_not_resumed, sid, worker_jobs[sid]
+        )
+
+    generation = active_generations.get(sid)
+    if generation is None:
+        return
+    if RESUME_GRACE_SECONDS <= 0:
+        cancel_generation(sid, "disconnect")
+        return
+    # Keep generating for a while so the client can resume_generation after
+    # reconnecting; cancel if it does not come back in time.
+    generation.grace_handle = asyncio.get_running_loop().call_later(
+        RESUME_GRACE_SECONDS, _cancel_if_not_resumed, generation
+    )
+
+# Chat histories by conversation id (in-memory LRU/TTL or shared Postgres)
+session_store = create_session_store()
+
+# "thread" runs each generation in its own OS thread; "async" runs it as a
+# task on the event loop with the async OpenAI client; "worker" queues it in
+# the generation_jobs table for `app.generation_worker` processes.
+GENERATION_MODE = os.environ.get("GENERATION_MODE", "thread").lower()
+_generation_tasks = set()
+worker_jobs = {}  # sid -> id of the latest job it enqueued (GENERATION_MODE=worker)
+# sid -> conversation ids this socket has generated in; reset_session only
+# clears those, so a socket cannot wipe another conversation's history
+sid_conversations = {}
+
+# Upper bound on a single generation's wall time, after which it is cancelled
+GENERATION_DEADLINE_SECONDS = float(os.environ.get("GENERATION_DEADLINE_SECONDS", 300))
+# How long a generation survives its client disconnecting, and how long a
+# finished one stays available for resume_generation
+RESUME_GRACE_SECONDS = float(os.environ.get("RESUME_GRACE_SECONDS", 30))
+
+class ActiveGeneration:
+    """A generation's id, owning socket, cancel token and replayable stream.
+
+    Emits go to a Socket.IO room named after the generation id, so a client
+    that reconnects with a new sid can join it and continue where it left off.
+    """
+
+    def __init__(self, generation_id, sid, token, stream):
+        self.id = generation_id
+        self.sid = sid
+        self.token = token
+        self.stream = stream
+        self.grace_handle = None
+        self.complete_payload = None  # set when the generation finishes
+
+active_generations = {}  # sid -> ActiveGeneration running for that socket
+resumable_generations = {}  # generation id -> ActiveGeneration (running or recently finished)
+
+def cancel_generation(sid, reason):
+    """Cancel the running generation for a socket, if there is one."""
+    generation = active_generations.get(sid)
+    if generation is not None and not generation.token.cancelled:
+        print(f"[Socket.IO] Cancelling generation for {sid}: {reason}")
+        generation.token.cancel(reason)
+    if sid in worker_jobs:
+        # Picked up at the worker's next heartbeat; no-op once the job is done
+        _BLOCKING_EXECUTOR.submit(request_cancel, worker_jobs[sid], reason)
+
+def _cancel_job_if_not_resumed(sid, job_id):
+    """Grace period expired for a worker job; cancel unless another sid took it."""
+    if worker_jobs.get(sid) == job_id:
+        cancel_generation(sid, "disconnect")
+        del worker_jobs[sid]
+
+def _cancel_if_not_resumed(generation):
+    """Grace period expired without the client resuming: stop generating."""
+    generation.grace_handle = None
+    cancel_generation(generation.sid, "disconnect")
+
+async def _emit_queue_position(ticket, position, queue_length):
+    """Tell a waiting client where its message is in the generation queue."""
+    await sio.emit(
+        "generation_queued",
+        {"position": position, "queue_length": queue_length},
+        room=ticket.sid,
+    )
+
+# Caps concurrent generations and queues the rest fairly per org and user
+generation_scheduler = GenerationScheduler(
+    max_concurrent=int(os.environ.get("GENERATION_MAX_CONCURRENT", 8)),
+    max_queue=int(os.environ.get("GENERATION_MAX_QUEUE", 100)),
+    max_queued_per_user=int(os.environ.get("GENERATION_MAX_QUEUED_PER_USER", 3)),
+    reserved_priority_slots=int(os.environ.get("GENERATION_RESERVED_PRIORITY_SLOTS", 2)),
+    on_queue_position=_emit_queue_position,
+)
+
+def _add_user_message(conversation_id, text, new_conversation):
+    """Append the user's message, hydrating an existing conversation first."""
+    session_store.append(
+        conversation_id, {"role": "user", "content": text}, hydrate=not new_conversation
+    )
+
+async def _enqueue_generation(
+    sid, text, model, organization, metadata, service_user_id,
+    version, protocol, priority, new_conversation,
+):
+    """Queue a generation for the worker processes (GENERATION_MODE=worker).
+
+    Workers emit to the room named after the job id, which this socket joins.
+    """
+    loop = asyncio.get_running_loop()
+    conversation_id = metadata['conversation_id']
+    await loop.run_in_executor(
+        _BLOCKING_EXECUTOR, _add_user_message, conversation_id, text, new_conversation
+    )
+    history = await loop.run_in_executor(_BLOCKING_EXECUTOR, session_store.get, conversation_id)
+
+    job_id = secrets.token_hex(8)
+    await sio.enter_room(sid, job_id)
+    payload = {
+        "text": text,
+        "history": history,
+        "model": model,
+        "organization": organization,
+        "metadata": metadata,
+        "service_user_id": service_user_id,
+        "version": version,
+        "protocol": protocol,
+    }
+    try:
+        await loop.run_in_executor(
+            _BLOCKING_EXECUTOR, enqueue_job,
+            job_id, payload, conversation_id, metadata.get('username'), priority,
+        )
+    except Exception as e:
+        print(f"[Jobs] Enqueue failed for {sid}: {e}")
+        await sio.emit("generation_rejected", {
+            "message": "The assistant is unavailable right now. Please try again shortly.",
+            "retry_after": 5,
+        }, room=sid)
+        return
+    worker_jobs[sid] = job_id
+    metrics.increment("generation_jobs_enqueued_total", priority=priority)
+    await sio.emit("generation_started", {"generation_id": job_id}, room=sid)
+
+@app.get("/generation_jobs/{job_id}")
+async def generation_job_status(job_id: str, current_user: UserData = Depends(get_current_user)):
+    """Status of a queued generation job (GENERATION_MODE=worker)."""
+    job = await asyncio.get_running_loop().run_in_executor(_BLOCKING_EXECUTOR, get_job, job_id)
+    if job is None or job["username"] != current_user.username:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = job.pop("result")
+    job["result_length"] = len(result) if result is not None else None
+    return job
+
+@app.get("/generation_queue/")
+async def generation_queue_status():
+    """Current generation concurrency and queue depth."""
+    return generation_scheduler.stats()
 
 @sio.event
 async def start_generation(sid, data):
     """Initiate text generation based on user input."""
+    started_at = time.perf_counter()
     print(f"[Socket.IO] start_generation from {sid} at {time.time()}")
 
-    if sid not in session_histories:
-        session_histories[sid] = []
-
     # Extract request data
     text = data.get("text", "")
     model = data.get("model")
@@ -552,36 +678,116 @@ async def start_generation(sid, data):
     username = data.get("username")
     service_user_id = data.get("service_user_id")
     version = data.get("version", "new")  # Default to "new" if not provided
+    protocol = data.get("protocol")  # "delta" for generation_delta events
     print(f"[Version] Using version: {version}")  # Add this line for debugging
     
     # Generate conversation ID if needed
-    if not conversation_id:
+    new_conversation = not conversation_id
+    if new_conversation:
         conversation_id = secrets.token_hex(16)
         await sio.emit("conversation_id", {"conversation_id": conversation_id}, room=sid)
     
+    sid_conversations.setdefault(sid, set()).add(conversation_id)
+
     metadata = {
         'conversation_id': conversation_id,
         'username': username
     }
        
-    text = data.get("text", "")
-    session_histories[sid].append({"role": "user", "content": text})
+    # Rule-based triage so crisis/urgent messages skip routine work in the queue
+    priority = classify_priority(text)
+    if priority != PRIORITY_ROUTINE:
+        print(f"[Triage] {sid} tagged {priority}")
+
+    if GENERATION_MODE == "worker":
+        await _enqueue_generation(
+            sid, text, model, organization, metadata, service_user_id,
+            version, protocol, priority, new_conversation,
+        )
+        return
 
-    # fetch full conversation
-    all_messages = session_histories[sid]
+    # Wait for a generation slot (fair across orgs and users)
+    try:
+        ticket = await generation_scheduler.acquire(sid, username, organization, priority)
+    except QueueFullError as e:
+        await sio.emit("generation_rejected", {
+            "message": f"{e} Please try again in about {e.retry_after:.0f} seconds.",
+            "retry_after": e.retry_after,
+        }, room=sid)
+        return
+    except asyncio.CancelledError:
+        print(f"[Scheduler] Dropped queued generation for {sid}")
+        metrics.increment("generations_cancelled_total", reason="queued")
+        return
+
+    generation = None
+    handed_off = False
+    try:
+        # Blocking for the Postgres store, so keep it off the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            _BLOCKING_EXECUTOR, _add_user_message, conversation_id, text, new_conversation
+        )
 
-    print(f"Finished goals/resources at {time.time()}")
+        loop = asyncio.get_running_loop()
+        generation_id = secrets.token_hex(8)
+        generation = ActiveGeneration(
+            generation_id,
+            sid,
+            CancellationToken(GENERATION_DEADLINE_SECONDS),
+            TextStream(_room_sender(generation_id), loop, protocol),
+        )
+        active_generations[sid] = generation
+        resumable_generations[generation_id] = generation
+        await sio.enter_room(sid, generation_id)
+        await sio.emit("generation_started", {"generation_id": generation_id}, room=sid)
+
+        def _finish():
+            generation_scheduler.release(ticket)
+            if active_generations.get(generation.sid) is generation:
+                del active_generations[generation.sid]
+            if generation.grace_handle is not None:
+                generation.grace_handle.cancel()
+                generation.grace_handle = None
+            loop.call_later(RESUME_GRACE_SECONDS, resumable_generations.pop, generation_id, None)
+
+        # fetch full conversation
+        all_messages = await loop.run_in_executor(
+            _BLOCKING_EXECUTOR, session_store.get, conversation_id
+        )
 
-    # Start background streaming
-    loop = asyncio.get_running_loop()
-    threading.Thread(
-        target=_background_stream,
-        args=(
-            sid, text, all_messages, model, organization, 
-            loop, metadata, service_user_id, version,
-        ),
-        daemon=True
-    ).start()
+        if GENERATION_MODE == "async":
+            task = asyncio.create_task(_async_stream(
+                sid, text, all_messages, model, organization,
+                metadata, service_user_id, version, started_at, generation,
+            ))
+            # Keep a reference so the task is not garbage collected mid-stream
+            _generation_tasks.add(task)
+            task.add_done_callback(_generation_tasks.discard)
+            task.add_done_callback(lambda _: _finish())
+            handed_off = True
+            return
+
+        # Start background streaming
+        def _run_and_release():
+            try:
+                _background_stream(
+                    sid, text, all_messages, model, organization, 
+                    loop, metadata, service_user_id, version, started_at, generation,
+                )
+            finally:
+                loop.call_soon_threadsafe(_finish)
+
+        threading.Thread(target=_run_and_release, daemon=True).start()
+        handed_off = True
+    finally:
+        if not handed_off:
+            # Setup failed before a task owned the slot, so nothing else will release it
+            print(f"[Scheduler] Generation setup failed for {sid}, releasing slot")
+            generation_scheduler.release(ticket)
+            if generation is not None:
+                if active_generations.get(sid) is generation:
+                    del active_generations[sid]
+                resumable_generations.pop(generation.id, None)
 
 @sio.event
 async def reset_session(sid, data):
@@ -590,13 +796,103 @@ async def reset_session(sid, data):
     print(f"  Reason: {data.get('reason')}")
     print(f"  Previous user: {data.get('previous_service_user_id')}")
     print(f"  New user: {data.get('new_service_user_id')}")
-    
+
+    generation_scheduler.cancel_waiting(sid)
+    cancel_generation(sid, "reset")
+    conversation_id = data.get("conversation_id")
+    if conversation_id:
+        if conversation_id in sid_conversations.get(sid, ()):
+            # Blocking for the Postgres store, so keep it off the event loop
+            await asyncio.get_running_loop().run_in_executor(
+                _BLOCKING_EXECUTOR, session_store.clear, conversation_id
+            )
+            sid_conversations[sid].discard(conversation_id)
+        else:
+            print(f"[Socket.IO] {sid} tried to reset a conversation it does not own; ignored")
+
     await sio.emit("reset_ack", {
         "message": "Session reset.",
         "previous_service_user_id": data.get('previous_service_user_id'),
         "new_service_user_id": data.get('new_service_user_id')
     }, room=sid)
 
+@sio.event
+async def stop_generation(sid, data=None):
+    """Stop the in-flight (or queued) generation for this socket."""
+    generation_scheduler.cancel_waiting(sid)
+    cancel_generation(sid, "stop")
+
+@sio.event
+async def resume_generation(sid, data):
+    """Reattach a reconnected client to a generation it started on another sid.
+
+    Replays the events after `last_seq` from the generation's ring buffer,
+    joins its room for the live remainder. The session history is keyed by
+    conversation id, so it needs no moving.
+    """
+    data = data or {}
+    last_seq = int(data.get("last_seq") or 0)
+    generation = resumable_generations.get(data.get("generation_id"))
+    if generation is None and GENERATION_MODE == "worker" and data.get("generation_id"):
+        await _resume_job(sid, data["generation_id"], last_seq)
+        return
+    if generation is None:
+        await sio.emit("resume_failed", {"generation_id": data.get("generation_id")}, room=sid)
+        return
+
+    old_sid = generation.sid
+    if old_sid != sid:
+        print(f"[Socket.IO] Resuming generation {generation.id}: {old_sid} -> {sid}")
+        if active_generations.get(old_sid) is generation:
+            del active_generations[old_sid]
+            active_generations[sid] = generation
+        generation.sid = sid
+    if generation.grace_handle is not None:
+        generation.grace_handle.cancel()
+        generation.grace_handle = None
+
+    # Join first, then replay: anything emitted in between arrives twice and
+    # the client drops it by seq, rather than not at all.
+    await sio.enter_room(sid, generation.id)
+    replay = generation.stream.replay(last_seq)
+    for event, payload in replay:
+        await sio.emit(event, payload, room=sid)
+    metrics.increment("generation_resumes_total")
+    metrics.increment("generation_resume_events_replayed_total", len(replay))
+
+    if generation.complete_payload is not None:
+        await sio.emit("generation_complete", generation.complete_payload, room=sid)
+
+async def _resume_job(sid, job_id, last_seq):
+    """Reattach a client to a worker job; workers keep no replay buffer here.
+
+    A running job's periodic and final snapshots bring the client up to date;
+    a finished job's stored result is sent as one snapshot.
+    """
+    job = await asyncio.get_running_loop().run_in_executor(_BLOCKING_EXECUTOR, get_job, job_id)
+    if job is None:
+        await sio.emit("resume_failed", {"generation_id": job_id}, room=sid)
+        return
+    for old_sid, old_job in list(worker_jobs.items()):
+        if old_job == job_id:
+            del worker_jobs[old_sid]
+    await sio.enter_room(sid, job_id)
+    metrics.increment("generation_resumes_total")
+
+    if job["status"] in ("queued", "running"):
+        worker_jobs[sid] = job_id
+        return
+    if job["result"] is not None:
+        await sio.emit("generation_delta", {
+            "seq": max(last_seq, job["last_seq"]) + 1,
+            "text": job["result"],
+        }, room=sid)
+    await sio.emit("generation_complete", {
+        "message": "Response generation complete.",
+        "generation_id": job_id,
+        "cancelled": job["status"] == "cancelled",
+    }, room=sid)
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Add these endpoints to all_endpoints.py (app/main.py or wherever your routes live)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -618,6 +914,8 @@ class UpdateServiceUser(BaseModel):
     patientName: Optional[str] = None
     location: Optional[str] = None
     status: Optional[str] = None
+    household_size: Optional[int] = None
+    monthly_income: Optional[float] = None
 
 
 class UpdateLastSession(BaseModel):
@@ -680,6 +978,8 @@ async def update_service_user(
         patientName=data.patientName,
         location=data.location,
         status=data.status,
+        household_size=data.household_size,
+        monthly_income=data.monthly_income,
     )
     if success:
         AuditLogger.log_phi_access(
@@ -695,6 +995,134 @@ async def update_service_user(
         raise HTTPException(status_code=400, detail=message)
 
 
+# ── Caseload eligibility screening ────────────────────────────────────────────
+
+class ScreeningHousehold(BaseModel):
+    service_user_id: Optional[str] = None
+    household_size: Optional[int] = None     # falls back to the stored profile
+    monthly_income: Optional[float] = None   # falls back to the stored profile
+    location: Optional[str] = None           # falls back to the stored profile
+
+
+# Households per request; larger caseloads are screened in several requests
+ELIGIBILITY_SCREEN_MAX_HOUSEHOLDS = int(os.environ.get("ELIGIBILITY_SCREEN_MAX_HOUSEHOLDS", 500))
+
+
+class EligibilityScreenRequest(BaseModel):
+    households: Optional[List[ScreeningHousehold]] = None  # None: whole caseload
+    programs: Optional[List[str]] = None                   # None: every program
+
+
+@app.post("/eligibility_screen/")
+async def eligibility_screen(
+    data: EligibilityScreenRequest,
+    current_user: UserData = Depends(get_current_user),
+    req: Request = None,
+):
+    """
+    Screen many households against every benefit program at once.
+
+    Households come from the request, from the provider's stored profiles,
+    or both (missing request fields are filled from the profile with the same
+    `service_user_id`). Rules are evaluated locally, with no LLM calls.
+
+    Only organizations the loaded rules file covers can screen, and a request
+    may list at most `ELIGIBILITY_SCREEN_MAX_HOUSEHOLDS` households.
+
+    Returns a matrix: one row per household with an `eligible` entry (True,
+    False, or None when size or income is unknown) and a `limits` entry per
+    program, in the order of `programs`.
+    """
+    started = time.perf_counter()
+    engine = get_eligibility_engine()
+    if not engine.covers(current_user.organization):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Eligibility rules for {current_user.organization} are not available "
+                   f"(loaded rules cover {engine.jurisdiction}).",
+        )
+    if data.households is not None and len(data.households) > ELIGIBILITY_SCREEN_MAX_HOUSEHOLDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {ELIGIBILITY_SCREEN_MAX_HOUSEHOLDS} households per request.",
+        )
+
+    programs = data.programs or list(engine.programs)
+    unknown = [program for program in programs if engine.resolve_program(program)[0] is None]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown programs: {', '.join(unknown)}")
+
+    profiles = {}
+    if data.households is None or any(h.service_user_id for h in data.households):
+        rows = await asyncio.get_running_loop().run_in_executor(
+            _BLOCKING_EXECUTOR, get_service_user_households, current_user.username
+        )
+        profiles = {row["service_user_id"]: row for row in rows}
+
+    if data.households is None:
+        households = [ScreeningHousehold(service_user_id=sid) for sid in profiles]
+    else:
+        households = data.households
+
+    matrix = []
+    batch = []
+    for household in households:
+        profile = profiles.get(household.service_user_id, {})
+        row = {
+            "service_user_id": household.service_user_id,
+            "household_size": household.household_size
+            if household.household_size is not None else profile.get("household_size"),
+            "monthly_income": household.monthly_income
+            if household.monthly_income is not None else profile.get("monthly_income"),
+            "location": household.location or profile.get("location"),
+        }
+        row["missing"] = [
+            field for field in ("household_size", "monthly_income") if row[field] is None
+        ]
+        if not row["missing"]:
+            row["batch_start"] = len(batch)
+            batch.extend(
+                {
+                    "program": program,
+                    "household_size": row["household_size"],
+                    "monthly_income": row["monthly_income"],
+                    "location": row["location"],
+                }
+                for program in programs
+            )
+        matrix.append(row)
+
+    results = engine.evaluate_many(batch)
+    for row in matrix:
+        start = row.pop("batch_start", None)
+        if start is None:
+            row["eligible"] = [None] * len(programs)
+            row["limits"] = [None] * len(programs)
+            continue
+        cells = results[start:start + len(programs)]
+        row["eligible"] = [cell.get("eligible") for cell in cells]
+        row["limits"] = [cell.get("limit") for cell in cells]
+
+    elapsed = time.perf_counter() - started
+    metrics.observe("eligibility_screen_seconds", elapsed)
+    metrics.increment("eligibility_screen_households_total", len(matrix))
+    AuditLogger.log(
+        username=current_user.username,
+        user_role=current_user.role,
+        action="eligibility_screen",
+        resource_type="patient_list",
+        status="success",
+        ip_address=req.client.host if req and req.client else None,
+        details={"count": len(matrix), "programs": programs},
+    )
+    return {
+        "rules_version": engine.version,
+        "programs": programs,
+        "rows": matrix,
+        "seconds": round(elapsed, 4),
+    }
+
+
 # ── Update last session date ───────────────────────────────────────────────────
 
 @app.post("/update_last_session/")
@@ -0,0 +1,83 @@
+"""Small in-process caching helpers.
+
+`TTLCache` is a thread-safe LRU mapping whose entries also expire after a
+fixed time-to-live. It backs the in-memory session store and other
+per-process caches that must stay bounded.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from app import metrics
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 3600, name: str = None):
+        """
+        Args:
+            maxsize: Entries kept before the least recently used is evicted
+            ttl_seconds: Seconds an entry lives after it was last set
+                (None or 0 disables expiry)
+            name: Optional label; when set, hits, misses and evictions are
+                counted as `cache_*_total{cache=name}`
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value (marking it recently used) or `default`."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                self._count("misses")
+                return default
+            self._data.move_to_end(key)
+        self._count("hits")
+        return entry[1]
+
+    def set(self, key, value, ttl_seconds: float = None):
+        """Store a value, evicting the least recently used entries if full.
+
+        Args:
+            ttl_seconds: Overrides the cache-wide TTL for this entry
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+        evicted = 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def pop(self, key, default=None):
+        """Remove and return an entry (expired or not), or `default`."""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def _count(self, what: str, value: int = 1):
+        if self.name:
+            metrics.increment(f"cache_{what}_total", value, cache=self.name)
@@ -0,0 +1,64 @@
+"""Cooperative cancellation for in-flight generations.
+
+Each generation gets a `CancellationToken`. Socket handlers cancel it on
+disconnect, `reset_session` or `stop_generation`, and it expires by itself
+after a per-request deadline. The tool loop, the streaming emit loop and the
+sidebar update check the token between steps and stop early, so abandoned
+chats stop making OpenAI, search and geocoding calls.
+"""
+
+import threading
+import time
+
+from app import metrics
+
+
+class GenerationCancelled(Exception):
+    """Raised inside the pipeline when its generation has been cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Generation cancelled ({reason})")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Thread-safe cancel flag with an optional deadline."""
+
+    def __init__(self, deadline_seconds: float = None):
+        self._event = threading.Event()
+        self._deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.reason = None
+
+    def cancel(self, reason: str = "cancelled"):
+        """Request cancellation; the first reason given wins."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self._deadline is not None and time.monotonic() > self._deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def check(self, llm_calls_saved: int = 0, tool_calls_saved: int = 0):
+        """
+        Raise `GenerationCancelled` if cancelled, recording the work skipped.
+
+        Args:
+            llm_calls_saved: LLM calls the caller would have made next
+            tool_calls_saved: Tool calls the caller would have made next
+        """
+        if not self.cancelled:
+            return
+        if llm_calls_saved:
+            metrics.increment("cancel_llm_calls_saved_total", llm_calls_saved, reason=self.reason)
+        if tool_calls_saved:
+            metrics.increment("cancel_tool_calls_saved_total", tool_calls_saved, reason=self.reason)
+        raise GenerationCancelled(self.reason)
+
+
+def check_cancelled(token: CancellationToken, llm_calls_saved: int = 0, tool_calls_saved: int = 0):
+    """`token.check(...)` that tolerates `token is None` (no cancellation)."""
+    if token is not None:
+        token.check(llm_calls_saved=llm_calls_saved, tool_calls_saved=tool_calls_saved)
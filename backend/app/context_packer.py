@@ -0,0 +1,249 @@
+"""Token-budgeted packing of tool-loop prompts.
+
+Every tool-loop iteration resends the system prompt, the whole conversation
+history and all tool outputs gathered so far. `ContextPacker` fits that into
+`CONTEXT_TOKEN_BUDGET` prompt tokens before each model call:
+
+1. Each tool output is capped at `TOOL_OUTPUT_MAX_TOKENS`.
+2. If the prompt is still over budget, tool outputs from earlier iterations
+   (which the model has already acted on) are cut to
+   `OLD_TOOL_OUTPUT_TOKENS`.
+3. If it is still over budget, the oldest history turns are replaced by a
+   rolling summary. The most recent `CONTEXT_MIN_RECENT_MESSAGES` turns
+   are always kept.
+
+Summaries are cached per conversation. When a turn needs a summary that is
+not cached yet, it uses a quick extractive one. An LLM summary is then
+written in the background, for the next turn to use.
+
+Tokens are counted with `tiktoken` when it is installed, else estimated
+from the text length.
+"""
+
+import concurrent.futures
+import json
+import os
+import threading
+
+from app import metrics
+from app.cache_utils import TTLCache
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # not installed, or the encoding file cannot be fetched
+    _ENCODING = None
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 12000))
+TOOL_OUTPUT_MAX_TOKENS = int(os.environ.get("TOOL_OUTPUT_MAX_TOKENS", 2000))
+OLD_TOOL_OUTPUT_TOKENS = int(os.environ.get("OLD_TOOL_OUTPUT_TOKENS", 400))
+CONTEXT_MIN_RECENT_MESSAGES = int(os.environ.get("CONTEXT_MIN_RECENT_MESSAGES", 4))
+
+# Tokens held back for the summary message itself
+SUMMARY_MAX_TOKENS = 400
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the earlier part of a conversation between a peer support "
+    "provider and PeerCoPilot in under 200 words. Keep the person's needs, "
+    "location, household and income details, programs and resources already "
+    "discussed, and any decisions or next steps. Write plain sentences."
+)
+
+# conversation id -> (number of history messages covered, summary text)
+_SUMMARIES = TTLCache(
+    int(os.environ.get("CONTEXT_SUMMARY_CACHE_SIZE", 1000)),
+    ttl_seconds=24 * 3600,
+    name="context_summaries",
+)
+_SUMMARY_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="summary"
+)
+_PENDING = set()
+_PENDING_LOCK = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in `text` (estimated if tiktoken is unavailable)."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to about `max_tokens` tokens, noting how much was dropped."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        kept = _ENCODING.decode(tokens[:max_tokens])
+        dropped = len(tokens) - max_tokens
+    else:
+        kept = text[: max_tokens * 4]
+        dropped = (len(text) - len(kept)) // 4
+    return f"{kept}\n[... truncated {dropped} tokens]"
+
+
+def _message_text(message: dict) -> str:
+    text = message.get("content") or ""
+    if message.get("tool_calls"):
+        text += json.dumps([call["function"] for call in message["tool_calls"]])
+    return text
+
+
+def _transcript(messages: list) -> str:
+    return "\n".join(
+        f"{message['role']}: {message.get('content') or ''}" for message in messages
+    )
+
+
+def _extractive_summary(previous: str, messages: list) -> str:
+    """Cheap stand-in summary: the start of each older message."""
+    lines = [previous] if previous else []
+    for message in messages:
+        content = " ".join((message.get("content") or "").split())
+        if content:
+            lines.append(f"{message['role']}: {content[:200]}")
+    return truncate_tokens("\n".join(lines), SUMMARY_MAX_TOKENS)
+
+
+def _write_summary(conversation_id: str, previous: str, messages: list, covered: int):
+    # Imported here to keep this module free of the OpenAI client at import
+    from app.utils import call_chatgpt_api_all_chats
+
+    try:
+        content = _transcript(messages)
+        if previous:
+            content = f"Summary so far:\n{previous}\n\nLater messages:\n{content}"
+        summary = call_chatgpt_api_all_chats(
+            [
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": content},
+            ],
+            stream=False,
+            purpose="context_summary",
+        )
+        _SUMMARIES.set(conversation_id, (covered, truncate_tokens(summary, SUMMARY_MAX_TOKENS)))
+        metrics.increment("context_summaries_total")
+    except Exception as e:
+        print(f"[Context] Summary failed for {conversation_id}: {e}")
+    finally:
+        with _PENDING_LOCK:
+            _PENDING.discard(conversation_id)
+
+
+class ContextPacker:
+    """Packs one request's tool-loop messages into the token budget."""
+
+    def __init__(self, conversation_id: str, history_count: int, budget: int = CONTEXT_TOKEN_BUDGET):
+        """
+        Args:
+            conversation_id: Key for the cached rolling summary (may be None)
+            history_count: Number of history messages after the system prompt
+            budget: Prompt-token budget per model call
+        """
+        self.conversation_id = conversation_id
+        self.history_count = history_count
+        self.budget = budget
+        self.iteration = 0
+        self._counts = {}  # message text -> tokens
+
+    def _tokens(self, message: dict) -> int:
+        text = _message_text(message)
+        count = self._counts.get(text)
+        if count is None:
+            count = self._counts[text] = count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+        return count
+
+    def _total(self, messages: list) -> int:
+        return sum(self._tokens(message) for message in messages)
+
+    def pack(self, messages: list) -> list:
+        """
+        Return the messages to send for this iteration.
+
+        `messages` is the full tool-loop list: system prompt, history, the
+        current user message, then the assistant/tool messages of earlier
+        iterations. It is not modified.
+        """
+        self.iteration += 1
+        system = messages[:1]
+        history = messages[1:1 + self.history_count]
+        turn = [
+            {**message, "content": truncate_tokens(message["content"], TOOL_OUTPUT_MAX_TOKENS)}
+            if message.get("role") == "tool" else message
+            for message in messages[1 + self.history_count:]
+        ]
+        full_tokens = self._total(messages)
+
+        if self._total(system + history + turn) > self.budget:
+            turn = self._shrink_old_tool_outputs(turn)
+            fixed = self._total(system + turn)
+            if fixed + self._total(history) > self.budget:
+                history = self._fit_history(history, self.budget - fixed)
+        packed = system + history + turn
+
+        packed_tokens = self._total(packed)
+        metrics.observe("prompt_tokens", packed_tokens)
+        if packed_tokens < full_tokens:
+            metrics.increment("context_tokens_saved_total", full_tokens - packed_tokens)
+        print(f"[Context] Iteration {self.iteration}: {packed_tokens} prompt tokens "
+              f"({full_tokens} unpacked, budget {self.budget})")
+        return packed
+
+    def _shrink_old_tool_outputs(self, turn: list) -> list:
+        # Tool outputs after the last assistant message are the ones in play
+        last_assistant = max(
+            (i for i, message in enumerate(turn) if message.get("role") == "assistant"),
+            default=len(turn),
+        )
+        return [
+            {**message, "content": truncate_tokens(message["content"], OLD_TOOL_OUTPUT_TOKENS)}
+            if message.get("role") == "tool" and i < last_assistant else message
+            for i, message in enumerate(turn)
+        ]
+
+    def _fit_history(self, history: list, available: int) -> list:
+        """Keep the newest history that fits; summarize the rest."""
+        available -= SUMMARY_MAX_TOKENS + MESSAGE_OVERHEAD_TOKENS
+        keep = 0
+        used = 0
+        for message in reversed(history):
+            cost = self._tokens(message)
+            if keep >= CONTEXT_MIN_RECENT_MESSAGES and used + cost > available:
+                break
+            keep += 1
+            used += cost
+        dropped = history[:len(history) - keep]
+        if not dropped:
+            return history
+        summary = self._summary(dropped)
+        metrics.increment("context_messages_summarized_total", len(dropped))
+        return [{
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{summary}",
+        }] + history[len(dropped):]
+
+    def _summary(self, dropped: list) -> str:
+        """Cached summary of `dropped`, refreshing it in the background if stale."""
+        cached = _SUMMARIES.get(self.conversation_id) if self.conversation_id else None
+        covered, previous = cached if cached else (0, "")
+        if covered == len(dropped):
+            return previous
+        if covered > len(dropped):
+            # The budget now keeps more history than the summary skipped
+            covered, previous = 0, ""
+
+        new_messages = dropped[covered:]
+        if self.conversation_id:
+            with _PENDING_LOCK:
+                start = self.conversation_id not in _PENDING
+                _PENDING.add(self.conversation_id)
+            if start:
+                _SUMMARY_EXECUTOR.submit(
+                    _write_summary, self.conversation_id, previous, new_messages, len(dropped)
+                )
+        return _extractive_summary(previous, new_messages)
@@ -313,8 +313,10 @@ def update_service_user_profile(
     patientName: str = None,
     location: str = None,
     status: str = None,
+    household_size: int = None,
+    monthly_income: float = None,
 ):
-    """Update name, location, and/or status in the profiles table."""
+    """Update name, location, status, and/or household size and income in the profiles table."""
     fields = []
     values = []
 
@@ -327,6 +329,12 @@ def update_service_user_profile(
     if status is not None:
         fields.append("status = %s")
         values.append(status)
+    if household_size is not None:
+        fields.append("household_size = %s")
+        values.append(household_size)
+    if monthly_income is not None:
+        fields.append("monthly_income = %s")
+        values.append(monthly_income)
 
     if not fields:
         return True, "Nothing to update"
@@ -0,0 +1,333 @@
+"""Table-driven benefits eligibility engine.
+
+Income limits, program aliases, Section 8 (HUD HMFA) regions and the result
+messages live in a versioned rules file (`rules/eligibility_nj.json`,
+override with `ELIGIBILITY_RULES_PATH`). `EligibilityEngine` compiles it
+once into lookup tables:
+
+* program aliases -> program (exact match first, then an ordered scan for
+  free text such as "SNAP benefits" or "ssdi blind");
+* county/city names -> HMFA region, through one compiled pattern;
+* per-program limit arrays, extended past the table with the program's
+  per-additional-person increment.
+
+`evaluate` checks one household; `evaluate_many` checks a batch with numpy,
+grouping households by program and region. The rules apply only to
+organizations whose jurisdiction (`ORGANIZATION_JURISDICTIONS`) matches the
+file's; `covers` checks that for callers that know the organization. `tools.check_eligibility` is a
+thin wrapper that turns an `evaluate` result into the tool's message.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+RULES_PATH = os.environ.get(
+    "ELIGIBILITY_RULES_PATH",
+    str(Path(__file__).parent.parent / "rules" / "eligibility_nj.json"),
+)
+
+# Organization -> jurisdiction whose rules its eligibility questions need
+ORGANIZATION_JURISDICTIONS = {
+    "cspnj": "New Jersey",
+    "georgia": "Georgia",
+    "clhs": "Pennsylvania",
+}
+
+
+def _extended_limits(table: tuple, per_additional: float, household_size: int):
+    """Limit for `household_size`, extending the table past its last entry."""
+    if household_size <= len(table):
+        return table[household_size - 1]
+    return table[-1] + per_additional * (household_size - len(table))
+
+
+class EligibilityEngine:
+    """Compiled eligibility rules for one rules-file version."""
+
+    def __init__(self, rules: dict):
+        self.version = rules["version"]
+        self.jurisdiction = rules.get("jurisdiction")
+        self.programs = rules["programs"]
+        self.unknown_program = rules["unknown_program"]
+
+        self._aliases = {
+            alias: key for key, program in self.programs.items() for alias in program["aliases"]
+        }
+        self._program_patterns = [
+            (
+                key,
+                re.compile("|".join(re.escape(alias) for alias in program["aliases"])),
+                tuple(program.get("excludes", ())),
+            )
+            for key, program in self.programs.items()
+        ]
+
+        # Word-start matching, so "ssi" is not found inside "ssdi"
+        self._mention_patterns = [
+            (key, re.compile(r"\b(?:" + "|".join(re.escape(alias) for alias in program["aliases"]) + ")"))
+            for key, program in self.programs.items()
+        ]
+
+        # Limit tables as tuples for single checks and arrays for batches
+        self._tables = {}
+        self._arrays = {}
+        for key, program in self.programs.items():
+            if program["kind"] == "household_limit":
+                self._tables[key] = tuple(program["monthly_limits"])
+            elif program["kind"] == "area_income_limit":
+                for region, spec in program["regions"].items():
+                    self._tables[(key, region)] = tuple(spec["annual_limits"])
+        for key, table in self._tables.items():
+            self._arrays[key] = np.asarray(table, dtype=np.float64)
+
+        # Location names are tried in file order, so earlier names win ties
+        self._locations = {}
+        for key, program in self.programs.items():
+            if program["kind"] != "area_income_limit":
+                continue
+            names = list(program["locations"])
+            self._locations[key] = (
+                re.compile("|".join(re.escape(name) for name in names)),
+                {name: rank for rank, name in enumerate(names)},
+            )
+
+    # ------------------------------------------------------------------
+    # Resolution
+    # ------------------------------------------------------------------
+
+    def covers(self, organization: str) -> bool:
+        """Whether these rules apply to `organization`'s clients."""
+        return (
+            self.jurisdiction is not None
+            and ORGANIZATION_JURISDICTIONS.get(organization) == self.jurisdiction
+        )
+
+    def resolve_program(self, text: str):
+        """
+        Map a program name or phrase to (program key, variant).
+
+        Returns:
+            Tuple of (key, variant or None), or (None, None) if unknown
+        """
+        text = (text or "").lower().strip()
+        key = self._aliases.get(text)
+        if key is None:
+            for candidate, pattern, excludes in self._program_patterns:
+                if pattern.search(text) and not any(word in text for word in excludes):
+                    key = candidate
+                    break
+        if key is None:
+            return None, None
+        variants = self.programs[key].get("variants", {})
+        variant = next((name for name in variants if name in text), None)
+        return key, variant
+
+    def programs_mentioned(self, text: str) -> list:
+        """Every program named in `text` (aliases matched at word starts), in rules-file order."""
+        text = (text or "").lower()
+        return [key for key, pattern in self._mention_patterns if pattern.search(text)]
+
+    def resolve_region(self, program_key: str, location: str):
+        """
+        Map a free-text location to (region key, label) for an area program.
+
+        Falls back to the program's default region when no county or city
+        name appears in `location`.
+        """
+        program = self.programs[program_key]
+        pattern, ranks = self._locations[program_key]
+        matches = [match.group(0) for match in pattern.finditer((location or "").lower().strip())]
+        if not matches:
+            return program["default_region"], program["default_region_label"]
+        name = min(matches, key=ranks.__getitem__)
+        return program["locations"][name], name.title()
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def evaluate(self, program: str, household_size: int, monthly_income: float, location: str = None) -> dict:
+        """
+        Check one household against a program's income rules.
+
+        Returns:
+            Result dict with `program`, `eligible`, `limit` and the values the
+            program's message needs, or a dict with an `error` message
+        """
+        key, variant = self.resolve_program(program)
+        if key is None:
+            return {"error": self.unknown_program}
+        try:
+            size = int(household_size)
+            income = float(monthly_income)
+        except (TypeError, ValueError):
+            return {"error": "Error: household_size and monthly_income must be numbers."}
+        if size < 1:
+            return {"error": "Error: household_size must be at least 1."}
+
+        rule = self.programs[key]
+        result = {
+            "program": key,
+            "variant": variant,
+            "household_size": household_size,
+            "income": monthly_income,
+            "version": self.version,
+        }
+        kind = rule["kind"]
+        if kind == "household_limit":
+            limit = _extended_limits(self._tables[key], rule["per_additional_person"], size)
+            result.update(limit=limit, eligible=income <= limit)
+        elif kind == "earnings_limit":
+            limit = rule["variants"][variant] if variant else rule["monthly_limit"]
+            result.update(limit=limit, eligible=income <= limit)
+        elif kind == "benefit_offset":
+            label = "couple" if size >= 2 else "individual"
+            limit = rule["max_benefit"][label] + rule["state_supplement"]
+            countable = max(0, income - rule["income_exclusion"])
+            result.update(limit=limit, countable=countable, benefit_label=label, eligible=countable < limit)
+        elif kind == "area_income_limit":
+            region, label = self.resolve_region(key, location)
+            limit = _extended_limits(self._tables[(key, region)], rule["per_additional_person"], size)
+            annual_income = income * 12
+            result.update(
+                limit=limit, region=label, annual_income=annual_income,
+                monthly_limit=limit / 12, eligible=annual_income <= limit,
+            )
+        return result
+
+    def evaluate_many(self, households: list) -> list:
+        """
+        Check a batch of households.
+
+        Households are grouped by program (and region for area programs) and
+        each group's limits and comparisons are computed as numpy arrays.
+
+        Args:
+            households: Dicts with `program`, `household_size`,
+                `monthly_income` and optionally `location`
+
+        Returns:
+            Result dicts in input order, as returned by `evaluate`
+        """
+        results = [None] * len(households)
+        # (key, variant, region, label) -> ([indices], [sizes], [incomes])
+        groups = {}
+        programs = {}  # program text -> (key, variant)
+        regions = {}  # (key, location) -> (region, label)
+
+        for i, household in enumerate(households):
+            text = household.get("program")
+            resolved = programs.get(text)
+            if resolved is None:
+                resolved = programs[text] = self.resolve_program(text)
+            key, variant = resolved
+            if key is None:
+                results[i] = {"error": self.unknown_program}
+                continue
+            try:
+                size = int(household.get("household_size", 1))
+                income = float(household.get("monthly_income", 0))
+            except (TypeError, ValueError):
+                results[i] = {"error": "Error: household_size and monthly_income must be numbers."}
+                continue
+            if size < 1:
+                results[i] = {"error": "Error: household_size must be at least 1."}
+                continue
+            region = label = None
+            if self.programs[key]["kind"] == "area_income_limit":
+                location = household.get("location")
+                area = regions.get((key, location))
+                if area is None:
+                    area = regions[(key, location)] = self.resolve_region(key, location)
+                region, label = area
+            group = groups.get((key, variant, region, label))
+            if group is None:
+                group = groups[(key, variant, region, label)] = ([], [], [])
+            group[0].append(i)
+            group[1].append(size)
+            group[2].append(income)
+
+        for (key, variant, region, label), (indices, sizes, incomes) in groups.items():
+            rule = self.programs[key]
+            kind = rule["kind"]
+            sizes = np.array(sizes)
+            incomes = np.array(incomes)
+            extra = {}
+
+            if kind in ("household_limit", "area_income_limit"):
+                table = self._arrays[key if region is None else (key, region)]
+                limits = (
+                    table[np.minimum(sizes, len(table)) - 1]
+                    + rule["per_additional_person"] * np.maximum(sizes - len(table), 0)
+                )
+                if kind == "household_limit":
+                    eligible = incomes <= limits
+                else:
+                    annual = incomes * 12
+                    eligible = annual <= limits
+                    extra = {"annual_income": annual.tolist(), "monthly_limit": (limits / 12).tolist()}
+            elif kind == "earnings_limit":
+                limits = np.full(len(indices), rule["variants"][variant] if variant else rule["monthly_limit"])
+                eligible = incomes <= limits
+            else:  # benefit_offset
+                couple = sizes >= 2
+                limits = np.where(
+                    couple, rule["max_benefit"]["couple"], rule["max_benefit"]["individual"]
+                ) + rule["state_supplement"]
+                countable = np.maximum(0, incomes - rule["income_exclusion"])
+                eligible = countable < limits
+                extra = {
+                    "countable": countable.tolist(),
+                    "benefit_label": np.where(couple, "couple", "individual").tolist(),
+                }
+
+            limits = [int(x) if x.is_integer() else x for x in limits.astype(np.float64).tolist()]
+            eligible = eligible.tolist()
+            base = {"program": key, "variant": variant, "version": self.version}
+            if label is not None:
+                base["region"] = label
+            for j, i in enumerate(indices):
+                household = households[i]
+                result = dict(base)
+                result["household_size"] = household.get("household_size", 1)
+                result["income"] = household.get("monthly_income", 0)
+                result["limit"] = limits[j]
+                result["eligible"] = eligible[j]
+                for name, values in extra.items():
+                    result[name] = values[j]
+                results[i] = result
+        return results
+
+    def message(self, result: dict) -> str:
+        """Render a result as the user-facing eligibility message."""
+        if "error" in result:
+            return result["error"]
+        rule = self.programs[result["program"]]
+        template = rule["eligible"] if result["eligible"] else rule["ineligible"]
+        return template.format(**result)
+
+
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def load_engine(path: str = RULES_PATH) -> EligibilityEngine:
+    """Compile an engine from a rules file."""
+    with open(path, encoding="utf-8") as f:
+        return EligibilityEngine(json.load(f))
+
+
+def get_engine() -> EligibilityEngine:
+    """The process-wide engine, compiled from `RULES_PATH` on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                _ENGINE = load_engine()
+                print(f"[Eligibility] Loaded rules {_ENGINE.version} from {RULES_PATH}")
+    return _ENGINE
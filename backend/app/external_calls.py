@@ -0,0 +1,255 @@
+"""Shared layer for calls to external APIs used by the tools.
+
+Each provider (Brave web search, Google Maps) gets:
+
+* a pooled keep-alive `requests.Session`, so repeated calls reuse TLS
+  connections instead of handshaking every time;
+* a TTL result cache keyed by the caller's normalized request;
+* a concurrency limit; a call that cannot get a slot within
+  `EXTERNAL_QUEUE_SECONDS` is treated as unavailable;
+* a circuit breaker: after `EXTERNAL_BREAKER_FAILURES` consecutive failures
+  calls fail fast with `ProviderUnavailable` for
+  `EXTERNAL_BREAKER_RESET_SECONDS`, then one trial call decides whether the
+  circuit closes again.
+
+Base URLs can be overridden (`BRAVE_SEARCH_URL`, `GOOGLE_MAPS_BASE_URL`) so
+`scripts/check_external_calls.py` can run against local stand-in servers.
+
+Metrics: `external_calls_total{provider,outcome}` with outcome one of
+ok / cached / error / short_circuited / saturated,
+`external_call_seconds{provider}` and `external_circuit_open{provider}`.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import metrics
+from app.cache_utils import TTLCache
+
+BREAKER_FAILURES = int(os.environ.get("EXTERNAL_BREAKER_FAILURES", 3))
+BREAKER_RESET_SECONDS = float(os.environ.get("EXTERNAL_BREAKER_RESET_SECONDS", 30))
+QUEUE_SECONDS = float(os.environ.get("EXTERNAL_QUEUE_SECONDS", 2))
+
+BRAVE_SEARCH_URL = os.environ.get("BRAVE_SEARCH_URL", "https://api.search.brave.com/res/v1/web/search")
+GOOGLE_MAPS_BASE_URL = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+_MISSING = object()
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit is open or whose slots are full."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the trial call when half-open)."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            reopened = self.state != self.CLOSED
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+        if reopened:
+            print(f"[External] {self.name} circuit closed")
+            metrics.set_gauge("external_circuit_open", 0, provider=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            tripped = self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self._failures >= self.failure_threshold
+            )
+            if tripped:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+        if tripped:
+            print(f"[External] {self.name} circuit open for {self.reset_seconds:.0f}s after {self._failures} failures")
+            metrics.set_gauge("external_circuit_open", 1, provider=self.name)
+
+
+class Provider:
+    """One external API: pooled session, result cache, concurrency limit and breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float,
+        max_concurrency: int = 4,
+        cache_seconds: float = 3600,
+        cache_size: int = 512,
+        is_failure=None,
+    ):
+        """
+        Args:
+            name: Label used in logs and metrics
+            timeout: Per-request timeout callers should pass to the session
+            max_concurrency: Calls allowed in flight at once (also the pool size)
+            cache_seconds: How long a successful result is reused
+            cache_size: Cached results kept per provider
+            is_failure: `is_failure(exc)` deciding whether an exception
+                counts against the breaker (default: every exception).
+                Errors about the request itself, such as an unknown
+                address, should not open the circuit.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.cache = TTLCache(maxsize=cache_size, ttl_seconds=cache_seconds, name=f"external_{name}")
+        self.breaker = CircuitBreaker(name)
+        self._is_failure = is_failure or (lambda exc: True)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._max_concurrency = max_concurrency
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        """Keep-alive session shared by every call to this provider."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._max_concurrency)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def call(self, key, fn, *args, **kwargs):
+        """
+        Return `fn(*args, **kwargs)`, served from the cache when `key` was seen recently.
+
+        Args:
+            key: Hashable cache key for the normalized request, or None to skip caching
+            fn: Function making the upstream request
+
+        Raises:
+            ProviderUnavailable: The circuit is open or no slot freed up in time
+        """
+        if key is not None:
+            cached = self.cache.get(key, _MISSING)
+            if cached is not _MISSING:
+                metrics.increment("external_calls_total", provider=self.name, outcome="cached")
+                return cached
+
+        if not self._slots.acquire(timeout=QUEUE_SECONDS):
+            metrics.increment("external_calls_total", provider=self.name, outcome="saturated")
+            raise ProviderUnavailable(f"{self.name} is busy")
+        try:
+            if not self.breaker.allow():
+                metrics.increment("external_calls_total", provider=self.name, outcome="short_circuited")
+                raise ProviderUnavailable(f"{self.name} is temporarily unavailable")
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if self._is_failure(e):
+                    self.breaker.record_failure()
+                else:
+                    # The upstream answered; only the request was bad
+                    self.breaker.record_success()
+                metrics.increment("external_calls_total", provider=self.name, outcome="error")
+                raise
+            finally:
+                metrics.observe("external_call_seconds", time.perf_counter() - started, provider=self.name)
+        finally:
+            self._slots.release()
+
+        self.breaker.record_success()
+        metrics.increment("external_calls_total", provider=self.name, outcome="ok")
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+
+def _upstream_failure(exc) -> bool:
+    """Timeouts, connection errors, 5xx and 429 responses; not other client errors."""
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code >= 500 or response.status_code == 429
+    status = getattr(exc, "status", None)  # googlemaps.exceptions.ApiError
+    if status is not None:
+        return status in ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+    return True
+
+
+web_search = Provider(
+    "web_search",
+    timeout=float(os.environ.get("WEB_SEARCH_TIMEOUT_SECONDS", 5)),
+    cache_seconds=float(os.environ.get("WEB_SEARCH_CACHE_SECONDS", 3600)),
+    is_failure=_upstream_failure,
+)
+google_maps = Provider(
+    "google_maps",
+    timeout=float(os.environ.get("GOOGLE_MAPS_TIMEOUT_SECONDS", 5)),
+    # Directions keys carry their own 15-minute bucket; geocodes rarely change
+    cache_seconds=float(os.environ.get("GOOGLE_MAPS_CACHE_SECONDS", 24 * 3600)),
+    is_failure=_upstream_failure,
+)
+
+DIRECTIONS_BUCKET_SECONDS = 15 * 60
+
+
+def normalize_query(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def directions_key(origin: str, destination: str, mode: str) -> tuple:
+    """Cache key for a directions request: endpoints, mode and 15-minute departure bucket."""
+    bucket = int(time.time() // DIRECTIONS_BUCKET_SECONDS)
+    return ("directions", normalize_query(origin), normalize_query(destination), mode, bucket)
+
+
+_GMAPS_CLIENT = None
+_GMAPS_LOCK = threading.Lock()
+
+
+def google_maps_client():
+    """Shared `googlemaps.Client` on the provider's pooled session.
+
+    Its own retry loop is capped at the provider timeout; the breaker
+    handles persistent failures instead.
+    """
+    global _GMAPS_CLIENT
+    if _GMAPS_CLIENT is None:
+        with _GMAPS_LOCK:
+            if _GMAPS_CLIENT is None:
+                import googlemaps
+
+                _GMAPS_CLIENT = googlemaps.Client(
+                    key=os.getenv("GOOGLE_API_KEY"),
+                    timeout=google_maps.timeout,
+                    retry_timeout=google_maps.timeout,
+                    requests_session=google_maps.session,
+                    base_url=GOOGLE_MAPS_BASE_URL,
+                )
+    return _GMAPS_CLIENT
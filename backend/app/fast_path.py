@@ -0,0 +1,211 @@
+"""Deterministic fast path for requests a single tool call fully answers.
+
+Self-contained eligibility questions ("is a family of 3 earning $2,000/month
+eligible for SNAP?") and bare arithmetic ("what's 1450*12") otherwise cost
+the tool loop two model round trips. `answer` recognises them with
+patterns and slot extraction, runs `check_eligibility` or `calculator_tool`
+directly and returns a templated reply. It only answers when every slot is
+found exactly once and nothing else in the message is left unaccounted for
+(a second question, a negated or past eligibility decision, household
+members beyond the stated size); anything else returns None and goes
+through the normal tool loop. Eligibility is only answered for
+organizations whose jurisdiction the loaded rules file covers
+(`EligibilityEngine.covers`); other organizations fall through to the tool
+loop and their own references. `scripts/check_fast_path.py` measures
+precision on labelled messages.
+
+Enabled with `FAST_PATH_ENABLED=1`. Metrics: `fast_path_total{outcome,kind}`
+(served / fallthrough, so the served fraction is
+served / (served + fallthrough)) and `fast_path_seconds{kind}`.
+"""
+
+import os
+import re
+import time
+
+from app import metrics
+from app.eligibility import get_engine
+from app.tools import calculator_tool, check_eligibility
+
+FAST_PATH_ENABLED = os.environ.get("FAST_PATH_ENABLED", "0") == "1"
+# Longer messages usually ask for more than one thing
+MAX_MESSAGE_CHARS = 300
+
+# ---- Arithmetic ----
+
+_MATH_PREFIX = re.compile(
+    r"^(?:what(?:'s| is)|how much is|calculate|compute|calc)\s+", flags=re.IGNORECASE
+)
+_MATH_EXPRESSION = re.compile(r"^[\d\s.+\-*/()]+$")
+_MATH_OPERATOR = re.compile(r"[\d)]\s*[+\-*/]\s*[\d(.]")
+_NUMBER_COMMAS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+# ---- Eligibility ----
+
+_WORD_NUMBERS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_COUNT = r"(\d{1,2}|" + "|".join(_WORD_NUMBERS) + r")"
+_HOUSEHOLD_SIZE = [
+    re.compile(r"\b(?:family|household|house|home) of " + _COUNT + r"\b"),
+    re.compile(r"\b" + _COUNT + r"[- ](?:person|people|member)s?\b"),
+    re.compile(r"\bhousehold size (?:of |is )?" + _COUNT + r"\b"),
+]
+_AMOUNT = r"\$?\s?(\d[\d,]*(?:\.\d{1,2})?)\s*(k\b)?"
+_PERIOD = r"(?:\s*(?:/|per|a|an|each|every)?\s*(month|mo|year|yr)\b|\s*(monthly|annually|yearly)\b)"
+_INCOME = [
+    re.compile(_AMOUNT + _PERIOD),
+    re.compile(r"\b(monthly|annual|yearly) (?:income|earnings|salary|pay)(?: of| is)?\s*" + _AMOUNT),
+]
+_ELIGIBILITY_INTENT = re.compile(r"\b(?:eligib\w*|qualif\w*|can (?:they|we|i|he|she) get)\b")
+
+# Text the slots cannot account for; any of these sends the message to the tool loop
+_UNACCOUNTED = [
+    # A second request ("... also what about housing", "what else can they get")
+    re.compile(r"\b(?:and|also|plus|additionally|what else|what about|how about|other(?:wise)?|instead)\b"),
+    # The eligibility question is negated or about a past decision
+    re.compile(
+        r"\b(?:not|isn't|isnt|aren't|arent|wasn't|wasnt|weren't|don't|dont|doesn't|doesnt|didn't|didnt"
+        r"|never|no longer|ineligible|denied|denial|lost|losing|cut off|terminated|rejected|appeal\w*|reapply)\b"
+    ),
+    # Household members beyond the stated size ("4 adults with 2 children")
+    re.compile(
+        r"\b" + _COUNT + r" (?:adults?|children|child|kids?|sons?|daughters?|bab(?:y|ies)|seniors?|dependents?"
+        r"|grandchild\w*|grandkids?|roommates?)\b"
+    ),
+    re.compile(
+        r"\bwith (?:a|an|her|his|their|my|our|two|three|\d+) (?:new )?(?:child|children|baby|kids?|sons?|daughters?"
+        r"|husband|wife|partner|spouse|mother|father|mom|dad|parents?|roommates?|boyfriend|girlfriend)\b"
+    ),
+]
+
+
+def _render(text: str) -> list:
+    """Stream chunks in the same format as the tool loop."""
+    return [f"data: {text.replace(chr(10), '<br/>')}\n\n", "[DONE]\n\n"]
+
+
+def _format_number(value: float) -> str:
+    if float(value).is_integer():
+        return f"{int(value):,}"
+    return f"{value:,.2f}"
+
+
+def _arithmetic(message: str, organization: str):
+    text = _MATH_PREFIX.sub("", message.strip()).rstrip("?.! ")
+    text = _NUMBER_COMMAS.sub("", text.replace("$", ""))
+    text = re.sub(r"(?<=\d)\s*[x×]\s*(?=\d)", "*", text).replace("÷", "/")
+    if (
+        len(text) > 60
+        or "**" in text
+        or not _MATH_EXPRESSION.match(text)
+        or not _MATH_OPERATOR.search(text)
+    ):
+        return None
+    result = calculator_tool(text)
+    try:
+        value = float(result)
+    except ValueError:
+        return None
+    return f"{text.strip()} = {_format_number(value)}"
+
+
+def _single(values: set):
+    return values.pop() if len(values) == 1 else None
+
+
+def _household_size(text: str):
+    sizes = set()
+    for pattern in _HOUSEHOLD_SIZE:
+        for match in pattern.finditer(text):
+            value = match.group(1)
+            sizes.add(_WORD_NUMBERS.get(value) or int(value))
+    return _single(sizes)
+
+
+def _monthly_income(text: str):
+    incomes = set()
+    for match in _INCOME[0].finditer(text):
+        amount, thousands, period, period_word = match.groups()
+        incomes.add(_to_monthly(amount, thousands, period or period_word))
+    for match in _INCOME[1].finditer(text):
+        period_word, amount, thousands = match.groups()
+        incomes.add(_to_monthly(amount, thousands, period_word))
+    return _single(incomes)
+
+
+def _to_monthly(amount: str, thousands: str, period: str) -> float:
+    value = float(amount.replace(",", "")) * (1000 if thousands else 1)
+    if period in ("year", "yr", "annually", "yearly", "annual"):
+        value /= 12
+    return round(value, 2)
+
+
+def _eligibility(message: str, organization: str):
+    text = " ".join(message.lower().split())
+    if not _ELIGIBILITY_INTENT.search(text) or text.count("?") > 1:
+        return None
+    if any(pattern.search(text) for pattern in _UNACCOUNTED):
+        return None
+    engine = get_engine()
+    if not engine.covers(organization):
+        return None
+    programs = engine.programs_mentioned(text)
+    if len(programs) != 1:
+        return None
+    size = _household_size(text)
+    income = _monthly_income(text)
+    if not size or income is None:
+        return None
+
+    program, variant = engine.resolve_program(text)
+    location = None
+    if engine.programs[program]["kind"] == "area_income_limit":
+        # Limits depend on the county; without one the tool loop asks for it
+        _, label = engine.resolve_region(program, text)
+        if label == engine.programs[program]["default_region_label"]:
+            return None
+        location = text
+    if program != programs[0]:
+        return None
+
+    if float(income).is_integer():
+        income = int(income)
+    result = check_eligibility(" ".join(filter(None, (program, variant))), size, income, location)
+    if result.startswith("Error"):
+        return None
+    return (
+        f"Quick check for a household of {size} with ${_format_number(income)}/month in income:\n\n"
+        f"{result}\n\n"
+        "This only screens income against published limits; the agency makes the final determination."
+    )
+
+
+def answer(situation: str, organization: str):
+    """
+    Answer `situation` without the tool loop if a fast path matches.
+
+    Args:
+        situation: The user's message
+        organization: Organization key; selects whose eligibility rules apply
+
+    Returns:
+        List of stream chunks ending in "[DONE]", or None to fall through
+    """
+    if not FAST_PATH_ENABLED or not situation or len(situation) > MAX_MESSAGE_CHARS:
+        return None
+    for kind, handler in (("arithmetic", _arithmetic), ("eligibility", _eligibility)):
+        started = time.perf_counter()
+        try:
+            text = handler(situation, organization)
+        except Exception as e:
+            print(f"[Fast Path] {kind} failed, falling through: {e}")
+            text = None
+        if text is not None:
+            metrics.increment("fast_path_total", outcome="served", kind=kind)
+            metrics.observe("fast_path_seconds", time.perf_counter() - started, kind=kind)
+            print(f"[Fast Path] Served {kind} request without the tool loop")
+            return _render(text)
+    metrics.increment("fast_path_total", outcome="fallthrough", kind="none")
+    return None
@@ -6,19 +6,18 @@ produce follow-up messages and schedule check-ins for service users.
 
 import psycopg
 import os
-import openai
 import json
 from datetime import datetime, timedelta
+from app import llm_client
 from app.utils import call_chatgpt_api_all_chats
 from app.database import CONNECTION_STRING
+from app.triage import URGENT_KEYWORDS
 import spacy
 
-openai.api_key = os.environ.get("SECRET_KEY")
-
 nlp = spacy.load("en_core_web_sm")
 
 keyword_map = {
-    "extremely pressing": {"food", "hungry", "unsafe", "shelter"},
+    "extremely pressing": URGENT_KEYWORDS,
     "pressing": {"housing", "rent", "bills", "job"},
     "less pressing": {"therapy", "support group", "resume"},
     "long-term": {"education", "section 8", "career", "training"}
@@ -56,7 +55,7 @@ def generate_followup_message(messages):
     for m in messages:
         prior_messages.append({'role': m['sender'], 'content': m['text']})
     all_message_list += prior_messages
-    response = call_chatgpt_api_all_chats(all_message_list, max_tokens=750, stream=False, response_format={"type": "json_object"})
+    response = call_chatgpt_api_all_chats(all_message_list, max_tokens=750, stream=False, response_format={"type": "json_object"}, purpose="followup")
     return json.loads(response)
 
 
@@ -144,11 +143,9 @@ Rules:
 - If there are truly no check-ins to schedule, return an empty array: []
 """
 
-    client = openai.Client(api_key=os.environ.get("SECRET_KEY"))
-
     try:
-        response = client.chat.completions.create(
-            model="gpt-5.2",  # same model as the rest of the app
+        response = llm_client.create(
+            "check_ins",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Here is the conversation:\n\n{conversation_text}"}
@@ -0,0 +1,253 @@
+"""Generation pipeline shared by the web process and generation workers.
+
+Holds the pieces of a chat generation that do not depend on where it runs:
+turning raw pipeline chunks into text deltas, PHI scrubbing plus audit
+logging, persisting the exchange, and `run_generation`, which ties them
+together for one request and schedules the sidebar update (`app.sidebar`). Emits go through
+a `send(event, payload)` coroutine function, so the caller decides whether
+they reach the client through the local Socket.IO server or through a
+message-queue client manager.
+"""
+
+import asyncio
+import os
+import time
+
+from app import metrics
+from app.audit_logger import AuditLogger
+from app.cancellation import GenerationCancelled
+from app.database import update_conversation
+from app.phi_scrubber import PHIScrubber
+from app.sidebar import schedule_update
+from app.submodules import construct_response
+
+
+def process_raw_chunk(raw_chunk: str) -> str:
+    """Remove 'data:' prefix and clean chunk."""
+    if raw_chunk.startswith("data:"):
+        return raw_chunk[len("data: "):].replace('\n', '')
+    return raw_chunk.strip()
+
+def chunk_delta(raw_chunk: str) -> str:
+    """Turn one raw `data:` chunk into the text to append, or None for [DONE]."""
+    token = process_raw_chunk(raw_chunk)
+    
+    if token == "[DONE]":
+        return None
+        
+    if token.startswith('#'):
+        return '\n' + token
+    elif token.endswith('<br/>'):
+        return token + '\n'
+    elif token == '<br/><br/>':
+        return '<br/>'
+    return token
+
+def iter_chunk_deltas(generator):
+    """
+    Processes streaming text chunks from a generator.
+    
+    Yields only the new, formatted text of each chunk; callers accumulate it
+    (see `streaming.TextStream`) instead of re-concatenating the whole answer.
+    """
+    for raw_chunk in generator:
+        delta = chunk_delta(raw_chunk)
+        if delta:
+            yield delta
+
+async def iter_chunk_deltas_async(generator):
+    """Async counterpart of `iter_chunk_deltas` for async generators."""
+    async for raw_chunk in generator:
+        delta = chunk_delta(raw_chunk)
+        if delta:
+            yield delta
+
+def prepare_generation(text, previous_text, metadata, service_user_id):
+    """Scrub PHI from the message and history and audit-log the GPT request.
+
+    Returns:
+        Tuple of (scrubbed_text, scrubbed_history)
+    """
+    # Log GPT request
+    scrubbed_text = PHIScrubber.scrub_for_gpt(
+        text, 
+        patient_id=service_user_id
+    )
+    
+    # Also scrub conversation history
+    scrubbed_history = []
+    for msg in previous_text:
+        if isinstance(msg, dict) and 'content' in msg:
+            scrubbed_content = PHIScrubber.scrub_for_gpt(
+                msg['content'],
+                patient_id=service_user_id
+            )
+            scrubbed_history.append({
+                'role': msg['role'],
+                'content': scrubbed_content
+            })
+        else:
+            scrubbed_history.append(msg)
+    
+    # Log what was scrubbed
+    print(f"[PHI SCRUB] Original length: {len(text)}, Scrubbed length: {len(scrubbed_text)}")
+    if len(text) != len(scrubbed_text):
+        print("[PHI SCRUB] Scrubbed {}".format(scrubbed_text))
+
+    # Log GPT request with scrubbed flag
+    AuditLogger.log_gpt_request(
+        username=metadata.get('username'),
+        user_role='provider',
+        patient_id=service_user_id,
+        conversation_id=metadata.get('conversation_id'),
+        prompt_length=len(scrubbed_text),
+        response_length=0
+    )
+
+    return scrubbed_text, scrubbed_history
+
+def record_generation(text, accumulated_text, metadata, service_user_id):
+    """Persist the finished exchange and audit-log the completed response."""
+    # Update conversation in database
+    update_conversation(
+        metadata,
+        [
+            {'role': 'user', 'content': text},
+            {'role': 'system', 'content': accumulated_text}
+        ],
+        service_user_id
+    )
+    
+    # Log completion
+    AuditLogger.log_gpt_request(
+        username=metadata.get('username'),
+        user_role='provider',
+        patient_id=service_user_id,
+        conversation_id=metadata.get('conversation_id'),
+        prompt_length=len(text),
+        response_length=len(accumulated_text)
+    )
+
+def run_generation(
+    text,
+    previous_text,
+    model,
+    organization,
+    metadata,
+    service_user_id,
+    version,
+    generation_id,
+    cancel_token,
+    stream,
+    send,
+    loop,
+    session_store,
+    started_at,
+    final_attempt=True,
+    log_tag="BackgroundStream",
+):
+    """
+    Run one generation end to end on the calling (worker) thread.
+
+    Scrubs and audit-logs the request, streams `construct_response` through
+    `stream`, records the exchange, appends the answer to `session_store` and
+    schedules a background sidebar update. Used by the in-process thread mode and by
+    `app.generation_worker`.
+
+    Args:
+        previous_text: Session history, ending with the current user message
+        generation_id: Id reported in `generation_complete`
+        cancel_token: `CancellationToken` checked between chunks
+        stream: `TextStream` the answer is emitted through
+        send: `async fn(event, payload)` addressed to the generation's room
+        loop: Event loop `send` and `stream` emit on
+        session_store: Store the answer is appended to
+        started_at: `time.perf_counter()` when the request arrived, so
+            time-to-first-token includes scrubbing and tool turns
+        final_attempt: If False, errors are re-raised (for a retry) instead
+            of being shown to the user. Errors after the answer has been
+            appended to `session_store` are only logged, so a retry never
+            records the answer twice
+
+    Returns:
+        The `generation_complete` payload that was emitted
+    """
+    accumulated_text = ""
+    ttft = None
+    retrying = False
+    recorded = False  # answer appended to session_store
+    complete_payload = None
+
+    try:
+        scrubbed_text, scrubbed_history = prepare_generation(
+            text, previous_text, metadata, service_user_id
+        )
+
+        # Send scrubbed content to GPT
+        gen = construct_response(
+            scrubbed_text,  # Use scrubbed text
+            scrubbed_history,  # Use scrubbed history
+            model, 
+            organization,
+            version,
+            cancel_token,
+            metadata.get('conversation_id'),
+        )
+        
+        for delta in iter_chunk_deltas(gen):
+            cancel_token.check()
+            if ttft is None:
+                ttft = time.perf_counter() - started_at
+                metrics.observe("generation_ttft_seconds", ttft, version=version)
+                print(f"[{log_tag}] TTFT {ttft:.2f}s for {generation_id}")
+            stream.push(delta)
+        
+        stream.close()
+        accumulated_text = stream.text
+        record_generation(text, accumulated_text, metadata, service_user_id)
+        answer = {"role": "assistant", "content": accumulated_text}
+        session_store.append(metadata['conversation_id'], answer)
+        recorded = True
+        print(f"[{log_tag}] Scheduling sidebar update...")
+        schedule_update(
+            metadata.get('conversation_id'),
+            previous_text + [answer],
+            lambda payload: asyncio.run_coroutine_threadsafe(send("goals_update", payload), loop),
+            cancel_token,
+        )
+
+    except GenerationCancelled as e:
+        print(f"[{log_tag}] {e} for {generation_id}")
+        metrics.increment("generations_cancelled_total", reason=e.reason)
+        stream.close()
+        accumulated_text = stream.text
+        if e.reason == "stop" and accumulated_text and not recorded:
+            # Keep what the user already saw so follow-ups have context
+            session_store.append(
+                metadata['conversation_id'], {"role": "assistant", "content": accumulated_text}
+            )
+
+    except Exception as e:
+        print(f"[{log_tag}] Error: {e}")
+        # Once the answer is in the history the user already has it; a
+        # retry would only append it a second time
+        if not recorded:
+            if not final_attempt:
+                retrying = True
+                raise
+            stream.replace(f"Sorry, something went wrong: {e}")
+
+    finally:
+        if not retrying:
+            metrics.observe(
+                "generation_total_seconds", time.perf_counter() - started_at, version=version
+            )
+            complete_payload = {
+                "message": "Response generation complete.",
+                "generation_id": generation_id,
+                "ttft_ms": round(ttft * 1000) if ttft is not None else None,
+                "cancelled": cancel_token.cancelled,
+            }
+            asyncio.run_coroutine_threadsafe(send("generation_complete", complete_payload), loop)
+
+    return complete_payload
@@ -0,0 +1,241 @@
+"""Durable generation job queue in Postgres.
+
+With `GENERATION_MODE=worker`, `start_generation` enqueues a row in
+`generation_jobs` instead of generating in the web process. Worker processes
+(`python -m app.generation_worker`) claim rows with
+`FOR UPDATE SKIP LOCKED`, so several workers never take the same job, and
+hold them under a visibility timeout they keep extending with heartbeats. If
+a worker dies, its lease runs out and another worker retries the job, up to
+`max_attempts`. Calls share a connection pool of up to
+`GENERATION_JOB_POOL_SIZE` connections per process.
+
+Statuses: queued -> running -> succeeded | failed | cancelled.
+"""
+
+import json
+import os
+import threading
+
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+from app.database import CONNECTION_STRING
+from app.triage import PRIORITIES
+
+# Seconds a claimed job stays invisible to other workers without a heartbeat
+VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get("GENERATION_JOB_VISIBILITY_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("GENERATION_JOB_MAX_ATTEMPTS", 3))
+
+# Connections shared by the claim loop, heartbeats and the web process's
+# enqueue/status calls; every poll used to open its own connection
+POOL_MAX_SIZE = int(os.environ.get("GENERATION_JOB_POOL_SIZE", 10))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _create_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS generation_jobs (
+            id TEXT PRIMARY KEY,
+            conversation_id TEXT,
+            username TEXT,
+            priority TEXT NOT NULL DEFAULT 'routine',
+            priority_rank INTEGER NOT NULL DEFAULT 2,
+            status TEXT NOT NULL DEFAULT 'queued',
+            payload JSONB NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            locked_by TEXT,
+            locked_until TIMESTAMPTZ,
+            cancel_reason TEXT,
+            last_seq INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE INDEX IF NOT EXISTS generation_jobs_claim_idx
+        ON generation_jobs (priority_rank, created_at)
+        WHERE status IN ('queued', 'running')
+        """
+    )
+
+
+def _connect():
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(
+                    CONNECTION_STRING,
+                    min_size=1,
+                    max_size=POOL_MAX_SIZE,
+                    kwargs={"row_factory": dict_row},
+                    open=True,
+                )
+                with pool.connection() as conn:
+                    _create_table(conn)
+                _pool = pool
+    return _pool.connection()
+
+
+def enqueue_job(job_id: str, payload: dict, conversation_id: str, username: str, priority: str):
+    """
+    Add a generation to the queue.
+
+    Args:
+        job_id: Generation id (also the Socket.IO room the worker emits to)
+        payload: JSON-serializable arguments for `generation.run_generation`
+        conversation_id: Conversation the job belongs to
+        username: Provider who asked, for the status API
+        priority: Triage priority; crisis jobs are claimed first
+    """
+    with _connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO generation_jobs
+                (id, conversation_id, username, priority, priority_rank, payload, max_attempts)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                job_id, conversation_id, username, priority,
+                PRIORITIES.index(priority), json.dumps(payload), MAX_ATTEMPTS,
+            ),
+        )
+
+
+def claim_job(worker_id: str, visibility_timeout: int = VISIBILITY_TIMEOUT_SECONDS):
+    """
+    Claim the next runnable job: queued, or running with an expired lease.
+
+    Returns:
+        Job row as a dict (with `attempts` already incremented), or None
+    """
+    with _connect() as conn:
+        return conn.execute(
+            """
+            UPDATE generation_jobs SET
+                status = 'running',
+                attempts = attempts + 1,
+                locked_by = %s,
+                locked_until = now() + make_interval(secs => %s),
+                updated_at = now()
+            WHERE id = (
+                SELECT id FROM generation_jobs
+                WHERE cancel_reason IS NULL
+                  AND attempts < max_attempts
+                  AND (status = 'queued' OR (status = 'running' AND locked_until < now()))
+                ORDER BY priority_rank, created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            (worker_id, visibility_timeout),
+        ).fetchone()
+
+
+def heartbeat(job_id: str, worker_id: str, last_seq: int, visibility_timeout: int = VISIBILITY_TIMEOUT_SECONDS):
+    """
+    Extend a claimed job's lease and record the last emitted sequence number.
+
+    Returns:
+        The cancel reason if cancellation was requested, "lost" if another
+        worker took the job over, else None
+    """
+    with _connect() as conn:
+        row = conn.execute(
+            """
+            UPDATE generation_jobs SET
+                locked_until = now() + make_interval(secs => %s),
+                last_seq = %s,
+                updated_at = now()
+            WHERE id = %s AND locked_by = %s AND status = 'running'
+            RETURNING cancel_reason
+            """,
+            (visibility_timeout, last_seq, job_id, worker_id),
+        ).fetchone()
+    if row is None:
+        return "lost"
+    return row["cancel_reason"]
+
+
+def finish_job(job_id: str, worker_id: str, status: str, result: str = None, error: str = None):
+    """Mark a claimed job succeeded, cancelled or failed."""
+    with _connect() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET
+                status = %s, result = %s, error = %s,
+                locked_by = NULL, locked_until = NULL, updated_at = now()
+            WHERE id = %s AND locked_by = %s
+            """,
+            (status, result, error, job_id, worker_id),
+        )
+
+
+def retry_job(job_id: str, worker_id: str, error: str):
+    """Release a claimed job after an error: re-queue it, or fail it for good."""
+    with _connect() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET
+                status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                error = %s, locked_by = NULL, locked_until = NULL, updated_at = now()
+            WHERE id = %s AND locked_by = %s
+            """,
+            (error, job_id, worker_id),
+        )
+
+
+def fail_exhausted_jobs():
+    """Fail jobs whose lease expired on their last attempt (the worker died)."""
+    with _connect() as conn:
+        return conn.execute(
+            """
+            UPDATE generation_jobs SET
+                status = 'failed', error = 'worker lease expired',
+                locked_by = NULL, locked_until = NULL, updated_at = now()
+            WHERE status = 'running' AND locked_until < now() AND attempts >= max_attempts
+            RETURNING id
+            """
+        ).fetchall()
+
+
+def request_cancel(job_id: str, reason: str):
+    """
+    Ask for a job to stop. Queued jobs are cancelled at once; running ones
+    stop at their worker's next heartbeat.
+    """
+    with _connect() as conn:
+        conn.execute(
+            """
+            UPDATE generation_jobs SET
+                cancel_reason = COALESCE(cancel_reason, %s),
+                status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                updated_at = now()
+            WHERE id = %s AND status IN ('queued', 'running')
+            """,
+            (reason, job_id),
+        )
+
+
+def get_job(job_id: str):
+    """Return a job's status fields (without its payload), or None."""
+    with _connect() as conn:
+        return conn.execute(
+            """
+            SELECT id, conversation_id, username, priority, status, attempts, max_attempts,
+                   locked_by, locked_until, cancel_reason, last_seq, result, error,
+                   created_at, updated_at
+            FROM generation_jobs WHERE id = %s
+            """,
+            (job_id,),
+        ).fetchone()
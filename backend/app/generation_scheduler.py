@@ -0,0 +1,315 @@
+"""Bounded, fair scheduling of chat generations.
+
+`start_generation` acquires a slot from the scheduler before any LLM work
+starts. At most `max_concurrent` generations run at once; the rest wait in a
+queue that is served round-robin across organizations and, within an
+organization, across users, so one busy provider cannot starve everyone else.
+When the queue is full the request is rejected with a retry-after hint.
+
+Messages triaged as "crisis" or "urgent" (see `app.triage`) wait in their
+own lanes, are always dispatched before routine work, and may use a reserved
+slice of the concurrency that routine generations cannot take. Crisis
+messages are never rejected.
+
+All methods must be called from the event loop thread. Worker threads hand
+slots back with `loop.call_soon_threadsafe(scheduler.release, ticket)`.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import OrderedDict, deque
+
+from app import metrics
+from app.triage import PRIORITIES, PRIORITY_CRISIS, PRIORITY_ROUTINE
+
+
+class QueueFullError(Exception):
+    """Raised when a generation cannot be queued; carries a retry-after hint."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GenerationTicket:
+    """A single generation request waiting for, or holding, a slot."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, sid: str, user: str, org: str, priority: str = PRIORITY_ROUTINE):
+        self.id = next(self._ids)
+        self.sid = sid
+        self.user = user
+        self.org = org
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.position = None
+        self.future = None
+
+
+class GenerationScheduler:
+    """Global concurrency cap with per-org / per-user round-robin queuing."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 100,
+        max_queued_per_user: int = 3,
+        reserved_priority_slots: int = 2,
+        on_queue_position=None,
+    ):
+        """
+        Args:
+            max_concurrent: Generations allowed to run at the same time
+            max_queue: Total waiting generations before new ones are rejected
+            max_queued_per_user: Waiting generations allowed per user
+            reserved_priority_slots: Slots only crisis/urgent generations may use
+            on_queue_position: Optional `async fn(ticket, position, queue_length)`
+                called whenever a waiting ticket's position changes
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queued_per_user = max_queued_per_user
+        self.reserved_priority_slots = min(reserved_priority_slots, max_concurrent - 1)
+        self.on_queue_position = on_queue_position
+
+        self._running = set()
+        # priority -> org -> user -> deque[ticket]
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._queued = 0
+        self._avg_run_seconds = 10.0  # EWMA, used for retry-after estimates
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    async def acquire(
+        self,
+        sid: str,
+        user: str,
+        org: str,
+        priority: str = PRIORITY_ROUTINE,
+    ) -> GenerationTicket:
+        """
+        Wait for a generation slot.
+
+        Raises:
+            QueueFullError: The queue (or this user's share of it) is full
+            asyncio.CancelledError: The wait was cancelled (e.g. disconnect)
+        """
+        ticket = GenerationTicket(sid, user or sid, org or "default", priority)
+
+        if self._has_capacity(priority) and not self._waiting_at_or_above(priority):
+            self._start(ticket)
+            return ticket
+
+        if priority != PRIORITY_CRISIS:
+            if self._queued >= self.max_queue:
+                self._reject(ticket, "The assistant is very busy right now.")
+            if self._user_queue_length(ticket) >= self.max_queued_per_user:
+                self._reject(ticket, "You already have several messages waiting.")
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        lane = self._queues[priority]
+        lane.setdefault(ticket.org, OrderedDict()).setdefault(ticket.user, deque()).append(ticket)
+        self._queued += 1
+        self._publish_positions()
+
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._running:
+                # Granted a slot just as the wait was cancelled; hand it back
+                self.release(ticket)
+            else:
+                self._remove_waiting(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: GenerationTicket):
+        """Return a slot and dispatch the next waiting generation, if any."""
+        if ticket not in self._running:
+            return
+        self._running.discard(ticket)
+
+        run_seconds = time.perf_counter() - ticket.started_at
+        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * run_seconds
+        metrics.observe("generation_run_seconds", run_seconds)
+
+        self._dispatch()
+
+    def cancel_waiting(self, sid: str):
+        """Cancel every queued (not yet running) generation for a socket."""
+        for ticket in list(self._iter_waiting()):
+            if ticket.sid == sid and not ticket.future.done():
+                ticket.future.cancel()
+
+    def stats(self) -> dict:
+        """Current running and queued counts, overall and per priority."""
+        return {
+            "running": len(self._running),
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "reserved_priority_slots": self.reserved_priority_slots,
+            "queued_by_priority": {
+                priority: sum(len(t) for users in lane.values() for t in users.values())
+                for priority, lane in self._queues.items()
+            },
+            "running_by_priority": {
+                priority: sum(1 for t in self._running if t.priority == priority)
+                for priority in PRIORITIES
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _start(self, ticket: GenerationTicket):
+        ticket.started_at = time.perf_counter()
+        self._running.add(ticket)
+        metrics.observe(
+            "generation_queue_wait_seconds",
+            ticket.started_at - ticket.enqueued_at,
+            priority=ticket.priority,
+        )
+        self._update_gauges()
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.set_result(ticket)
+
+    def _reject(self, ticket: GenerationTicket, reason: str):
+        retry_after = self._retry_after()
+        metrics.increment("generation_rejections_total", org=ticket.org)
+        print(f"[Scheduler] Rejected {ticket.sid} ({ticket.user}/{ticket.org}): {reason}")
+        raise QueueFullError(reason, retry_after)
+
+    def _retry_after(self) -> float:
+        """Rough time until a slot frees up for a new request."""
+        waves = (self._queued + 1) / max(1, self.max_concurrent)
+        return round(max(1.0, waves * self._avg_run_seconds), 1)
+
+    def _has_capacity(self, priority: str) -> bool:
+        """Routine work may not use the slots reserved for crisis/urgent."""
+        limit = self.max_concurrent
+        if priority == PRIORITY_ROUTINE:
+            limit -= self.reserved_priority_slots
+        return len(self._running) < limit
+
+    def _waiting_at_or_above(self, priority: str) -> bool:
+        for lane_priority in PRIORITIES:
+            if self._queues[lane_priority]:
+                return True
+            if lane_priority == priority:
+                return False
+        return False
+
+    def _user_queue_length(self, ticket: GenerationTicket) -> int:
+        return sum(
+            len(lane.get(ticket.org, {}).get(ticket.user, ()))
+            for lane in self._queues.values()
+        )
+
+    def _iter_waiting(self):
+        for lane in self._queues.values():
+            for users in lane.values():
+                for tickets in users.values():
+                    yield from tickets
+
+    def _remove_waiting(self, ticket: GenerationTicket):
+        lane = self._queues[ticket.priority]
+        users = lane.get(ticket.org)
+        if not users or ticket.user not in users:
+            return
+        tickets = users[ticket.user]
+        if ticket in tickets:
+            tickets.remove(ticket)
+            self._queued -= 1
+        if not tickets:
+            del users[ticket.user]
+        if not users:
+            del lane[ticket.org]
+        self._publish_positions()
+
+    def _pop_next(self, lane: OrderedDict):
+        """Take the next ticket from a lane: round-robin over orgs, then users."""
+        while lane:
+            org, users = next(iter(lane.items()))
+            user, tickets = next(iter(users.items()))
+            ticket = tickets.popleft()
+            self._queued -= 1
+
+            # Rotate so the next pick comes from another user / org
+            if tickets:
+                users.move_to_end(user)
+            else:
+                del users[user]
+            if users:
+                lane.move_to_end(org)
+            else:
+                del lane[org]
+
+            if not ticket.future.done():  # skip cancelled waiters
+                return ticket
+        return None
+
+    def _dispatch(self):
+        """Start waiting tickets, highest priority lane first, while slots allow."""
+        started = True
+        while started:
+            started = False
+            for priority in PRIORITIES:
+                if not self._queues[priority] or not self._has_capacity(priority):
+                    continue
+                ticket = self._pop_next(self._queues[priority])
+                if ticket is not None:
+                    self._start(ticket)
+                    started = True
+                    break
+        self._publish_positions()
+
+    def _dispatch_order(self) -> list:
+        """Simulate dispatch order (lanes by priority) without mutating queues."""
+        order = []
+        for priority in PRIORITIES:
+            order.extend(self._lane_order(self._queues[priority]))
+        return order
+
+    @staticmethod
+    def _lane_order(lane: OrderedDict) -> list:
+        """Simulate `_pop_next` over one lane without mutating it."""
+        queues = OrderedDict(
+            (org, OrderedDict((user, deque(tickets)) for user, tickets in users.items()))
+            for org, users in lane.items()
+        )
+        order = []
+        while queues:
+            org, users = next(iter(queues.items()))
+            user, tickets = next(iter(users.items()))
+            order.append(tickets.popleft())
+            if tickets:
+                users.move_to_end(user)
+            else:
+                del users[user]
+            if users:
+                queues.move_to_end(org)
+            else:
+                del queues[org]
+        return order
+
+    def _publish_positions(self):
+        """Tell waiting clients their (1-based) place in line when it changes."""
+        self._update_gauges()
+        if self.on_queue_position is None:
+            return
+        waiting = [t for t in self._dispatch_order() if not t.future.done()]
+        for position, ticket in enumerate(waiting, 1):
+            if ticket.position != position:
+                ticket.position = position
+                asyncio.ensure_future(self.on_queue_position(ticket, position, len(waiting)))
+
+    def _update_gauges(self):
+        metrics.set_gauge("generation_running", len(self._running))
+        metrics.set_gauge("generation_queued", self._queued)
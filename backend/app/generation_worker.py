@@ -0,0 +1,191 @@
+"""Generation worker process for `GENERATION_MODE=worker`.
+
+Claims jobs from `generation_jobs` (see `app.generation_jobs`) and runs them
+with `generation.run_generation`. Deltas, sidebar updates and
+`generation_complete` go to the job's Socket.IO room through a write-only
+message-queue client manager, so the web process that holds the socket
+delivers them. Needs `SOCKETIO_MESSAGE_QUEUE` and, so that the web process
+sees the answers, `SESSION_STORE=postgres`.
+
+Each worker process runs `GENERATION_WORKER_CONCURRENCY` generations at a
+time. While a job runs, a heartbeat extends its lease, records the last
+emitted seq, and picks up cancellation requests from the web process.
+
+Usage:
+    python -m app.generation_worker
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import threading
+import time
+
+from app import metrics
+from app.cancellation import CancellationToken
+from app.generation import run_generation
+from app.generation_jobs import (
+    VISIBILITY_TIMEOUT_SECONDS,
+    claim_job,
+    fail_exhausted_jobs,
+    finish_job,
+    heartbeat,
+    retry_job,
+)
+from app.session_store import create_session_store
+from app.socketio_manager import create_client_manager
+from app.streaming import TextStream
+
+WORKER_CONCURRENCY = int(os.environ.get("GENERATION_WORKER_CONCURRENCY", 4))
+POLL_SECONDS = float(os.environ.get("GENERATION_WORKER_POLL_SECONDS", 1.0))
+HEARTBEAT_SECONDS = max(1, VISIBILITY_TIMEOUT_SECONDS // 3)
+GENERATION_DEADLINE_SECONDS = float(os.environ.get("GENERATION_DEADLINE_SECONDS", 300))
+
+# A retried job restarts its stream this far past the last recorded seq, so
+# clients treat the retry's first snapshot as newer than anything they saw
+RETRY_SEQ_GAP = 100000
+
+
+def _room_sender(manager, room):
+    async def send(event, payload):
+        await manager.emit(event, payload, namespace="/", room=room)
+    return send
+
+
+def _heartbeat_loop(job, worker_id, token, stream, done):
+    """Extend the lease until `done` is set; cancel the token if asked to."""
+    while not done.wait(HEARTBEAT_SECONDS):
+        try:
+            reason = heartbeat(job["id"], worker_id, stream.seq)
+        except Exception as e:
+            print(f"[Worker] Heartbeat failed for {job['id']}: {e}")
+            continue
+        if reason:
+            token.cancel(reason)
+
+
+def run_job(job, worker_id, manager, loop, store):
+    """Run one claimed job to completion, cancellation or retry."""
+    payload = job["payload"]
+    send = _room_sender(manager, job["id"])
+    token = CancellationToken(GENERATION_DEADLINE_SECONDS)
+    stream = TextStream(send, loop, payload.get("protocol"))
+    final_attempt = job["attempts"] >= job["max_attempts"]
+
+    if job["attempts"] > 1:
+        # Retry after a crash or error: reset what the client has shown
+        stream.seq = job["last_seq"] + RETRY_SEQ_GAP
+        stream.replace("")
+        metrics.increment("generation_job_retries_total")
+
+    done = threading.Event()
+    threading.Thread(
+        target=_heartbeat_loop, args=(job, worker_id, token, stream, done), daemon=True
+    ).start()
+    metrics.observe(
+        "generation_job_wait_seconds", time.time() - job["created_at"].timestamp()
+    )
+    try:
+        run_generation(
+            payload["text"],
+            payload["history"],
+            payload["model"],
+            payload["organization"],
+            payload["metadata"],
+            payload["service_user_id"],
+            payload["version"],
+            job["id"],
+            token,
+            stream,
+            send,
+            loop,
+            store,
+            time.perf_counter(),
+            final_attempt=final_attempt,
+            log_tag="Worker",
+        )
+    except Exception as e:
+        retry_job(job["id"], worker_id, str(e))
+        return
+    finally:
+        done.set()
+
+    status = "cancelled" if token.cancelled else "succeeded"
+    finish_job(job["id"], worker_id, status, result=stream.text)
+    metrics.increment("generation_jobs_total", status=status)
+
+
+def _worker_thread(worker_id, manager, loop, store, stopping):
+    while not stopping.is_set():
+        try:
+            job = claim_job(worker_id)
+        except Exception as e:
+            print(f"[Worker] Claim failed: {e}")
+            job = None
+        if job is None:
+            stopping.wait(POLL_SECONDS)
+            continue
+        print(f"[Worker] {worker_id} claimed {job['id']} (attempt {job['attempts']})")
+        run_job(job, worker_id, manager, loop, store)
+
+
+async def _reap_expired(manager, stopping):
+    """Tell clients about jobs that ran out of attempts because workers died."""
+    while not stopping.is_set():
+        try:
+            rows = await asyncio.to_thread(fail_exhausted_jobs)
+        except Exception as e:
+            print(f"[Worker] Reaper failed: {e}")
+            rows = []
+        for row in rows:
+            await manager.emit(
+                "generation_update",
+                {"chunk": "Sorry, something went wrong while generating this answer."},
+                namespace="/", room=row["id"],
+            )
+            await manager.emit(
+                "generation_complete",
+                {"message": "Response generation failed.", "generation_id": row["id"], "cancelled": False},
+                namespace="/", room=row["id"],
+            )
+        await asyncio.sleep(VISIBILITY_TIMEOUT_SECONDS)
+
+
+async def main():
+    manager = create_client_manager(write_only=True)
+    if manager is None:
+        raise SystemExit("GENERATION workers need SOCKETIO_MESSAGE_QUEUE to reach clients")
+    if os.environ.get("SESSION_STORE", "memory").lower() != "postgres":
+        print("[Worker] Warning: SESSION_STORE is not postgres; answers won't reach web-process history")
+
+    loop = asyncio.get_running_loop()
+    store = create_session_store()
+    stopping = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Finish running jobs, stop claiming new ones
+        loop.add_signal_handler(sig, stopping.set)
+
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(
+            target=_worker_thread,
+            args=(f"{base_id}-{i}", manager, loop, store, stopping),
+            daemon=True,
+        )
+        for i in range(WORKER_CONCURRENCY)
+    ]
+    for thread in threads:
+        thread.start()
+    print(f"[Worker] {base_id} running {WORKER_CONCURRENCY} generation threads")
+
+    reaper = asyncio.create_task(_reap_expired(manager, stopping))
+    while any(thread.is_alive() for thread in threads):
+        await asyncio.sleep(0.5)
+    reaper.cancel()
+    await asyncio.sleep(0.5)  # let the last emits flush
+    print(f"[Worker] {base_id} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,317 @@
+"""Content-addressed cache for deterministic internal LLM calls.
+
+Some internal calls are pure functions of their inputs: refining a resource
+list, extracting a location from a resource description, the legacy
+pipeline's goal/followup/resource prompts. Re-running ingestion or the
+legacy pipeline on unchanged data used to pay for every one of them again.
+
+A call opts in by passing `cache="<template>:v<N>"` to `llm_client.create`.
+The key is a SHA-256 over that template name and version, the model (the
+explicit `model`, or every candidate of the routed purpose) and the full
+request (messages, response_format, temperature, ...). Editing a prompt
+changes the messages and so the key; bumping the version invalidates a
+template whose output handling changed without its text changing.
+
+Some cached prompts carry the user's situation and conversation, so the
+cache is off unless explicitly configured. `LLM_CACHE` selects the store:
+
+* "off" (default): no caching.
+* "postgres": a shared `llm_cache` table, created on first use, in the
+  same database as the conversations.
+* "sqlite": an unencrypted local file at `LLM_CACHE_PATH`, bounded to
+  `LLM_CACHE_MAX_ENTRIES` by evicting the least recently used entries;
+  meant for ingestion runs on a trusted machine.
+
+Metrics: `llm_cache_lookups_total{template,outcome=hit|miss}` and the
+`llm_cache_hit_rate{template}` gauge. `scripts/llm_cache_stats.py` reports
+stored entries and lifetime hits per template.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from app import metrics
+
+LLM_CACHE = os.environ.get("LLM_CACHE", "off").lower()
+LLM_CACHE_PATH = os.environ.get(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", ".cache", "llm_cache.sqlite3"),
+)
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 20000))
+# Inserts between checks of the sqlite entry bound
+_PRUNE_EVERY = 50
+
+
+def _canonical(value):
+    """JSON fallback for request values such as pydantic response_format classes."""
+    if hasattr(value, "model_json_schema"):
+        return value.model_json_schema()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return repr(value)
+
+
+def cache_key(template: str, model: str, request: dict) -> str:
+    """
+    Hash one cacheable call.
+
+    Args:
+        template: Prompt template name and version, e.g. "refine_resources:v1"
+        model: Model (or routed candidates) the call may run on
+        request: Request arguments; `stream` is ignored
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    payload = {
+        "template": template,
+        "model": model,
+        "request": {k: v for k, v in request.items() if k != "stream"},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_canonical)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Interface shared by the cache backends; values are completion JSON strings."""
+
+    def get(self, key: str):
+        """Return the stored value for `key`, or None."""
+        raise NotImplementedError
+
+    def set(self, key: str, template: str, value: str):
+        """Store `value` under `key`, replacing any previous value."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Template -> {"entries": ..., "hits": ...} for the stored entries."""
+        raise NotImplementedError
+
+    def clear(self, template: str = None):
+        """Drop every entry, or only those of one template."""
+        raise NotImplementedError
+
+
+class SqliteLLMCache(LLMCache):
+    """Local file cache with least-recently-used eviction."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._writes = 0
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    template TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+        return row[0]
+
+    def set(self, key: str, template: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_cache (key, template, value, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, template, value, now, now),
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        if count > self._max_entries:
+            self._conn.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?
+                )
+                """,
+                (count - self._max_entries,),
+            )
+            print(f"[LLM Cache] Evicted {count - self._max_entries} least recently used entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT template, COUNT(*), SUM(hits) FROM llm_cache GROUP BY template"
+            ).fetchall()
+        return {template: {"entries": entries, "hits": hits or 0} for template, entries, hits in rows}
+
+    def clear(self, template: str = None):
+        with self._lock:
+            if template is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute("DELETE FROM llm_cache WHERE template = ?", (template,))
+            self._conn.commit()
+
+
+class PostgresLLMCache(LLMCache):
+    """Cache shared by all app instances and ingestion runs, in the `llm_cache` table."""
+
+    def __init__(self, connection_string: str = None):
+        # Imported here so the sqlite cache needs no database driver
+        import psycopg
+        from app.database import CONNECTION_STRING
+
+        self._psycopg = psycopg
+        self._connection_string = connection_string or CONNECTION_STRING
+        self._table_ready = False
+
+    def _connect(self):
+        conn = self._psycopg.connect(self._connection_string)
+        if not self._table_ready:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    template TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_used TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    def get(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "UPDATE llm_cache SET last_used = now(), hits = hits + 1 WHERE key = %s RETURNING value",
+                (key,),
+            ).fetchone()
+            conn.commit()
+        return row[0] if row else None
+
+    def set(self, key: str, template: str, value: str):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO llm_cache (key, template, value) VALUES (%s, %s, %s)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, last_used = now()
+                """,
+                (key, template, value),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT template, COUNT(*), SUM(hits) FROM llm_cache GROUP BY template"
+            ).fetchall()
+        return {template: {"entries": entries, "hits": hits or 0} for template, entries, hits in rows}
+
+    def clear(self, template: str = None):
+        with self._connect() as conn:
+            if template is None:
+                conn.execute("DELETE FROM llm_cache")
+            else:
+                conn.execute("DELETE FROM llm_cache WHERE template = %s", (template,))
+            conn.commit()
+
+
+def create_llm_cache():
+    """Build the cache selected by `LLM_CACHE`, or None when it is off."""
+    if LLM_CACHE == "postgres":
+        print("[LLM Cache] Using Postgres llm_cache table")
+        return PostgresLLMCache()
+    if LLM_CACHE == "sqlite":
+        print(f"[LLM Cache] Using local file {LLM_CACHE_PATH}")
+        return SqliteLLMCache()
+    return None
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+_LOOKUPS = defaultdict(lambda: [0, 0])  # template -> [hits, lookups] in this process
+
+
+def get_cache():
+    """The process-wide cache, built on first use (None when disabled)."""
+    global _CACHE
+    if _CACHE is None and LLM_CACHE in ("postgres", "sqlite"):
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = create_llm_cache()
+    return _CACHE
+
+
+def _count(template: str, hit: bool):
+    metrics.increment("llm_cache_lookups_total", template=template, outcome="hit" if hit else "miss")
+    with _CACHE_LOCK:
+        counts = _LOOKUPS[template]
+        counts[0] += int(hit)
+        counts[1] += 1
+        rate = counts[0] / counts[1]
+    metrics.set_gauge("llm_cache_hit_rate", rate, template=template)
+
+
+def lookup(template: str, key: str):
+    """
+    Fetch a cached value, counting the hit or miss.
+
+    A cache that cannot be read (e.g. Postgres is down) counts as a miss, so
+    the call still goes to the model.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        print(f"[LLM Cache] Lookup failed for {template}: {e}")
+        value = None
+    _count(template, value is not None)
+    return value
+
+
+def store(template: str, key: str, value: str):
+    """Save a value; failures are logged and otherwise ignored."""
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.set(key, template, value)
+    except Exception as e:
+        print(f"[LLM Cache] Store failed for {template}: {e}")
+
+
+def hit_rates() -> dict:
+    """Template -> (hits, lookups) since this process started."""
+    with _CACHE_LOCK:
+        return {template: tuple(counts) for template, counts in _LOOKUPS.items()}
@@ -0,0 +1,347 @@
+"""Shared OpenAI client with deadlines, retries and optional hedging.
+
+Every chat completion in the app goes through `create` / `parse` (or the
+async `acreate` / `aparse`), which add:
+
+* connect and read deadlines (`LLM_CONNECT_TIMEOUT_SECONDS`,
+  `LLM_READ_TIMEOUT_SECONDS`) on shared, pooled clients;
+* up to `LLM_MAX_ATTEMPTS` attempts on retryable errors (timeouts,
+  connection errors, 408/409/429 and 5xx), with full-jitter exponential
+  backoff;
+* optional hedging for non-streaming calls (`LLM_HEDGE_ENABLED=1`): if the
+  first request has not answered by the p95 latency of that call's purpose,
+  an identical second request is sent and the first result wins.
+
+For streaming calls, retries cover opening the stream only. Once content
+has been forwarded, a failure cannot be replayed without duplicating text.
+
+Requests without a `model` are routed by `app.model_router`: every attempt
+(and every hedge) asks the router for a candidate model and endpoint, so a
+retry after a failure goes to a different deployment when the route has one.
+
+Non-streaming `create` calls that are pure functions of their inputs can
+opt into `app.llm_cache` with `cache="<template>:v<N>"`; a hit skips the
+request entirely.
+
+Metrics, labelled by `purpose` (tool_loop, sidebar, check_ins, ...):
+`llm_call_seconds`, `llm_attempts`, `llm_retries_total{error}`,
+`llm_hedges_total{winner}` and `llm_failures_total`.
+`OPENAI_BASE_URL` points the clients at a local fake server
+(`scripts/check_llm_client.py`).
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import random
+import threading
+import time
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from app import llm_cache, metrics, model_router
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("LLM_CONNECT_TIMEOUT_SECONDS", 5))
+READ_TIMEOUT_SECONDS = float(os.environ.get("LLM_READ_TIMEOUT_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("LLM_MAX_ATTEMPTS", 3))
+BACKOFF_BASE_SECONDS = float(os.environ.get("LLM_BACKOFF_BASE_SECONDS", 0.5))
+BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", 4))
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "0") == "1"
+# Hedge delay used until a purpose has enough latency samples for a p95
+HEDGE_DEFAULT_SECONDS = float(os.environ.get("LLM_HEDGE_DEFAULT_SECONDS", 8))
+HEDGE_MIN_SAMPLES = 20
+
+_RETRYABLE_STATUS = {408, 409, 429}
+
+_clients = {}  # (endpoint, asynchronous) -> client
+_client_lock = threading.Lock()
+# Runs hedged pairs of blocking calls; the losing request finishes in the background
+_HEDGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_HEDGE_WORKERS", 8)),
+    thread_name_prefix="llm-hedge",
+)
+
+
+def _client_options(endpoint: str) -> dict:
+    config = model_router.get_router().endpoints[endpoint]
+    return {
+        "api_key": os.environ.get(config.get("api_key_env", "SECRET_KEY")),
+        # None keeps the SDK default (or OPENAI_BASE_URL)
+        "base_url": config.get("base_url"),
+        "timeout": openai.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+        # Retries are handled here so they are jittered, counted and bounded in one place
+        "max_retries": 0,
+    }
+
+
+def client(endpoint: str = "openai") -> openai.OpenAI:
+    """The shared blocking client for an endpoint (one connection pool each)."""
+    key = (endpoint, False)
+    if key not in _clients:
+        with _client_lock:
+            if key not in _clients:
+                _clients[key] = openai.OpenAI(**_client_options(endpoint))
+    return _clients[key]
+
+
+def async_client(endpoint: str = "openai") -> openai.AsyncOpenAI:
+    """The shared asyncio client for an endpoint."""
+    key = (endpoint, True)
+    if key not in _clients:
+        with _client_lock:
+            if key not in _clients:
+                _clients[key] = openai.AsyncOpenAI(**_client_options(endpoint))
+    return _clients[key]
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in _RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Full-jitter backoff before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+
+
+def hedge_delay(purpose: str) -> float:
+    """Seconds to wait before hedging: the purpose's p95, once there are enough samples."""
+    if metrics.sample_count("llm_call_seconds", purpose=purpose) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_SECONDS
+    return metrics.percentile("llm_call_seconds", 0.95, purpose=purpose)
+
+
+def _record(purpose: str, started: float, attempts: int):
+    metrics.observe("llm_call_seconds", time.perf_counter() - started, purpose=purpose)
+    metrics.observe("llm_attempts", attempts, purpose=purpose)
+
+
+def _give_up(purpose: str, attempt: int, exc: Exception) -> bool:
+    """Whether `exc` on `attempt` is final; otherwise count the retry."""
+    if attempt >= MAX_ATTEMPTS or not is_retryable(exc):
+        metrics.increment("llm_failures_total", purpose=purpose)
+        return True
+    metrics.increment("llm_retries_total", purpose=purpose, error=type(exc).__name__)
+    return False
+
+
+def _prepare(purpose: str, kind: str, request: dict, exclude: set, asynchronous: bool = False):
+    """
+    Choose where one attempt goes.
+
+    Returns:
+        Tuple of (router candidate or None for an explicit model, bound
+        client method, request with the model filled in)
+    """
+    if "model" in request:
+        candidate, endpoint = None, "openai"
+    else:
+        candidate = model_router.get_router().select(purpose, exclude)
+        endpoint = candidate.endpoint
+        request = dict(request, model=candidate.model)
+    api = async_client(endpoint) if asynchronous else client(endpoint)
+    fn = api.chat.completions.create if kind == "create" else api.beta.chat.completions.parse
+    return candidate, fn, request
+
+
+def _failed(candidate, exc: Exception, exclude: set):
+    if candidate is not None and is_retryable(exc):
+        model_router.get_router().record_failure(candidate)
+        exclude.add(candidate)
+
+
+def _succeeded(candidate, started: float):
+    if candidate is not None:
+        model_router.get_router().record_success(candidate, time.perf_counter() - started)
+
+
+def probe_endpoint(endpoint: str):
+    """Cheap health probe for `model_router.check_health`: list the endpoint's models."""
+    client(endpoint).with_options(timeout=CONNECT_TIMEOUT_SECONDS).models.list()
+
+
+def check_model_health():
+    """Scheduler job: probe every configured endpoint."""
+    model_router.get_router().check_health(probe_endpoint)
+
+
+# ---- Blocking calls ----
+
+def _attempt(candidate, fn, request: dict, exclude: set):
+    started = time.perf_counter()
+    try:
+        result = fn(**request)
+    except Exception as e:
+        _failed(candidate, e, exclude)
+        raise
+    _succeeded(candidate, started)
+    return result
+
+
+def _hedged(purpose: str, kind: str, request: dict, exclude: set):
+    """One attempt, plus a second copy if the first is slower than the p95.
+
+    The hedge goes to a different candidate when the route has one.
+    """
+    candidate, fn, routed = _prepare(purpose, kind, request, exclude)
+    first = _HEDGE_EXECUTOR.submit(_attempt, candidate, fn, routed, exclude)
+    try:
+        return first.result(timeout=hedge_delay(purpose))
+    except concurrent.futures.TimeoutError:
+        pass
+    hedge_candidate, fn, routed = _prepare(purpose, kind, request, exclude | {candidate})
+    second = _HEDGE_EXECUTOR.submit(_attempt, hedge_candidate, fn, routed, exclude)
+    pending = {first: "primary", second: "hedge"}
+    error = None
+    while pending:
+        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            winner = pending.pop(future)
+            if future.exception() is None:
+                metrics.increment("llm_hedges_total", purpose=purpose, winner=winner)
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def _call(purpose: str, kind: str, request: dict):
+    hedge = HEDGE_ENABLED and not request.get("stream")
+    started = time.perf_counter()
+    exclude = set()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if hedge:
+                result = _hedged(purpose, kind, request, exclude)
+            else:
+                result = _attempt(*_prepare(purpose, kind, request, exclude), exclude)
+        except Exception as e:
+            if _give_up(purpose, attempt, e):
+                _record(purpose, started, attempt)
+                raise
+            delay = backoff_seconds(attempt)
+            print(f"[LLM] {purpose} attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        _record(purpose, started, attempt)
+        return result
+
+
+def _cache_model(purpose: str, request: dict) -> str:
+    """The model part of a cache key: the explicit model, or every candidate of the route."""
+    if "model" in request:
+        return request["model"]
+    return "|".join(c.label for c in model_router.get_router().candidates(purpose))
+
+
+def create(purpose: str = "chat", cache: str = None, **request):
+    """
+    `chat.completions.create` with routing, deadlines, retries and optional hedging.
+
+    Args:
+        purpose: Route name (see `model_router`) and metric label
+        cache: Template name and version (e.g. "refine_resources:v1") for
+            calls whose answer depends only on the request; such calls are
+            served from `llm_cache` when possible. Ignored for streams.
+        **request: Arguments for `chat.completions.create`; `model` may be
+            omitted to let the route choose it
+
+    Returns:
+        The completion, or the open stream when `stream=True`
+    """
+    if not cache or request.get("stream"):
+        return _call(purpose, "create", request)
+    key = llm_cache.cache_key(cache, _cache_model(purpose, request), request)
+    cached = llm_cache.lookup(cache, key)
+    if cached is not None:
+        return ChatCompletion.model_validate_json(cached)
+    completion = _call(purpose, "create", request)
+    llm_cache.store(cache, key, completion.model_dump_json())
+    return completion
+
+
+def parse(purpose: str = "chat", **request):
+    """`beta.chat.completions.parse` (structured output) through the same policy as `create`."""
+    return _call(purpose, "parse", request)
+
+
+# ---- Asyncio calls ----
+
+async def _aattempt(candidate, fn, request: dict, exclude: set):
+    started = time.perf_counter()
+    try:
+        result = await fn(**request)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _failed(candidate, e, exclude)
+        raise
+    _succeeded(candidate, started)
+    return result
+
+
+async def _ahedged(purpose: str, kind: str, request: dict, exclude: set):
+    """Async `_hedged`; the losing request is cancelled, which closes it."""
+    candidate, fn, routed = _prepare(purpose, kind, request, exclude, asynchronous=True)
+    pending = {asyncio.ensure_future(_aattempt(candidate, fn, routed, exclude)): "primary"}
+    hedged = False
+    error = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay(purpose))
+        if not done:
+            hedge_candidate, fn, routed = _prepare(purpose, kind, request, exclude | {candidate}, asynchronous=True)
+            pending[asyncio.ensure_future(_aattempt(hedge_candidate, fn, routed, exclude))] = "hedge"
+            hedged = True
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                winner = pending.pop(task)
+                if task.exception() is None:
+                    if hedged:
+                        metrics.increment("llm_hedges_total", purpose=purpose, winner=winner)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _acall(purpose: str, kind: str, request: dict):
+    hedge = HEDGE_ENABLED and not request.get("stream")
+    started = time.perf_counter()
+    exclude = set()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if hedge:
+                result = await _ahedged(purpose, kind, request, exclude)
+            else:
+                candidate, fn, routed = _prepare(purpose, kind, request, exclude, asynchronous=True)
+                result = await _aattempt(candidate, fn, routed, exclude)
+        except Exception as e:
+            if _give_up(purpose, attempt, e):
+                _record(purpose, started, attempt)
+                raise
+            delay = backoff_seconds(attempt)
+            print(f"[LLM] {purpose} attempt {attempt} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+        _record(purpose, started, attempt)
+        return result
+
+
+async def acreate(purpose: str = "chat", **request):
+    """Async counterpart of `create`."""
+    return await _acall(purpose, "create", request)
+
+
+async def aparse(purpose: str = "chat", **request):
+    """Async counterpart of `parse`."""
+    return await _acall(purpose, "parse", request)
@@ -0,0 +1,96 @@
+"""In-process counters and latency samples for the generation pipeline.
+
+Metrics are kept per process in memory and exposed as JSON through the
+`/metrics` endpoint in `all_endpoints`. Labels are passed as keyword
+arguments, e.g. `observe("generation_ttft_seconds", 0.8, version="new")`.
+"""
+
+import threading
+from collections import defaultdict, deque
+
+# Number of recent samples kept per series for percentile estimates
+MAX_SAMPLES = 2048
+
+_LOCK = threading.Lock()
+_COUNTERS = defaultdict(float)
+_SAMPLES = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_SAMPLE_COUNTS = defaultdict(int)
+_GAUGES = {}
+
+
+def _series_key(name: str, labels: dict) -> str:
+    """Render a metric name plus labels as a stable series key."""
+    if not labels:
+        return name
+    rendered = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{rendered}}}"
+
+
+def increment(name: str, value: float = 1, **labels):
+    """Add `value` to a counter."""
+    key = _series_key(name, labels)
+    with _LOCK:
+        _COUNTERS[key] += value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """Set the current value of a gauge (queue depth, active jobs, ...)."""
+    key = _series_key(name, labels)
+    with _LOCK:
+        _GAUGES[key] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Record one sample (usually a latency in seconds) for a series."""
+    key = _series_key(name, labels)
+    with _LOCK:
+        _SAMPLES[key].append(value)
+        _SAMPLE_COUNTS[key] += 1
+
+
+def _percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile over an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[rank]
+
+
+def percentile(name: str, q: float, **labels):
+    """Return the `q` percentile (0-1) of recent samples, or None if empty."""
+    key = _series_key(name, labels)
+    with _LOCK:
+        values = sorted(_SAMPLES.get(key, ()))
+    if not values:
+        return None
+    return _percentile(values, q)
+
+
+def sample_count(name: str, **labels) -> int:
+    """Number of recent samples kept for a series."""
+    key = _series_key(name, labels)
+    with _LOCK:
+        return len(_SAMPLES.get(key, ()))
+
+
+def snapshot() -> dict:
+    """Return all counters, gauges and per-series summaries as a JSON-friendly dict."""
+    with _LOCK:
+        counters = dict(_COUNTERS)
+        gauges = dict(_GAUGES)
+        samples = {key: sorted(values) for key, values in _SAMPLES.items()}
+        totals = dict(_SAMPLE_COUNTS)
+
+    summaries = {}
+    for key, values in samples.items():
+        if not values:
+            continue
+        summaries[key] = {
+            "count": totals.get(key, len(values)),
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 0.50),
+            "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99),
+            "max": values[-1],
+        }
+    return {"counters": counters, "gauges": gauges, "summaries": summaries}
@@ -0,0 +1,234 @@
+"""Per-call-site model routing across OpenAI-compatible endpoints.
+
+Each call site names a route via the `purpose` it passes to `llm_client`
+(planning, final_answer, sidebar, check_ins, location_extract, ...). A route
+is a list of candidates, each a model on a named endpoint (OpenAI, an Azure
+deployment, a local vLLM server, ...). For every attempt `select` picks one
+candidate:
+
+* candidates that recently failed with a retryable error, or whose endpoint
+  failed its health check, sit out for `MODEL_ROUTER_COOLDOWN_SECONDS`;
+* among the healthy ones the choice is random, weighted by
+  `weight / latency EWMA`, so faster deployments get more traffic without
+  starving the others of latency samples;
+* `llm_client` retries on a different candidate, which gives failover.
+
+The defaults reproduce the previous hard-coded models on the single OpenAI
+endpoint. `MODEL_ROUTES` (a JSON file path or inline JSON) overrides
+endpoints and routes, e.g.::
+
+    {"endpoints": {"openai": {}, "azure": {"base_url": "https://.../openai/v1",
+                                          "api_key_env": "AZURE_OPENAI_KEY"}},
+     "routes": {"planning": [{"model": "gpt-4o-mini"},
+                             {"model": "gpt-4o-mini", "endpoint": "azure"}]}}
+
+Tool-loop turns that offer tools use `planning`; forced-answer turns use
+`final_answer`. A planning turn that answers without calling a tool
+streams that answer, so a faster planning model also writes those replies.
+Every purpose used in the app has an explicit route; an unknown purpose
+falls back to `default` with a warning and a `model_route_unknown_total`
+count.
+`scripts/benchmark_model_routes.py` compares configurations end to end.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+
+from app import metrics
+
+COOLDOWN_SECONDS = float(os.environ.get("MODEL_ROUTER_COOLDOWN_SECONDS", 30))
+HEALTH_CHECK_SECONDS = float(os.environ.get("MODEL_ROUTER_HEALTH_SECONDS", 30))
+# Weight of the newest latency sample in the moving average
+LATENCY_ALPHA = 0.2
+
+DEFAULT_CONFIG = {
+    "endpoints": {
+        "openai": {"base_url": None, "api_key_env": "SECRET_KEY"},
+    },
+    "routes": {
+        "default": [{"model": "gpt-5.2"}],
+        "planning": [{"model": "gpt-5.2"}],
+        "final_answer": [{"model": "gpt-5.2"}],
+        "check_ins": [{"model": "gpt-5.2"}],
+        "chat": [{"model": "gpt-5.2"}],
+        "vanilla": [{"model": "gpt-5.2"}],
+        "followup": [{"model": "gpt-5.2"}],
+        "context_summary": [{"model": "gpt-5.2"}],
+        "sidebar": [{"model": "gpt-4o-mini"}],
+        "location_extract": [{"model": "gpt-4o-mini"}],
+        "quick": [{"model": "gpt-4o-mini"}],
+        "functions": [{"model": "gpt-4o-mini"}],
+    },
+}
+
+
+class Candidate:
+    """One model on one endpoint, with its health and latency state."""
+
+    def __init__(self, route: str, endpoint: str, model: str, weight: float = 1.0):
+        self.route = route
+        self.endpoint = endpoint
+        self.model = model
+        self.weight = weight
+        self.latency = None  # EWMA of call seconds
+        self.unhealthy_until = 0.0
+
+    @property
+    def label(self) -> str:
+        return f"{self.model}@{self.endpoint}"
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+
+class ModelRouter:
+    """Routes per purpose, with latency-weighted, health-aware selection."""
+
+    def __init__(self, config: dict):
+        self.endpoints = dict(DEFAULT_CONFIG["endpoints"])
+        self.endpoints.update(config.get("endpoints", {}))
+        routes = dict(DEFAULT_CONFIG["routes"])
+        routes.update(config.get("routes", {}))
+
+        self.routes = {}
+        for route, candidates in routes.items():
+            self.routes[route] = [
+                Candidate(
+                    route,
+                    candidate.get("endpoint", "openai"),
+                    candidate["model"],
+                    float(candidate.get("weight", 1.0)),
+                )
+                for candidate in candidates
+            ]
+            for candidate in self.routes[route]:
+                if candidate.endpoint not in self.endpoints:
+                    raise ValueError(f"Route {route} uses unknown endpoint {candidate.endpoint}")
+        self._lock = threading.Lock()
+        self._unknown = set()
+
+    def candidates(self, purpose: str) -> list:
+        """A purpose's candidates; unknown purposes use `default` and are logged once."""
+        candidates = self.routes.get(purpose)
+        if candidates:
+            return candidates
+        if purpose not in self._unknown:
+            self._unknown.add(purpose)
+            print(f"[Model Router] No route for purpose '{purpose}', using 'default'; add it to the routes")
+        metrics.increment("model_route_unknown_total", purpose=purpose)
+        return self.routes["default"]
+
+    def select(self, purpose: str, exclude=()) -> Candidate:
+        """
+        Pick a candidate for one attempt.
+
+        Args:
+            purpose: Route name; unknown purposes use `default`
+            exclude: Candidates that already failed during this call
+
+        Returns:
+            A healthy candidate when there is one, else the one whose
+            cooldown ends first (so a call is never refused outright)
+        """
+        now = time.monotonic()
+        options = [c for c in self.candidates(purpose) if c not in exclude] or list(self.candidates(purpose))
+        healthy = [c for c in options if c.healthy(now)]
+        if not healthy:
+            return min(options, key=lambda c: c.unhealthy_until)
+        if len(healthy) == 1:
+            return healthy[0]
+        with self._lock:
+            known = [c.latency for c in healthy if c.latency is not None]
+            # Unmeasured candidates are treated as average so they get tried
+            fallback = sum(known) / len(known) if known else 1.0
+            weights = [c.weight / max(c.latency if c.latency is not None else fallback, 0.05) for c in healthy]
+        return random.choices(healthy, weights=weights)[0]
+
+    def record_success(self, candidate: Candidate, seconds: float):
+        with self._lock:
+            if candidate.latency is None:
+                candidate.latency = seconds
+            else:
+                candidate.latency += LATENCY_ALPHA * (seconds - candidate.latency)
+        metrics.increment("model_route_calls_total", route=candidate.route, candidate=candidate.label, outcome="ok")
+
+    def record_failure(self, candidate: Candidate):
+        """Take a candidate out of rotation after a retryable failure."""
+        candidate.unhealthy_until = time.monotonic() + COOLDOWN_SECONDS
+        metrics.increment("model_route_calls_total", route=candidate.route, candidate=candidate.label, outcome="failed")
+        print(f"[Model Router] {candidate.label} failed, cooling down for {COOLDOWN_SECONDS:.0f}s")
+
+    def needs_health_checks(self) -> bool:
+        return len(self.endpoints) > 1
+
+    def check_health(self, probe):
+        """
+        Probe every endpoint and bench the candidates of those that fail.
+
+        Args:
+            probe: `probe(endpoint_name)` raising if the endpoint is unhealthy
+        """
+        for endpoint in self.endpoints:
+            try:
+                probe(endpoint)
+                healthy = True
+            except Exception as e:
+                print(f"[Model Router] Health check failed for {endpoint}: {e}")
+                healthy = False
+            metrics.set_gauge("model_endpoint_healthy", int(healthy), endpoint=endpoint)
+            for candidates in self.routes.values():
+                for candidate in candidates:
+                    if candidate.endpoint != endpoint:
+                        continue
+                    if not healthy:
+                        candidate.unhealthy_until = time.monotonic() + COOLDOWN_SECONDS
+                    elif candidate.unhealthy_until:
+                        candidate.unhealthy_until = 0.0
+
+    def summary(self) -> dict:
+        """Route -> candidate state, for /metrics-style inspection and benchmarks."""
+        now = time.monotonic()
+        return {
+            route: [
+                {"candidate": c.label, "healthy": c.healthy(now), "latency": c.latency, "weight": c.weight}
+                for c in candidates
+            ]
+            for route, candidates in self.routes.items()
+        }
+
+
+def load_config(value: str = None) -> dict:
+    """Parse `MODEL_ROUTES`: a JSON file path, inline JSON, or empty for the defaults."""
+    value = os.environ.get("MODEL_ROUTES", "") if value is None else value
+    value = value.strip()
+    if not value:
+        return {}
+    if value.startswith("{"):
+        return json.loads(value)
+    with open(value, encoding="utf-8") as f:
+        return json.load(f)
+
+
+_ROUTER = None
+_ROUTER_LOCK = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """The process-wide router, built from `MODEL_ROUTES` on first use."""
+    global _ROUTER
+    if _ROUTER is None:
+        with _ROUTER_LOCK:
+            if _ROUTER is None:
+                _ROUTER = ModelRouter(load_config())
+    return _ROUTER
+
+
+def configure(config: dict) -> ModelRouter:
+    """Replace the process-wide router (used by the benchmark)."""
+    global _ROUTER
+    with _ROUTER_LOCK:
+        _ROUTER = ModelRouter(config)
+    return _ROUTER
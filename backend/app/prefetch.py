@@ -0,0 +1,173 @@
+"""Speculative retrieval started alongside the first tool-loop model call.
+
+Most questions that reach the tool loop end with the model calling
+`resources_tool` and/or `library_tool` on a query close to what the user
+wrote. `SpeculativeRetrieval` starts those searches on the (already
+scrubbed) user message while the first model turn is still streaming. When
+the model then asks for a semantically similar search with compatible
+arguments, the tool loop waits on the warm result instead of starting the
+search from scratch.
+
+Speculative searches run on their own small pool (`PREFETCH_WORKERS`),
+never on the tool executor that real tool calls wait on, and are skipped
+rather than queued when that pool is busy. Off by default
+(`PREFETCH_ENABLED=1` turns it on) until the hit rate is measured.
+
+Metrics (all labelled by tool):
+    prefetch_started_total, prefetch_hits_total, prefetch_misses_total
+        (the model called the tool but the query did not match),
+    prefetch_unused_total (the model never called the tool),
+    prefetch_skipped_total (the prefetch pool was busy),
+    prefetch_seconds_saved_total, prefetch_wasted_seconds_total
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+
+import numpy as np
+
+from app import metrics
+from app.triage import CRISIS_PATTERNS
+
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", 2))
+# Cosine similarity between the model's query and the user message needed to
+# serve the prefetched result
+PREFETCH_SIMILARITY = float(os.environ.get("PREFETCH_SIMILARITY", 0.75))
+# Messages shorter than this ("thanks", "ok") rarely lead to a search
+PREFETCH_MIN_WORDS = int(os.environ.get("PREFETCH_MIN_WORDS", 4))
+
+
+# Speculation is skipped, not queued, once every worker is taken
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=PREFETCH_WORKERS,
+    thread_name_prefix="prefetch",
+)
+_SLOTS = threading.BoundedSemaphore(PREFETCH_WORKERS)
+
+
+def _compatible_resources_args(args: dict) -> bool:
+    # The speculative search is statewide with the default result count
+    return not args.get("location") and args.get("k", 5) == 5
+
+
+class _Speculation:
+    def __init__(self, tool: str, args: dict, future):
+        self.tool = tool
+        self.args = args
+        self.future = future
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self.claimed = False
+
+
+class SpeculativeRetrieval:
+    """Retrieval calls run speculatively for one tool-loop request."""
+
+    def __init__(self, situation: str, organization: str, execute, encode):
+        """
+        Args:
+            situation: Scrubbed user message
+            organization: Organization key the searches are scoped to
+            execute: `execute(name, args, organization)` returning tool output
+            encode: `encode(text)` returning an embedding vector
+        """
+        self.situation = situation
+        self.organization = organization
+        self._encode = encode
+        self._situation_embedding = None
+        self._lock = threading.Lock()
+        self._speculations = {}
+
+        category = "crisis" if CRISIS_PATTERNS.search(situation.lower()) else "peer"
+        for tool, args in (
+            ("resources_tool", {"query": situation}),
+            ("library_tool", {"query": situation, "category": category}),
+        ):
+            if not _SLOTS.acquire(blocking=False):
+                metrics.increment("prefetch_skipped_total", tool=tool)
+                continue
+            speculation = _Speculation(tool, args, None)
+            speculation.future = _EXECUTOR.submit(self._run, speculation, execute)
+            # Also runs when `finish` cancels a search that never started
+            speculation.future.add_done_callback(lambda _: _SLOTS.release())
+            self._speculations[tool] = speculation
+            metrics.increment("prefetch_started_total", tool=tool)
+
+    @property
+    def tools(self):
+        return self._speculations.keys()
+
+    def _run(self, speculation, execute):
+        try:
+            return execute(speculation.tool, speculation.args, self.organization)
+        finally:
+            speculation.finished_at = time.monotonic()
+
+    def _similarity(self, query: str) -> float:
+        if self._situation_embedding is None:
+            self._situation_embedding = np.asarray(self._encode(self.situation), dtype=np.float32)
+        query_embedding = np.asarray(self._encode(query), dtype=np.float32)
+        norm = np.linalg.norm(self._situation_embedding) * np.linalg.norm(query_embedding)
+        if norm == 0:
+            return 0.0
+        return float(np.dot(self._situation_embedding, query_embedding) / norm)
+
+    def claim(self, name: str, args: dict):
+        """
+        Return the speculative future that answers this call, or None.
+
+        Each speculation serves at most one call; it is a miss when the
+        arguments are incompatible or the query is not similar enough.
+        """
+        with self._lock:
+            speculation = self._speculations.get(name)
+            if speculation is None or speculation.claimed:
+                return None
+            query = (args.get("query") or "").strip()
+            if name == "resources_tool":
+                compatible = _compatible_resources_args(args)
+            else:
+                compatible = args.get("category", "peer") == speculation.args["category"]
+            if not compatible or not query:
+                metrics.increment("prefetch_misses_total", tool=name)
+                return None
+            if query.lower() != self.situation.strip().lower():
+                try:
+                    similarity = self._similarity(query)
+                except Exception as e:
+                    print(f"[Prefetch] Could not compare queries: {e}")
+                    return None
+                if similarity < PREFETCH_SIMILARITY:
+                    metrics.increment("prefetch_misses_total", tool=name)
+                    return None
+            speculation.claimed = True
+
+        head_start = (speculation.finished_at or time.monotonic()) - speculation.submitted_at
+        metrics.increment("prefetch_hits_total", tool=name)
+        metrics.increment("prefetch_seconds_saved_total", head_start, tool=name)
+        print(f"[Prefetch] Serving {name} from speculative search ({head_start:.2f}s head start)")
+        return speculation.future
+
+    def finish(self):
+        """Account for speculations the model never used and drop unstarted ones."""
+        with self._lock:
+            for speculation in self._speculations.values():
+                if speculation.claimed:
+                    continue
+                speculation.claimed = True
+                metrics.increment("prefetch_unused_total", tool=speculation.tool)
+                if speculation.future.cancel():
+                    continue
+                ran_for = (speculation.finished_at or time.monotonic()) - speculation.submitted_at
+                metrics.increment("prefetch_wasted_seconds_total", ran_for, tool=speculation.tool)
+
+
+def start_speculative_retrieval(situation: str, organization: str, execute, encode):
+    """Start speculative searches for a tool-loop request, or return None."""
+    if not PREFETCH_ENABLED or len((situation or "").split()) < PREFETCH_MIN_WORDS:
+        return None
+    speculation = SpeculativeRetrieval(situation, organization, execute, encode)
+    return speculation if speculation.tools else None
@@ -40,4 +40,24 @@ def get_all_outreach(provider_username, organization):
     ''', (provider_username,))
     rows = cursor.fetchall()
     conn.close()
-    return [dict(row) for row in rows]
\ No newline at end of file
+    return [dict(row) for row in rows]
+
+
+def get_service_user_households(provider_username):
+    """
+    Get household size, monthly income and location for a provider's service users.
+
+    Sizes and incomes are None where the provider has not recorded them.
+    Needs the columns from `migrations/0001_profiles_household_columns.sql`.
+    """
+    with psycopg.connect(CONNECTION_STRING, row_factory=dict_row) as conn:
+        rows = conn.execute('''
+        SELECT service_user_id, service_user_name, location, household_size, monthly_income
+        FROM profiles
+        WHERE provider = %s
+        ORDER BY service_user_name
+        ''', (provider_username,)).fetchall()
+    for row in rows:
+        if row["monthly_income"] is not None:
+            row["monthly_income"] = float(row["monthly_income"])
+    return rows
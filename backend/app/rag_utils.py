@@ -12,9 +12,7 @@ import pandas as pd
 import psycopg
 from sentence_transformers import SentenceTransformer
 import faiss
-import googlemaps
 import json 
-import openai 
 import time
 from scipy.spatial import cKDTree
 import math 
@@ -22,6 +20,8 @@ import math
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 
+from app import external_calls, llm_client
+
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -85,8 +85,11 @@ def geocode_address(address: str):
         return None, None
     
     try:
-        gmaps = googlemaps.Client(key=os.getenv('GOOGLE_API_KEY'))
-        result = gmaps.geocode(address)
+        result = external_calls.google_maps.call(
+            ("geocode", external_calls.normalize_query(address)),
+            external_calls.google_maps_client().geocode,
+            address,
+        )
         if result:
             location = result[0]['geometry']['location']
             return location['lat'], location['lng']
@@ -459,10 +462,9 @@ Examples:
 """
 
     try:
-        client = openai.Client(api_key=os.getenv("SECRET_KEY"))
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = llm_client.create(
+            "location_extract",
+            cache="resource_location:v1",
             messages=[
                 {"role": "system", "content": "You are a location extraction assistant. Always respond with valid JSON only."},
                 {"role": "user", "content": prompt}
@@ -0,0 +1,141 @@
+"""Section-level retrieval over static policy references.
+
+Organizations can have reference documents (e.g. Georgia's SNAP rules in
+`georgia_snap.py`) that used to be pasted whole into every tool-loop system
+prompt. With `REFERENCE_INJECTION=sections` (the default), each document is
+split into its `## ` sections. The sections are embedded once per process,
+and each request gets only the sections closest to the question, up to
+`REFERENCE_CONTEXT_TOKENS`. `REFERENCE_INJECTION=full` keeps the old
+whole-document behaviour for comparison.
+
+`reference_context_tokens{mode=...}` records how many reference tokens each
+request carried, so the two modes can be compared alongside `prompt_tokens`
+and the tool-loop latency metrics.
+"""
+
+import os
+import re
+import threading
+
+import numpy as np
+
+from app import metrics
+from app.context_packer import count_tokens
+from app.georgia_snap import GEORGIA_SNAP_CONTEXT
+
+REFERENCE_INJECTION = os.environ.get("REFERENCE_INJECTION", "sections").lower()
+REFERENCE_CONTEXT_TOKENS = int(os.environ.get("REFERENCE_CONTEXT_TOKENS", 700))
+# Sections after the best one are only added if they score at least this
+REFERENCE_MIN_SCORE = float(os.environ.get("REFERENCE_MIN_SCORE", 0.35))
+
+# organization -> list of (document title, markdown text)
+REFERENCE_DOCUMENTS = {
+    "georgia": [("Georgia SNAP eligibility reference", GEORGIA_SNAP_CONTEXT)],
+}
+
+_SECTION_RE = re.compile(r"^## ", flags=re.MULTILINE)
+
+
+def split_sections(text: str) -> list:
+    """Split a markdown document into its `## ` sections (the preamble is dropped)."""
+    parts = _SECTION_RE.split(text)
+    sections = []
+    for part in parts[1:]:
+        body = part.strip().rstrip("-").strip()
+        if body:
+            sections.append("## " + body)
+    return sections
+
+
+class ReferenceIndex:
+    """Embedded sections of one organization's reference documents."""
+
+    def __init__(self, documents: list, encode):
+        """
+        Args:
+            documents: List of (title, markdown text)
+            encode: `encode(list_of_texts)` returning a 2-D embedding array
+        """
+        self.sections = []  # (title, section text)
+        for title, text in documents:
+            self.sections.extend((title, section) for section in split_sections(text))
+        self._encode = encode
+        embeddings = np.asarray(encode([section for _, section in self.sections]), dtype=np.float32)
+        self._embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self._tokens = [count_tokens(section) for _, section in self.sections]
+
+    def top_sections(self, query: str, max_tokens: int = REFERENCE_CONTEXT_TOKENS) -> list:
+        """
+        Sections most similar to `query`, best first, within `max_tokens`.
+
+        The best section is always included; others need a similarity of at
+        least `REFERENCE_MIN_SCORE`.
+        """
+        query_embedding = np.asarray(self._encode([query]), dtype=np.float32)[0]
+        query_embedding /= np.linalg.norm(query_embedding) or 1.0
+        scores = self._embeddings @ query_embedding
+
+        chosen, used = [], 0
+        for i in np.argsort(-scores):
+            if chosen and (scores[i] < REFERENCE_MIN_SCORE or used + self._tokens[i] > max_tokens):
+                continue
+            chosen.append(i)
+            used += self._tokens[i]
+        # Keep the document's own order so tables read naturally
+        return [self.sections[i] for i in sorted(chosen)]
+
+
+_INDICES = {}
+_INDICES_LOCK = threading.Lock()
+
+
+def _index_for(organization: str, encode):
+    with _INDICES_LOCK:
+        index = _INDICES.get(organization)
+        if index is None:
+            index = _INDICES[organization] = ReferenceIndex(REFERENCE_DOCUMENTS[organization], encode)
+        return index
+
+
+def has_reference(organization: str) -> bool:
+    return organization in REFERENCE_DOCUMENTS
+
+
+def full_reference(organization: str) -> str:
+    """Every reference document for an organization, for `REFERENCE_INJECTION=full`."""
+    return "\n\n".join(text for _, text in REFERENCE_DOCUMENTS.get(organization, ()))
+
+
+def reference_message(organization: str, query: str, encode):
+    """
+    Build the per-request reference message for an organization.
+
+    Args:
+        organization: Organization key
+        query: The user's (scrubbed) question
+        encode: `encode(list_of_texts)` returning a 2-D embedding array
+
+    Returns:
+        A system message with the relevant sections, or None when the
+        organization has no references or they are already in the system
+        prompt (`REFERENCE_INJECTION=full`)
+    """
+    if not has_reference(organization):
+        return None
+    if REFERENCE_INJECTION == "full":
+        metrics.observe(
+            "reference_context_tokens", count_tokens(full_reference(organization)),
+            org=organization, mode="full",
+        )
+        return None
+
+    sections = _index_for(organization, encode).top_sections(query)
+    grouped = {}
+    for title, section in sections:
+        grouped.setdefault(title, []).append(section)
+    content = "\n\n".join(
+        f"Relevant sections of the {title}:\n\n" + "\n\n".join(parts)
+        for title, parts in grouped.items()
+    )
+    metrics.observe("reference_context_tokens", count_tokens(content), org=organization, mode="sections")
+    return {"role": "system", "content": content}
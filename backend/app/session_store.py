@@ -0,0 +1,248 @@
+"""Chat history storage for the generation pipeline, keyed by conversation id.
+
+`start_generation` used to keep histories in a module-global dict keyed by
+Socket.IO sid. That dict was never cleared, and it tied a conversation to one
+process. Histories now live in a session store selected by `SESSION_STORE`:
+
+* "memory" (default): a per-process LRU/TTL cache, bounded by
+  `SESSION_STORE_MAX_SESSIONS` and `SESSION_STORE_TTL_SECONDS`.
+* "postgres": a shared `session_messages` table, so any app instance behind
+  a load balancer can serve the next message of a conversation.
+
+Both hydrate lazily from the `messages` table the first time a conversation
+is seen, so a conversation that started before a restart (or on another
+instance) keeps its context.
+
+Messages are `{"role": ..., "content": ...}` dicts, as sent to OpenAI.
+"""
+
+import os
+import threading
+
+import psycopg
+
+from app.cache_utils import TTLCache
+from app.database import CONNECTION_STRING
+
+
+def load_history_from_messages(conversation_id: str) -> list:
+    """
+    Rebuild a chat history from the persisted `messages` table.
+
+    Args:
+        conversation_id: Conversation to load
+
+    Returns:
+        List of role/content dicts, oldest first (empty if none)
+    """
+    if not conversation_id:
+        return []
+    with psycopg.connect(CONNECTION_STRING) as conn:
+        with conn.cursor() as cur:
+            # A user message and its answer share created_at (same transaction)
+            cur.execute(
+                """
+                SELECT sender, text FROM messages
+                WHERE conversation_id = %s
+                ORDER BY created_at ASC, CASE sender WHEN 'user' THEN 0 ELSE 1 END
+                """,
+                (conversation_id,),
+            )
+            rows = cur.fetchall()
+    # update_conversation stores assistant turns with sender 'system'
+    return [
+        {"role": "user" if sender == "user" else "assistant", "content": text}
+        for sender, text in rows
+        if text
+    ]
+
+
+class SessionStore:
+    """Interface shared by the session store backends."""
+
+    def get(self, conversation_id: str, hydrate: bool = True) -> list:
+        """
+        Return a copy of the conversation's history.
+
+        Args:
+            conversation_id: Conversation to look up
+            hydrate: Load from the `messages` table if the store has nothing
+                (skip for conversations that were just created)
+        """
+        raise NotImplementedError
+
+    def append(self, conversation_id: str, message: dict, hydrate: bool = True):
+        """
+        Add one message to the end of the conversation's history.
+
+        Args:
+            conversation_id: Conversation to extend
+            message: Role/content dict
+            hydrate: Load the earlier history from the `messages` table first
+                if the store has nothing (skip for new conversations)
+        """
+        raise NotImplementedError
+
+    def clear(self, conversation_id: str):
+        """Forget the conversation's history (e.g. on reset)."""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store with LRU eviction and idle expiry."""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 6 * 3600, loader=load_history_from_messages):
+        self._sessions = TTLCache(max_sessions, ttl_seconds, name="sessions")
+        self._lock = threading.Lock()
+        self._loader = loader
+
+    def _history(self, conversation_id: str) -> list:
+        """The live history list; call with the lock held."""
+        history = self._sessions.get(conversation_id)
+        if history is None:
+            history = []
+        # Re-set on every access so the TTL measures idle time
+        self._sessions.set(conversation_id, history)
+        return history
+
+    def _ensure_loaded(self, conversation_id: str, hydrate: bool):
+        """Hydrate an unknown conversation without holding the lock during the DB load."""
+        if not hydrate:
+            return
+        with self._lock:
+            if self._sessions.get(conversation_id) is not None:
+                return
+        loaded = self._loader(conversation_id)
+        with self._lock:
+            # Another thread may have loaded or extended it meanwhile
+            if self._sessions.get(conversation_id) is None:
+                self._sessions.set(conversation_id, loaded)
+
+    def get(self, conversation_id: str, hydrate: bool = True) -> list:
+        self._ensure_loaded(conversation_id, hydrate)
+        with self._lock:
+            return list(self._history(conversation_id))
+
+    def append(self, conversation_id: str, message: dict, hydrate: bool = True):
+        self._ensure_loaded(conversation_id, hydrate)
+        with self._lock:
+            self._history(conversation_id).append(message)
+
+    def clear(self, conversation_id: str):
+        with self._lock:
+            self._sessions.pop(conversation_id)
+
+
+class PostgresSessionStore(SessionStore):
+    """Store shared by all app instances, in the `session_messages` table.
+
+    Writes to a conversation take a transaction-scoped advisory lock on it,
+    so concurrent appends (or an append racing a hydration) get distinct
+    positions instead of a primary key violation.
+    """
+
+    def __init__(self, connection_string: str = CONNECTION_STRING, loader=load_history_from_messages):
+        self._connection_string = connection_string
+        self._loader = loader
+        self._table_ready = False
+
+    def _connect(self):
+        conn = psycopg.connect(self._connection_string)
+        if not self._table_ready:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    conversation_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (conversation_id, position)
+                )
+                """
+            )
+            conn.commit()
+            self._table_ready = True
+        return conn
+
+    @staticmethod
+    def _lock(conn, conversation_id: str):
+        conn.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (conversation_id,))
+
+    @staticmethod
+    def _count(conn, conversation_id: str) -> int:
+        return conn.execute(
+            "SELECT COUNT(*) FROM session_messages WHERE conversation_id = %s", (conversation_id,)
+        ).fetchone()[0]
+
+    def _hydrate(self, conn, conversation_id: str, history: list):
+        """Copy a loaded history into the shared table, unless another writer got there first."""
+        self._lock(conn, conversation_id)
+        if self._count(conn, conversation_id):
+            return False
+        with conn.cursor() as cur:
+            cur.executemany(
+                """
+                INSERT INTO session_messages (conversation_id, position, role, content)
+                VALUES (%s, %s, %s, %s)
+                """,
+                [(conversation_id, i, m["role"], m["content"]) for i, m in enumerate(history)],
+            )
+        return True
+
+    def get(self, conversation_id: str, hydrate: bool = True) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT role, content FROM session_messages WHERE conversation_id = %s ORDER BY position",
+                (conversation_id,),
+            ).fetchall()
+            if rows or not hydrate:
+                return [{"role": role, "content": content} for role, content in rows]
+
+        # Load outside any transaction so the advisory lock is not held during it
+        history = self._loader(conversation_id)
+        if not history:
+            return history
+        with self._connect() as conn:
+            copied = self._hydrate(conn, conversation_id, history)
+            conn.commit()
+        return history if copied else self.get(conversation_id, hydrate=False)
+
+    def append(self, conversation_id: str, message: dict, hydrate: bool = True):
+        history = []
+        if hydrate:
+            with self._connect() as conn:
+                if not self._count(conn, conversation_id):
+                    # Earlier turns live only in `messages` (restart or another node)
+                    history = self._loader(conversation_id)
+        with self._connect() as conn:
+            if history:
+                self._hydrate(conn, conversation_id, history)
+            else:
+                self._lock(conn, conversation_id)
+            conn.execute(
+                """
+                INSERT INTO session_messages (conversation_id, position, role, content)
+                SELECT %s, COALESCE(MAX(position) + 1, 0), %s, %s
+                FROM session_messages WHERE conversation_id = %s
+                """,
+                (conversation_id, message["role"], message["content"], conversation_id),
+            )
+            conn.commit()
+
+    def clear(self, conversation_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_messages WHERE conversation_id = %s", (conversation_id,))
+            conn.commit()
+
+
+def create_session_store() -> SessionStore:
+    """Build the store selected by the `SESSION_STORE` environment variable."""
+    backend = os.environ.get("SESSION_STORE", "memory").lower()
+    if backend == "postgres":
+        print("[SessionStore] Using Postgres session_messages table")
+        return PostgresSessionStore()
+    return MemorySessionStore(
+        max_sessions=int(os.environ.get("SESSION_STORE_MAX_SESSIONS", 1000)),
+        ttl_seconds=float(os.environ.get("SESSION_STORE_TTL_SECONDS", 6 * 3600)),
+    )
@@ -0,0 +1,261 @@
+"""Sidebar state (active goals and resources) maintained incrementally.
+
+The state manager used to send the whole session history to a
+structured-output call after every answer and rebuild the sidebar from
+scratch, serially before `generation_complete`. Now:
+
+* the last `SidebarState` of each conversation is kept with the number of
+  turns it covers, and an update sends that state plus only the newer
+  turns, so the prompt stays roughly flat as the conversation grows (the
+  first update, or one after a restart, falls back to the full history);
+* updates run in the background, so the answer completes without waiting;
+* each update waits `SIDEBAR_DEBOUNCE_SECONDS` first, and is dropped if a
+  newer one for the same conversation was scheduled meanwhile; an
+  in-flight async update is cancelled when a newer one starts. A dropped
+  update loses nothing, because the newer one covers every turn since the
+  last stored state.
+
+Metrics: `sidebar_prompt_tokens{mode=incremental|full}`,
+`sidebar_update_seconds` and `sidebar_updates_total{outcome}`.
+"""
+
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import threading
+import time
+
+from pydantic import BaseModel, Field
+
+from app import llm_client, metrics
+from app.cache_utils import TTLCache
+from app.cancellation import GenerationCancelled, check_cancelled
+
+SIDEBAR_DEBOUNCE_SECONDS = float(os.environ.get("SIDEBAR_DEBOUNCE_SECONDS", 1.0))
+
+
+class SidebarItem(BaseModel):
+    title: str = Field(description="A short, 3-5 word title for the goal or resource.")
+    details: str = Field(description="A single actionable sentence describing the next step or key info.")
+
+
+class SidebarState(BaseModel):
+    goals: list[SidebarItem] = Field(description="Current, active goals based on the ENTIRE conversation.")
+    resources: list[SidebarItem] = Field(description="All relevant resources mentioned so far.")
+
+
+SIDEBAR_SYSTEM_PROMPT = (
+    "You are the state manager for a peer support dashboard. "
+    "Analyze the ENTIRE conversation history provided below.\n"
+    "1. Identify 3-5 'Active Goals'. These should be tasks the user is currently working on. "
+    "   - If a goal was completed or abandoned in the chat, DO NOT include it.\n"
+    "   - Provide a 'details' sentence for each (e.g., 'Check eligibility for SNAP, TANF, or Medicaid').\n"
+    "2. Identify 'Resources'. These are organizations, tools, or websites mentioned by the assistant. "
+    "   - Provide a 'details' sentence (e.g., 'Located at 123 Main St, open 9-5')."
+)
+
+SIDEBAR_INCREMENTAL_PROMPT = (
+    "You are the state manager for a peer support dashboard. "
+    "You are given the CURRENT dashboard state as JSON and the NEW messages since it was built. "
+    "Return the updated state.\n"
+    "1. 'Active Goals': keep 3-5 tasks the user is currently working on. "
+    "Keep goals from the current state that are still active, drop any the new messages show were "
+    "completed or abandoned, and add new ones. Each has a 'details' sentence.\n"
+    "2. 'Resources': keep the resources already listed and add organizations, tools, or websites "
+    "the assistant mentions in the new messages, each with a 'details' sentence.\n"
+    "Do not invent goals or resources that appear in neither the state nor the new messages."
+)
+
+# conversation_id -> (turns covered, SidebarState)
+_STATES = TTLCache(maxsize=4096, ttl_seconds=6 * 3600, name="sidebar_states")
+# conversation_id -> sequence number of the newest scheduled update; removed
+# once that update finishes, and bounded in case one never does
+_LATEST = TTLCache(maxsize=4096, ttl_seconds=3600, name="sidebar_pending")
+_LATEST_LOCK = threading.Lock()
+# Global, so a number is never reused for a conversation after its entry is removed
+_SEQUENCE = itertools.count(1)
+_TASKS = {}  # conversation_id -> in-flight asyncio update task
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("SIDEBAR_WORKERS", 4)),
+    thread_name_prefix="sidebar",
+)
+
+
+def _turns(all_messages):
+    return [
+        {"role": m["role"], "content": m["content"]}
+        for m in all_messages
+        if m["role"] in ["user", "assistant"]
+    ]
+
+
+def sidebar_messages(all_messages):
+    """Build the full-history structured-output request for the sidebar state manager."""
+    return [{"role": "system", "content": SIDEBAR_SYSTEM_PROMPT}] + _turns(all_messages)
+
+
+def sidebar_request(conversation_id, all_messages):
+    """
+    Build the cheapest request that brings the conversation's sidebar up to date.
+
+    Returns:
+        Tuple of (messages, turns covered once applied, "incremental" or "full")
+    """
+    turns = _turns(all_messages)
+    cached = _STATES.get(conversation_id) if conversation_id else None
+    if cached is None or cached[0] > len(turns):
+        return sidebar_messages(all_messages), len(turns), "full"
+    covered, state = cached
+    transcript = "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in turns[covered:])
+    content = (
+        f"Current dashboard state:\n{json.dumps(sidebar_payload(state))}\n\n"
+        f"New messages:\n\n{transcript}"
+    )
+    return (
+        [{"role": "system", "content": SIDEBAR_INCREMENTAL_PROMPT}, {"role": "user", "content": content}],
+        len(turns),
+        "incremental",
+    )
+
+
+def sidebar_payload(state_data):
+    """Convert a parsed SidebarState into plain dicts for Socket.IO."""
+    return {
+        "goals": [item.model_dump() for item in state_data.goals],
+        "resources": [item.model_dump() for item in state_data.resources]
+    }
+
+
+def _schedule(conversation_id) -> int:
+    if not conversation_id:
+        return 0  # nothing to debounce against
+    with _LATEST_LOCK:
+        seq = next(_SEQUENCE)
+        _LATEST.set(conversation_id, seq)
+    return seq
+
+
+def _superseded(conversation_id, seq) -> bool:
+    if not conversation_id:
+        return False
+    with _LATEST_LOCK:
+        return _LATEST.get(conversation_id) != seq
+
+
+def _forget(conversation_id, seq):
+    """Drop the pending entry once the newest update is done."""
+    if not conversation_id:
+        return
+    with _LATEST_LOCK:
+        if _LATEST.get(conversation_id) == seq:
+            _LATEST.pop(conversation_id)
+
+
+def _store(conversation_id, covered, state):
+    """Keep the newest state; an older update finishing late must not overwrite it."""
+    cached = _STATES.get(conversation_id)
+    if conversation_id and (cached is None or cached[0] <= covered):
+        _STATES.set(conversation_id, (covered, state))
+
+
+def _finish(conversation_id, seq, completion, covered, mode, started):
+    """Store the result; returns the state to emit, or None if a newer update exists."""
+    state = completion.choices[0].message.parsed
+    if completion.usage is not None:
+        metrics.observe("sidebar_prompt_tokens", completion.usage.prompt_tokens, mode=mode)
+    metrics.observe("sidebar_update_seconds", time.perf_counter() - started, mode=mode)
+    _store(conversation_id, covered, state)
+    if _superseded(conversation_id, seq):
+        metrics.increment("sidebar_updates_total", outcome="superseded")
+        return None
+    metrics.increment("sidebar_updates_total", outcome="emitted")
+    return state
+
+
+def _run_update(conversation_id, seq, all_messages, emit, cancel_token):
+    try:
+        time.sleep(SIDEBAR_DEBOUNCE_SECONDS)
+        if _superseded(conversation_id, seq):
+            metrics.increment("sidebar_updates_total", outcome="debounced")
+            return
+        check_cancelled(cancel_token, llm_calls_saved=1)
+        started = time.perf_counter()
+        messages, covered, mode = sidebar_request(conversation_id, all_messages)
+        completion = llm_client.parse("sidebar", messages=messages, response_format=SidebarState)
+        if cancel_token is not None and cancel_token.cancelled:
+            return
+        state = _finish(conversation_id, seq, completion, covered, mode, started)
+        if state is not None:
+            print(f"[Sidecar] Emitting {mode} update: {len(state.goals)} goals")
+            emit(sidebar_payload(state))
+    except GenerationCancelled:
+        print("[Sidecar] Skipped update (cancelled)")
+    except Exception as e:
+        metrics.increment("sidebar_updates_total", outcome="error")
+        print(f"[Sidecar] Error: {e}")
+    finally:
+        _forget(conversation_id, seq)
+
+
+def schedule_update(conversation_id, all_messages, emit, cancel_token=None):
+    """
+    Queue a debounced sidebar update on a background thread and return at once.
+
+    Args:
+        conversation_id: Key for the stored state and for debouncing
+        all_messages: Conversation history including the latest answer
+        emit: Blocking `fn(payload)` that sends a `goals_update`
+        cancel_token: Optional `CancellationToken`; skips the call if cancelled
+    """
+    seq = _schedule(conversation_id)
+    _EXECUTOR.submit(_run_update, conversation_id, seq, list(all_messages), emit, cancel_token)
+
+
+async def _run_update_async(conversation_id, seq, all_messages, emit, cancel_token):
+    try:
+        await asyncio.sleep(SIDEBAR_DEBOUNCE_SECONDS)
+        if cancel_token is not None:
+            cancel_token.check(llm_calls_saved=1)
+        started = time.perf_counter()
+        messages, covered, mode = sidebar_request(conversation_id, all_messages)
+        completion = await llm_client.aparse("sidebar", messages=messages, response_format=SidebarState)
+        if cancel_token is not None and cancel_token.cancelled:
+            return
+        state = _finish(conversation_id, seq, completion, covered, mode, started)
+        if state is not None:
+            print(f"[Sidecar] Emitting {mode} update for {conversation_id}: {len(state.goals)} goals")
+            await emit(sidebar_payload(state))
+    except asyncio.CancelledError:
+        metrics.increment("sidebar_updates_total", outcome="cancelled")
+    except GenerationCancelled:
+        print(f"[Sidecar] Skipped update for {conversation_id} (cancelled)")
+    except Exception as e:
+        metrics.increment("sidebar_updates_total", outcome="error")
+        print(f"[Sidecar] Error: {e}")
+    finally:
+        _forget(conversation_id, seq)
+        if conversation_id and _TASKS.get(conversation_id) is asyncio.current_task():
+            del _TASKS[conversation_id]
+
+
+def schedule_update_async(conversation_id, all_messages, emit, cancel_token=None):
+    """
+    Asyncio counterpart of `schedule_update`; call from the event loop.
+
+    Any update still running for the conversation is cancelled, which also
+    closes its request.
+
+    Args:
+        emit: `async fn(payload)` that sends a `goals_update`
+    """
+    seq = _schedule(conversation_id)
+    task = asyncio.ensure_future(
+        _run_update_async(conversation_id, seq, list(all_messages), emit, cancel_token)
+    )
+    if conversation_id:
+        previous = _TASKS.get(conversation_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        _TASKS[conversation_id] = task
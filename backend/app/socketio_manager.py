@@ -0,0 +1,173 @@
+"""Socket.IO client managers for running the realtime path on several processes.
+
+By default `socketio.AsyncServer` tracks clients in process memory, so an
+emit only reaches sockets connected to the same process. Setting
+`SOCKETIO_MESSAGE_QUEUE` switches to a pub/sub client manager. Every server
+process then relays emits (and room joins) to the others. A process with no
+sockets at all, such as a generation worker, can also emit to clients
+through a write-only manager.
+
+* ``redis://...`` / ``rediss://...``: python-socketio's `AsyncRedisManager`
+  (needs the `redis` package).
+* ``postgres`` (uses `DATABASE_URL`) or ``postgresql://...``:
+  `PostgresPubSubManager`, built on `LISTEN/NOTIFY`, so no extra service is
+  needed.
+* ``memory``: `LocalPubSubManager`, an in-process stand-in that links several
+  `AsyncServer` instances inside one interpreter, for tests.
+"""
+
+import asyncio
+import base64
+import os
+import pickle
+import uuid
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from app.cache_utils import TTLCache
+
+# NOTIFY payloads must stay under 8000 bytes; leave room for the header
+_NOTIFY_CHUNK_CHARS = 7000
+
+
+class PostgresPubSubManager(AsyncPubSubManager):
+    """Socket.IO pub/sub manager over Postgres `LISTEN/NOTIFY`.
+
+    Messages are pickled and base64-encoded. Messages larger than one
+    notification are split into numbered parts and put back together on the
+    receiving side.
+    """
+
+    name = "asyncpostgres"
+
+    def __init__(self, url: str, channel: str = "socketio", write_only: bool = False, logger=None):
+        """
+        Args:
+            url: Postgres connection string
+            channel: NOTIFY channel (must be a plain SQL identifier)
+            write_only: Only publish, never listen (for processes with no sockets)
+        """
+        if not channel.replace("_", "").isalnum():
+            raise ValueError(f"Invalid NOTIFY channel name: {channel!r}")
+        self.url = url
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._partial = TTLCache(maxsize=1024, ttl_seconds=30)  # msg id -> parts
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    async def _publish(self, data):
+        encoded = base64.b64encode(pickle.dumps(data)).decode("ascii")
+        parts = [
+            encoded[i:i + _NOTIFY_CHUNK_CHARS]
+            for i in range(0, len(encoded), _NOTIFY_CHUNK_CHARS)
+        ] or [""]
+        msg_id = uuid.uuid4().hex[:12]
+
+        async with self._publish_lock:
+            for attempt in (1, 2):
+                try:
+                    if self._publish_conn is None or self._publish_conn.closed:
+                        self._publish_conn = await _connect_postgres(self.url)
+                    # One transaction keeps the parts of a message together
+                    async with self._publish_conn.transaction():
+                        for index, part in enumerate(parts):
+                            await self._publish_conn.execute(
+                                "SELECT pg_notify(%s, %s)",
+                                (self.channel, f"{msg_id}:{index}:{len(parts)}:{part}"),
+                            )
+                    return
+                except Exception as e:
+                    self._publish_conn = None
+                    self._get_logger().error(f"[SocketIO] Cannot publish to Postgres (attempt {attempt}): {e}")
+
+    async def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                conn = await _connect_postgres(self.url)
+                await conn.execute(f"LISTEN {self.channel}")
+                retry_sleep = 1
+                async for notify in conn.notifies():
+                    message = self._reassemble(notify.payload)
+                    if message is not None:
+                        yield message
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._get_logger().error(
+                    f"[SocketIO] Cannot receive from Postgres: {e}; retrying in {retry_sleep}s"
+                )
+                await asyncio.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+    def _reassemble(self, payload: str):
+        """Return the pickled message once all of its parts have arrived."""
+        msg_id, index, total, part = payload.split(":", 3)
+        index, total = int(index), int(total)
+        if total == 1:
+            return base64.b64decode(part)
+        parts = self._partial.get(msg_id) or [None] * total
+        parts[index] = part
+        if any(p is None for p in parts):
+            self._partial.set(msg_id, parts)
+            return None
+        self._partial.pop(msg_id)
+        return base64.b64decode("".join(parts))
+
+
+async def _connect_postgres(url: str):
+    # Imported here so the default (in-process) setup does not need it
+    import psycopg
+    return await psycopg.AsyncConnection.connect(url, autocommit=True)
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """In-process stand-in for a message queue, for tests.
+
+    Every instance created with the same channel receives what the others
+    publish, so two `AsyncServer`s in one interpreter behave like two nodes.
+    """
+
+    name = "asynclocal"
+    _subscribers = {}  # channel -> list of asyncio.Queue
+
+    async def _publish(self, data):
+        for queue in list(self._subscribers.get(self.channel, ())):
+            queue.put_nowait(data)
+
+    async def _listen(self):
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(self.channel, []).append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[self.channel].remove(queue)
+
+
+def create_client_manager(write_only: bool = False):
+    """
+    Build the client manager selected by `SOCKETIO_MESSAGE_QUEUE`.
+
+    Args:
+        write_only: For processes that only emit (e.g. generation workers)
+
+    Returns:
+        A `socketio.AsyncManager` subclass instance, or None for the default
+        in-process manager
+    """
+    url = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "").strip()
+    channel = os.environ.get("SOCKETIO_CHANNEL", "socketio")
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        print(f"[SocketIO] Using Redis message queue on channel {channel}")
+        return socketio.AsyncRedisManager(url, channel=channel, write_only=write_only)
+    if url == "postgres" or url.startswith(("postgres://", "postgresql://")):
+        print(f"[SocketIO] Using Postgres LISTEN/NOTIFY on channel {channel}")
+        dsn = os.environ.get("DATABASE_URL") if url == "postgres" else url
+        return PostgresPubSubManager(dsn, channel=channel, write_only=write_only)
+    if url == "memory":
+        return LocalPubSubManager(channel=channel, write_only=write_only)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {url}")
@@ -0,0 +1,173 @@
+"""Coalesced, sequence-numbered streaming of generated text to Socket.IO clients.
+
+The pipelines yield small text pieces. `TextStream` collects them and flushes
+at most once per `STREAM_COALESCE_MS`, instead of sleeping a fixed time per
+token. Each flush is one event:
+
+* `generation_delta` (clients that start with `protocol: "delta"`):
+  `{"seq": n, "delta": "..."}` carries only the new text, so the bytes sent
+  grow linearly with the answer. Every `STREAM_SNAPSHOT_SECONDS`, and on the
+  final flush, the payload carries the full `"text"` instead, so a client that
+  missed a delta can resync. Clients apply a delta only when
+  `seq == last_seq + 1`, and always take a snapshot.
+* `generation_update` (older clients): `{"chunk": full_text}`, as before.
+
+The last `STREAM_BUFFER_EVENTS` events are kept in a ring buffer, so a
+client that reconnects mid-answer can `replay` what it missed. If the buffer
+no longer reaches back far enough, the replay is one full snapshot instead.
+
+`push` can be called from a worker thread or from the event loop. Emits are
+always scheduled on `loop`.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from app import metrics
+
+PROTOCOL_DELTA = "delta"
+PROTOCOL_LEGACY = "legacy"
+
+# How long pieces are collected before they are sent as one event
+COALESCE_SECONDS = float(os.environ.get("STREAM_COALESCE_MS", 30)) / 1000
+# How often a delta stream also sends the full text for resync
+SNAPSHOT_SECONDS = float(os.environ.get("STREAM_SNAPSHOT_SECONDS", 5))
+# Emitted events kept per generation for replay after a reconnect
+BUFFER_EVENTS = int(os.environ.get("STREAM_BUFFER_EVENTS", 256))
+
+
+class TextStream:
+    """Accumulates one generation's text and emits it in coalesced batches."""
+
+    def __init__(self, send, loop, protocol: str = PROTOCOL_LEGACY):
+        """
+        Args:
+            send: `async fn(event, payload)` that emits to the client
+            loop: Event loop the emits are scheduled on
+            protocol: "delta" for `generation_delta`, anything else for the
+                legacy full-text `generation_update`
+        """
+        self._send = send
+        self._loop = loop
+        self.protocol = PROTOCOL_DELTA if protocol == PROTOCOL_DELTA else PROTOCOL_LEGACY
+
+        self._lock = threading.Lock()
+        self._parts = []
+        self._pending = []
+        self._last_flush = 0.0
+        self._last_snapshot = time.monotonic()
+        self._timer_armed = False
+        self._closed = False
+        self._buffer = deque(maxlen=BUFFER_EVENTS)  # (seq, event, payload)
+        self.seq = 0
+
+    @property
+    def text(self) -> str:
+        """Everything pushed so far."""
+        with self._lock:
+            return "".join(self._parts)
+
+    def push(self, piece: str):
+        """Add a piece of text; sends it now or within the coalesce window."""
+        if not piece:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._parts.append(piece)
+            self._pending.append(piece)
+            wait = COALESCE_SECONDS - (time.monotonic() - self._last_flush)
+            if wait <= 0:
+                self._flush_locked()
+            elif not self._timer_armed:
+                # Don't leave text sitting in the buffer if the model pauses
+                # (e.g. while tools run) before the next piece arrives
+                self._timer_armed = True
+                self._loop.call_soon_threadsafe(self._loop.call_later, wait, self._on_timer)
+
+    def replace(self, text: str):
+        """
+        Replace the whole text (e.g. with an error message) and send it now.
+
+        Returns:
+            `concurrent.futures.Future` of the emit
+        """
+        with self._lock:
+            self._parts = [text]
+            self._pending = []
+            return self._emit_locked(snapshot=True)
+
+    def close(self):
+        """
+        Send whatever is buffered as a final snapshot and stop accepting pieces.
+
+        Returns:
+            `concurrent.futures.Future` of the last emit, or None if nothing was
+            sent. Async callers can await it so later events keep their order.
+        """
+        with self._lock:
+            if self._closed:
+                return None
+            self._closed = True
+            if not self._parts:
+                return None
+            self._pending = []
+            return self._emit_locked(snapshot=True)
+
+    def replay(self, last_seq: int = 0) -> list:
+        """
+        Events a client that last saw `last_seq` needs to catch up.
+
+        Args:
+            last_seq: Highest sequence number the client applied (0 for none)
+
+        Returns:
+            List of `(event, payload)` tuples, oldest first
+        """
+        with self._lock:
+            if self.protocol != PROTOCOL_DELTA:
+                return [("generation_update", {"chunk": "".join(self._parts)})] if self._parts else []
+            if self.seq <= last_seq:
+                return []
+            if not self._buffer or self._buffer[0][0] > last_seq + 1:
+                # Ring buffer has moved past the client's position
+                return [("generation_delta", {"seq": self.seq, "text": "".join(self._parts)})]
+            return [(event, payload) for seq, event, payload in self._buffer if seq > last_seq]
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer_armed = False
+            if self._pending and not self._closed:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        snapshot = time.monotonic() - self._last_snapshot >= SNAPSHOT_SECONDS
+        delta = "".join(self._pending)
+        self._pending = []
+        return self._emit_locked(snapshot=snapshot, delta=delta)
+
+    def _emit_locked(self, snapshot: bool, delta: str = ""):
+        now = time.monotonic()
+        self._last_flush = now
+        self.seq += 1
+
+        if self.protocol == PROTOCOL_DELTA:
+            event = "generation_delta"
+            if snapshot:
+                self._last_snapshot = now
+                payload = {"seq": self.seq, "text": "".join(self._parts)}
+            else:
+                payload = {"seq": self.seq, "delta": delta}
+            sent = payload.get("text", delta)
+        else:
+            event = "generation_update"
+            sent = "".join(self._parts)
+            payload = {"chunk": sent}
+
+        self._buffer.append((self.seq, event, payload))
+        metrics.increment("stream_emits_total", protocol=self.protocol)
+        metrics.increment("stream_bytes_total", len(sent), protocol=self.protocol)
+        return asyncio.run_coroutine_threadsafe(self._send(event, payload), self._loop)
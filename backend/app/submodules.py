@@ -5,24 +5,26 @@ APIs to build streaming responses.
 """
 
 import os
-import openai
+import asyncio
 import json 
 import re
 import time
+import threading
 import concurrent.futures
 import numpy as np
 
-from app.rag_utils import get_model_and_indices
+from app import context_packer, fast_path, llm_client, metrics, prefetch, reference_docs, tool_memo
+from app.cancellation import check_cancelled
+from app.rag_utils import ALL_ORGS, get_model_and_indices
 from app.tools import *
 from app.utils import (
     call_chatgpt_api_all_chats,
     stream_process_chatgpt_response,
     get_all_prompts,
 )
-from app.georgia_snap import GEORGIA_SNAP_CONTEXT
+from app.reference_docs import full_reference
 
 # Initialize
-openai.api_key = os.environ.get("SECRET_KEY")
 # NOTE: This eagerly loads embedding models and indices on import which can be
 # expensive; consider lazy-loading in production to reduce startup time.
 embedding_model, saved_resources, documents_resources, metadata_resources, \
@@ -125,104 +127,154 @@ def deduplicate_resources(resources: list) -> list:
     return unique_lines
 
 
+class StageTimeline:
+    """
+    Start/end offsets of the legacy pipeline's stages.
+
+    Offsets are relative to the timeline's creation, so the log line shows
+    which stages overlapped and which one was on the critical path. Each
+    stage duration is also recorded as `legacy_stage_seconds{stage=...}`.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []  # (stage, start offset, end offset)
+        self._lock = threading.Lock()
+
+    def run(self, stage: str, fn, *args, **kwargs):
+        """Call `fn` and record how long it took as `stage`."""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._record(stage, start, time.perf_counter())
+
+    def mark(self, stage: str):
+        """Record a point in time (e.g. the first streamed chunk)."""
+        now = time.perf_counter()
+        self._record(stage, now, now)
+
+    def _record(self, stage: str, start: float, end: float):
+        with self._lock:
+            self.stages.append((stage, start - self.started, end - self.started))
+        if end > start:
+            metrics.observe("legacy_stage_seconds", end - start, stage=stage)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages, key=lambda entry: entry[1])
+        return ", ".join(
+            f"{stage} {start:.2f}s" if start == end else f"{stage} {start:.2f}-{end:.2f}s"
+            for stage, start, end in stages
+        )
+
+
 def get_questions_resources(
     situation: str,
     all_messages: list,
     organization: str,
     k: int = 5,
+    timeline: StageTimeline = None,
 ) -> tuple:
     """
     Process user situation and generate goals, questions, and resources.
 
-    This reproduces the legacy "old" pipeline behavior.
-    """
-    print(f"[Pipeline] Starting at {time.time()}")
+    This reproduces the legacy "old" pipeline behavior, with each stage
+    started as soon as its inputs are ready rather than in lockstep:
 
-    # Build message lists for parallel processing
-    prompts = ["goal", "followup_question", "resource"]
-    message_lists = []
+    * the goal, follow-up question and resource prompts, and the retrieval
+      on the situation text, all start at once;
+    * resource mentions are searched as soon as the resource prompt returns;
+    * refinement starts once those searches finish, without waiting for the
+      goal and follow-up prompts.
 
-    for prompt_name in prompts:
-        system_msg = internal_prompts[prompt_name].replace(
-            "[Organization]",
-            organization,
-        )
-        messages = (
-            [{"role": "system", "content": system_msg}]
-            + all_messages
-            + [{"role": "user", "content": situation}]
-        )
-        message_lists.append(messages)
-
-    # Parallel API calls
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        responses = list(
-            executor.map(
-                lambda msgs: call_chatgpt_api_all_chats(msgs, stream=False),
-                message_lists,
-            )
+    Args:
+        timeline: Optional `StageTimeline` that records per-stage timings
+    """
+    timeline = timeline or StageTimeline()
+
+    def search(text):
+        return extract_resources(
+            embedding_model,
+            saved_resources,
+            documents_resources,
+            text,
+            {f"resource_{organization}": True},
+            k=k,
         )
 
-    print(f"[Pipeline] Initial responses at {time.time()}")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        # Retrieval on the situation does not depend on any prompt
+        situation_search = executor.submit(timeline.run, "situation_search", search, situation)
 
-    # Extract resource mentions from response
-    pattern = r"\[Resource\](.*?)\[\/Resource\]"
-    resource_mentions = re.findall(
-        pattern,
-        str(responses[2]),
-        flags=re.DOTALL,
-    )
-    resource_mentions.append(situation)
-
-    # Retrieve resources in parallel
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        resource_lists = list(
-            executor.map(
-                lambda text: extract_resources(
-                    embedding_model,
-                    saved_resources,
-                    documents_resources,
-                    text,
-                    {f"resource_{organization}": True},
-                    k=k,
-                ),
-                resource_mentions,
+        prompt_futures = {}
+        for prompt_name in ("goal", "followup_question", "resource"):
+            system_msg = internal_prompts[prompt_name].replace(
+                "[Organization]",
+                organization,
+            )
+            messages = (
+                [{"role": "system", "content": system_msg}]
+                + all_messages
+                + [{"role": "user", "content": situation}]
+            )
+            prompt_futures[prompt_name] = executor.submit(
+                timeline.run, prompt_name, call_chatgpt_api_all_chats, messages,
+                stream=False, cache=f"{prompt_name}:v1",
             )
-        )
 
-    print(f"[Pipeline] Resources retrieved at {time.time()}")
+        # Search resource mentions as soon as the resource prompt is back
+        raw_resource_prompt = prompt_futures["resource"].result()
+        pattern = r"\[Resource\](.*?)\[\/Resource\]"
+        resource_mentions = re.findall(
+            pattern,
+            str(raw_resource_prompt),
+            flags=re.DOTALL,
+        )
+        mention_searches = [
+            executor.submit(timeline.run, "mention_search", search, mention)
+            for mention in resource_mentions
+        ]
+        resource_lists = [future.result() for future in mention_searches]
+        resource_lists.append(situation_search.result())
 
-    # Deduplicate and refine resources
-    unique_resources = deduplicate_resources(resource_lists)
+        # Deduplicate and refine resources
+        unique_resources = deduplicate_resources(resource_lists)
 
-    refined_resources = call_chatgpt_api_all_chats(
-        [
-            {
-                "role": "system",
-                "content": internal_prompts["refine_resources"].format(
-                    organization,
-                    situation,
-                ),
-            },
-            {"role": "user", "content": "\n".join(unique_resources)},
-        ],
-        stream=False,
-    )
+        refined_resources = timeline.run(
+            "refine_resources",
+            call_chatgpt_api_all_chats,
+            [
+                {
+                    "role": "system",
+                    "content": internal_prompts["refine_resources"].format(
+                        organization,
+                        situation,
+                    ),
+                },
+                {"role": "user", "content": "\n".join(unique_resources)},
+            ],
+            stream=False,
+            cache="refine_resources:v1",
+        )
 
-    print(f"[Pipeline] Resources refined at {time.time()}")
+        goals = prompt_futures["goal"].result()
+        questions = prompt_futures["followup_question"].result()
 
     # Build response
     response = "\n".join(
         [
-            f"SMART Goals: {responses[0]}",
-            f"Questions: {responses[1]}",
+            f"SMART Goals: {goals}",
+            f"Questions: {questions}",
             f"Resources (use only these resources):\n{refined_resources}",
         ]
     )
 
     # External resources (legacy behavior: currently empty)
     external_resources = ""
-    raw_resource_prompt = responses[2]
 
     return response, external_resources, raw_resource_prompt
 
@@ -306,10 +358,14 @@ def fetch_goals_and_resources(
     all_messages: list,
     organization: str,
     k: int = 25,
+    timeline: StageTimeline = None,
 ) -> tuple:
     """
     Main entry point for legacy goals and resources pipeline.
 
+    Args:
+        timeline: Optional `StageTimeline` that records per-stage timings
+
     Returns:
         Tuple of (goals, resources, full_response, external_resources, raw_prompt)
     """
@@ -319,10 +375,9 @@ def fetch_goals_and_resources(
         all_messages,
         organization,
         k=k,
+        timeline=timeline,
     )
 
-    print(f"[Pipeline] Questions/resources done at {time.time()}")
-
     # Parse outputs
     goals = parse_goals(full_response)
     resources = parse_resources(full_response, raw_prompt, k=k)
@@ -331,8 +386,6 @@ def fetch_goals_and_resources(
     if external_resources:
         resources.insert(0, external_resources)
 
-    print(f"[Pipeline] Parsing done at {time.time()}")
-
     return goals, resources, full_response, external_resources, raw_prompt
 
 
@@ -344,13 +397,16 @@ def _legacy_construct_response(
     full_response: str,
     external_resources: str,
     raw_prompt: str,
+    timeline: StageTimeline = None,
 ):
     """
     Legacy response generation with streaming.
 
     This is essentially the original `construct_response` implementation.
+    With a `timeline`, the orchestration stages are added to it and the
+    whole pipeline's timings are logged once streaming finishes.
     """
-    print(f"[Response] Starting at {time.time()}")
+    timeline = timeline or StageTimeline()
 
     # For the "old version" path we always use the full copilot orchestration.
     needs_goals = True
@@ -424,7 +480,6 @@ def _legacy_construct_response(
         return
 
     # Full copilot orchestration (main path)
-    print(f"[Response] Full orchestration at {time.time()}")
 
     orchestration_messages = [
         {"role": "system", "content": internal_prompts["orchestration"]},
@@ -436,13 +491,21 @@ def _legacy_construct_response(
         {"role": "user", "content": full_response},
     ]
 
-    print(f"[Response] Streaming orchestration at {time.time()}")
+    timeline.mark("orchestration_request")
     response = call_chatgpt_api_all_chats(
         orchestration_messages,
         stream=True,
         max_tokens=1000,
     )
-    yield from stream_process_chatgpt_response(response)
+    first_chunk = True
+    for chunk in stream_process_chatgpt_response(response):
+        if first_chunk:
+            first_chunk = False
+            timeline.mark("orchestration_first_chunk")
+            metrics.observe("legacy_first_chunk_seconds", timeline.elapsed())
+        yield chunk
+    timeline.mark("orchestration_done")
+    print(f"[Pipeline] Stages: {timeline.summary()}")
 
 
 def construct_response(
@@ -451,152 +514,477 @@ def construct_response(
     model: str,
     organization: str,
     version: str = "new",
+    cancel_token=None,
+    conversation_id: str = None,
 ):
+    """
+    Route to the requested pipeline version and return its chunk generator.
+
+    `cancel_token` is an optional `CancellationToken`; every version checks it
+    between LLM calls, tool calls and streamed chunks and raises
+    `GenerationCancelled` once it is set. `conversation_id` scopes the tool
+    result memo (see `app.tool_memo`).
+    """
     # Route to appropriate version implementation
     print(f"[construct_response] Version received: {version}")  # Add this
     if version == "new":
         # NEW VERSION: Current implementation with all tools
         print("[construct_response] Routing to NEW VERSION")  # Add this
-        return _construct_response_new(situation, all_messages, model, organization)
+        return _construct_response_new(situation, all_messages, model, organization, cancel_token, conversation_id)
     elif version == "old":
         # OLD VERSION: RAG retrieval → inject into prompt → GPT call (no tools)
         print("[construct_response] Routing to OLD VERSION")  # Add this
-        return _construct_response_old(situation, all_messages, model, organization)
+        return _construct_response_old(situation, all_messages, model, organization, cancel_token)
     elif version == "vanilla":
         # VANILLA GPT: Simple prompt → GPT call (no RAG, no tools)
         print("[construct_response] Routing to VANILLA VERSION")  # Add this
-        return _construct_response_vanilla(situation, all_messages, model, organization)
+        return _construct_response_vanilla(situation, all_messages, model, organization, cancel_token)
     else:
         # Default to new version if unknown version
         print("[construct_response] Routing to NEW VERSION (default)")  # Add this
-        return _construct_response_new(situation, all_messages, model, organization)
+        return _construct_response_new(situation, all_messages, model, organization, cancel_token, conversation_id)
 
-def _construct_response_new(
-    situation: str,
-    all_messages: list,
-    model: str,
-    organization: str,
+FORCE_FINAL_ANSWER_PROMPT = (
+    "You have gathered sufficient information. "
+    "Please provide your final comprehensive answer now."
+)
+
+
+def _chat_turn_request(messages: list, tools: list, tool_choice: str, cache_key: str) -> dict:
+    """Request arguments for one streamed tool-loop turn."""
+    # The model comes from the turn's route in `model_router`
+    request = {
+        "messages": messages,
+        "stream": True,
+        # The final chunk then reports prompt and cached-token counts
+        "stream_options": {"include_usage": True},
+    }
+    if tools:
+        request["tools"] = tools
+        request["tool_choice"] = tool_choice
+    if cache_key:
+        request["extra_body"] = {"prompt_cache_key": cache_key}
+    return request
+
+
+def _turn_route(tools: list, tool_choice: str) -> str:
+    """Model route for a tool-loop turn: `planning` while tools may be called, else `final_answer`."""
+    return "planning" if tools and tool_choice != "none" else "final_answer"
+
+
+def _record_usage(usage, timing: dict = None):
+    """Record the prompt tokens of one turn and how many came from the prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) or 0
+    metrics.increment("llm_prompt_tokens_total", usage.prompt_tokens)
+    metrics.increment("llm_cached_prompt_tokens_total", cached)
+    if timing is not None:
+        timing["prompt_tokens"] = timing.get("prompt_tokens", 0) + usage.prompt_tokens
+        timing["cached_tokens"] = timing.get("cached_tokens", 0) + cached
+
+
+def _log_tool_loop_usage(timing: dict):
+    """Log and record the request's prompt-cache hit ratio."""
+    prompt_tokens = timing.get("prompt_tokens")
+    if not prompt_tokens:
+        return
+    ratio = timing["cached_tokens"] / prompt_tokens
+    metrics.observe("prompt_cache_hit_ratio", ratio)
+    print(f"[Tool Loop] {timing['cached_tokens']}/{prompt_tokens} prompt tokens served from cache ({ratio:.0%})")
+
+
+def _stream_chat_turn(
+    messages: list,
+    tools: list = None,
+    timing: dict = None,
+    cancel_token=None,
+    tool_choice: str = "auto",
+    cache_key: str = None,
 ):
-    print("Organization", organization)
+    """
+    Run one streamed chat completion turn of the tool loop.
+
+    Content deltas are yielded as `data:` chunks as soon as they arrive, while
+    tool-call deltas are assembled by index into complete tool calls.
+
+    Args:
+        messages: Conversation so far, including prior tool outputs
+        tools: Tool schemas offered to the model (None for a forced answer)
+        timing: Dict with a "first_token" slot, filled on the first content
+            delta; prompt and cached-token counts are added to it
+        cancel_token: Optional CancellationToken; the stream is closed when set
+        tool_choice: "auto", or "none" to force an answer while keeping the
+            tool schemas (and so the cached prompt prefix) unchanged
+        cache_key: Prompt-cache routing key shared by requests with the same prefix
+
+    Returns:
+        Tuple of (assistant message dict, finish reason)
+    """
+    request = _chat_turn_request(messages, tools, tool_choice, cache_key)
+
+    check_cancelled(cancel_token, llm_calls_saved=1)
+    response = llm_client.create(_turn_route(tools, tool_choice), **request)
+
+    content_parts = []
+    tool_calls = {}
+    finish_reason = None
+
+    for event in response:
+        if cancel_token is not None and cancel_token.cancelled:
+            # Closing the stream stops the provider from generating further
+            response.close()
+            check_cancelled(cancel_token)
+        if event.usage is not None:
+            _record_usage(event.usage, timing)
+        if not event.choices:
+            continue
+        choice = event.choices[0]
+        delta = choice.delta
+
+        if delta.content:
+            if timing is not None and timing["first_token"] is None:
+                timing["first_token"] = time.perf_counter()
+            content_parts.append(delta.content)
+            yield f"data: {delta.content.replace(chr(10), '<br/>')}\n\n"
+
+        for tool_delta in delta.tool_calls or []:
+            entry = tool_calls.setdefault(
+                tool_delta.index,
+                {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+            )
+            if tool_delta.id:
+                entry["id"] = tool_delta.id
+            if tool_delta.function is not None:
+                if tool_delta.function.name:
+                    entry["function"]["name"] += tool_delta.function.name
+                if tool_delta.function.arguments:
+                    entry["function"]["arguments"] += tool_delta.function.arguments
+
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+
+    assistant_message = {"role": "assistant", "content": "".join(content_parts) or None}
+    if tool_calls:
+        assistant_message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+
+    return assistant_message, finish_reason
+
 
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "resources_tool",
-                "description": (
-                    "Find nearby local resources such as food banks, shelters, or clinics. "
-                    "Use the location parameter to find resources near a specific place."
-                ),
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "What to search for (e.g., 'food banks', 'legal aid')"
-                        },
-                        "location": {
-                            "type": "string",
-                            "description": "Where to search near. Can be city name, zip code, or address (e.g., 'Vineland', '07102', 'Newark, NJ'). Optional - omit for statewide results."
-                        },
-                        "k": {
-                            "type": "integer", 
-                            "default": 5,
-                            "description": "Number of results to return"
-                        }
+# ============================================================================
+# Tool execution
+# ============================================================================
+
+# Max tool calls from a single assistant turn that run at the same time
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", 4))
+
+# Per-tool wall-clock limits in seconds; a timed-out tool returns an error
+# string to the model instead of stalling the whole turn.
+DEFAULT_TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT_SECONDS", 20))
+TOOL_TIMEOUTS = {
+    "resources_tool": 25.0,  # may geocode (Nominatim is rate limited to 1 req/s)
+    "library_tool": 10.0,
+    "directions_tool": 15.0,
+    "calculator_tool": 2.0,
+    "web_search_tool": 15.0,
+    "check_eligibility": 2.0,
+}
+
+# Shared across sessions so total tool threads stay bounded
+_TOOL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get("TOOL_EXECUTOR_WORKERS", 16)),
+    thread_name_prefix="tool",
+)
+
+
+def _execute_tool_call(name: str, args: dict, organization: str) -> str:
+    """Dispatch a single tool call by name and return its text output."""
+    print(f"[DEBUG] Executing {name} with {args}")
+    started = time.perf_counter()
+
+    if name == "resources_tool":
+        output = resources_tool(
+            query=args.get("query", ""),
+            organization=organization,
+            location=args.get("location"),
+            k=args.get("k", 5),
+            saved_indices=saved_resources,
+            documents=documents_resources,
+            metadata=metadata_resources,
+            geo_trees=geo_trees,
+            geo_indices=geo_indices,
+            embedding_model=embedding_model
+        )
+
+    elif name == "library_tool":
+        output = library_tool(
+            query=args.get("query", ""),
+            category=args.get("category", "peer"),
+            saved_indices_peer=saved_articles,
+            documents_peer=documents_articles,
+            embedding_model=embedding_model
+        )
+
+    elif name == "directions_tool":
+        output = directions_tool(
+            origin=args.get("origin", ""),
+            destination=args.get("destination", ""),
+            mode=args.get("mode", "driving")
+        )
+
+    elif name == "calculator_tool":
+        output = calculator_tool(
+            expression=args.get("expression", "0")
+        )
+
+    elif name == "web_search_tool":
+        output = web_search_tool(
+            query=args.get("query", "")
+        )
+
+    elif name == "check_eligibility":
+        output = check_eligibility(
+            program=args.get("program", ""),
+            household_size=args.get("household_size", 1),
+            monthly_income=args.get("monthly_income", 0),
+            location=args.get("location")
+        )
+
+    else:
+        output = "Error: Unknown tool."
+
+    metrics.observe("tool_seconds", time.perf_counter() - started, tool=name)
+    return output
+
+
+def _start_prefetch(situation: str, organization: str):
+    """Start speculative resource/library searches on the user message."""
+    return prefetch.start_speculative_retrieval(
+        situation,
+        organization,
+        _execute_tool_call,
+        lambda text: embedding_model.encode(text, convert_to_numpy=True),
+    )
+
+
+def _run_tool_calls(tool_calls: list, organization: str, cancel_token=None, memo=None, speculation=None) -> list:
+    """
+    Execute all tool calls from one assistant turn concurrently.
+
+    At most `TOOL_CONCURRENCY` calls run at once and each is bounded by its
+    entry in `TOOL_TIMEOUTS`, so the turn takes roughly as long as its slowest
+    tool rather than the sum of all of them.
+
+    Args:
+        tool_calls: Assembled tool calls from the assistant message
+        organization: Organization key used to scope resource searches
+        cancel_token: Optional CancellationToken; unstarted calls are skipped
+        memo: Optional `ToolMemo`; calls it already answered are not re-run
+        speculation: Optional `SpeculativeRetrieval` whose warm searches
+            answer similar resource/library calls
+
+    Returns:
+        List of output strings in the same order as `tool_calls`
+    """
+    started = time.perf_counter()
+    outputs = [None] * len(tool_calls)
+    waiting = list(enumerate(tool_calls))
+    running = {}  # future -> (index, name, args, submitted_at, deadline)
+
+    while waiting or running:
+        # Stop launching tools once the generation is cancelled
+        check_cancelled(cancel_token, tool_calls_saved=len(waiting))
+
+        # Top up the window of running calls
+        while waiting and len(running) < TOOL_CONCURRENCY:
+            index, tool_call = waiting.pop(0)
+            name = tool_call["function"]["name"]
+            try:
+                args = json.loads(tool_call["function"]["arguments"] or "{}")
+            except json.JSONDecodeError:
+                outputs[index] = f"Error: Invalid arguments for {name}."
+                continue
+            cached = memo.get(name, args, organization) if memo is not None else None
+            if cached is not None:
+                outputs[index] = cached
+                continue
+            future = speculation.claim(name, args) if speculation is not None else None
+            if future is None:
+                future = _TOOL_EXECUTOR.submit(_execute_tool_call, name, args, organization)
+            timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+            now = time.monotonic()
+            running[future] = (index, name, args, now, now + timeout)
+
+        if not running:
+            continue
+
+        next_deadline = min(entry[-1] for entry in running.values())
+        done, _ = concurrent.futures.wait(
+            running,
+            timeout=max(0.0, next_deadline - time.monotonic()),
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+
+        for future in done:
+            index, name, args, submitted_at, _ = running.pop(future)
+            try:
+                outputs[index] = future.result()
+                if memo is not None:
+                    memo.put(name, args, organization, outputs[index], time.monotonic() - submitted_at)
+            except Exception as e:
+                print(f"[Tool Error] {name}: {e}")
+                outputs[index] = f"Error: {name} failed: {e}"
+
+        # Give up on calls past their deadline (the thread finishes on its own)
+        now = time.monotonic()
+        for future, (index, name, _, _, deadline) in list(running.items()):
+            if deadline <= now:
+                running.pop(future)
+                future.cancel()
+                print(f"[Tool Timeout] {name} exceeded {TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)}s")
+                metrics.increment("tool_timeouts_total", tool=name)
+                outputs[index] = f"Error: {name} timed out. Try again or use another tool."
+
+    metrics.observe("tool_turn_seconds", time.perf_counter() - started)
+    return outputs
+
+
+# Tool schemas and per-organization system prompts are built once, so every
+# tool-loop request starts with a byte-identical prefix (tools, then system
+# prompt) and can reuse the provider's prompt cache. Anything that varies per
+# request (summaries, history, the user message, tool outputs) comes after.
+TOOL_SCHEMAS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "resources_tool",
+            "description": (
+                "Find nearby local resources such as food banks, shelters, or clinics. "
+                "Use the location parameter to find resources near a specific place."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "What to search for (e.g., 'food banks', 'legal aid')"
                     },
-                    "required": ["query"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "library_tool",
-                "description": "Search deep-dive documents for peer support, crisis, or trans-related topics.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string"},
-                        "category": {
-                            "type": "string",
-                            "enum": ["trans", "crisis", "peer"]
-                        }
+                    "location": {
+                        "type": "string",
+                        "description": "Where to search near. Can be city name, zip code, or address (e.g., 'Vineland', '07102', 'Newark, NJ'). Optional - omit for statewide results."
                     },
-                    "required": ["query", "category"]
-                }
+                    "k": {
+                        "type": "integer", 
+                        "default": 5,
+                        "description": "Number of results to return"
+                    }
+                },
+                "required": ["query"]
             }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "directions_tool",
-                "description": "Get distance and travel time between two locations.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "origin": {"type": "string"},
-                        "destination": {"type": "string"},
-                        "mode": {
-                            "type": "string",
-                            "enum": ["driving", "transit", "walking", "bicycling"]
-                        }
-                    },
-                    "required": ["origin", "destination", "mode"]
-                }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "library_tool",
+            "description": "Search deep-dive documents for peer support, crisis, or trans-related topics.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"},
+                    "category": {
+                        "type": "string",
+                        "enum": ["trans", "crisis", "peer"]
+                    }
+                },
+                "required": ["query", "category"]
             }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "calculator_tool",
-                "description": "Perform basic math calculations.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "expression": {"type": "string"}
-                    },
-                    "required": ["expression"]
-                }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "directions_tool",
+            "description": "Get distance and travel time between two locations.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "origin": {"type": "string"},
+                    "destination": {"type": "string"},
+                    "mode": {
+                        "type": "string",
+                        "enum": ["driving", "transit", "walking", "bicycling"]
+                    }
+                },
+                "required": ["origin", "destination", "mode"]
             }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "web_search_tool",
-                "description": (
-                    "Search the internet for nearby local services, addresses, hours, "
-                    "or other information when internal resources are insufficient or unclear."
-                ),
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string"}
-                    },
-                    "required": ["query"]
-                }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "calculator_tool",
+            "description": "Perform basic math calculations.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "expression": {"type": "string"}
+                },
+                "required": ["expression"]
             }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "check_eligibility",
-                "description": "Check eligibility for benefits: SNAP, TANF, Medicaid, SSDI (SGA), SSI, or Section 8",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "program": {"type": "string", "enum": ["snap", "tanf", "medicaid", "ssdi", "ssi", "section 8"]},
-                        "household_size": {"type": "integer"},
-                        "monthly_income": {"type": "number"},
-                        "location": {"type": "string", "description": "City, zip code, or county in NJ. Required for Section 8 to determine correct AMI limits. If not provided for Section 8, ask the user for their location first."}
-                    },
-                    "required": ["program", "household_size", "monthly_income"]
-                }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "web_search_tool",
+            "description": (
+                "Search the internet for nearby local services, addresses, hours, "
+                "or other information when internal resources are insufficient or unclear."
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string"}
+                },
+                "required": ["query"]
             }
-        },
-    ]
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_eligibility",
+            "description": "Check eligibility for benefits: SNAP, TANF, Medicaid, SSDI (SGA), SSI, or Section 8",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "program": {"type": "string", "enum": ["snap", "tanf", "medicaid", "ssdi", "ssi", "section 8"]},
+                    "household_size": {"type": "integer"},
+                    "monthly_income": {"type": "number"},
+                    "location": {"type": "string", "description": "City, zip code, or county in NJ. Required for Section 8 to determine correct AMI limits. If not provided for Section 8, ask the user for their location first."}
+                },
+                "required": ["program", "household_size", "monthly_income"]
+            }
+        }
+    },
+]
+
 
+def _build_system_prompt(organization: str) -> str:
+    """
+    System prompt for an organization.
+
+    With `REFERENCE_INJECTION=full` it also carries the organization's whole
+    reference document; otherwise the relevant sections are added per
+    request by `_build_tool_loop_request`.
+    """
     if organization == "georgia":
+        if reference_docs.REFERENCE_INJECTION == "full":
+            reference = "Here is some information on SNAP programs in Georgia {}".format(
+                full_reference("georgia")
+            )
+        else:
+            reference = "The most relevant sections of a Georgia SNAP reference are included with each question."
         system_prompt = """
         You are PeerCoPilot, a supportive AI assistant for people living in Georgia.
         Your goal is to assist them with filling out and filing SNAP applications, along with finding local food resources. 
@@ -605,8 +993,8 @@ def _construct_response_new(
         - You may call multiple tools in sequence.
         - Do not answer from general knowledge alone when local resources are requested.
 
-        Here is some information on SNAP programs in Georgia {}
-        """.format(GEORGIA_SNAP_CONTEXT)
+        {}
+        """.format(reference)
     else:
         system_prompt = f"""
         You are PeerCoPilot, a supportive AI assistant for peer providers at {organization}.
@@ -618,16 +1006,81 @@ def _construct_response_new(
         - You may call multiple tools in sequence.
         - Do not answer from general knowledge alone when local resources are requested.
         """
+    return system_prompt
 
-    messages = [{"role": "system", "content": system_prompt}]
+
+SYSTEM_PROMPTS = {org: _build_system_prompt(org) for org in ALL_ORGS}
+
+
+def system_prompt_for(organization: str) -> str:
+    """Frozen system prompt for an organization (built on first use if unknown)."""
+    prompt = SYSTEM_PROMPTS.get(organization)
+    if prompt is None:
+        prompt = SYSTEM_PROMPTS[organization] = _build_system_prompt(organization)
+    return prompt
+
+
+def _build_tool_loop_request(situation: str, all_messages: list, organization: str) -> tuple:
+    """
+    Build the initial messages and tool schemas for the tool loop.
+
+    Shared by the threaded and asyncio implementations of the new version.
+
+    Returns:
+        Tuple of (messages, tools)
+    """
+    messages = [{"role": "system", "content": system_prompt_for(organization)}]
     messages += all_messages
+    # Reference sections for this question go after the history, so the
+    # system prompt and earlier turns stay a cacheable prefix
+    reference = reference_docs.reference_message(
+        organization,
+        situation,
+        lambda texts: embedding_model.encode(texts, convert_to_numpy=True),
+    )
+    if reference is not None:
+        messages.append(reference)
     messages.append({"role": "user", "content": situation})
 
+    return messages, TOOL_SCHEMAS
+
+
+def _construct_response_new(
+    situation: str,
+    all_messages: list,
+    model: str,
+    organization: str,
+    cancel_token=None,
+    conversation_id: str = None,
+):
+    print("Organization", organization)
+    # Well-formed eligibility and arithmetic questions skip the model entirely
+    fast_answer = fast_path.answer(situation, organization)
+    if fast_answer is not None:
+        yield from fast_answer
+        return
+    memo = tool_memo.memo_for(conversation_id)
+
+    messages, tools = _build_tool_loop_request(situation, all_messages, organization)
+    # Warm the likely searches while the first turn decides what to call
+    speculation = _start_prefetch(situation, organization)
+    packer = context_packer.ContextPacker(conversation_id, len(all_messages))
+    try:
+        yield from _tool_loop(messages, tools, organization, cancel_token, memo, speculation, packer)
+    finally:
+        if speculation is not None:
+            speculation.finish()
+
+
+def _tool_loop(messages, tools, organization, cancel_token, memo, speculation, packer):
+    """Stream model turns, running requested tools between them, until a final answer."""
     # ---- TOOL LOOP ----
     MAX_TOOL_CALLS = 100  # Safety limit (buffer before OpenAI's 128 limit)
     MAX_ITERATIONS = 25   # Max loop iterations to prevent runaway loops
     total_tool_calls = 0
     iteration_count = 0
+    timing = {"start": time.perf_counter(), "first_token": None}
+    cache_key = f"tool-loop-{organization}"
     
     while True:
         iteration_count += 1
@@ -635,115 +1088,67 @@ def _construct_response_new(
         # Safety check: prevent infinite loops
         if iteration_count > MAX_ITERATIONS:
             # Silently force final response - no user notification
-            response = openai.chat.completions.create(
-                model="gpt-5.2",
-                messages=messages + [{"role": "user", "content": "You have gathered sufficient information. Please provide your final comprehensive answer now."}],
-                stream=True
+            yield from _stream_chat_turn(
+                packer.pack(messages + [{"role": "user", "content": FORCE_FINAL_ANSWER_PROMPT}]),
+                tools=tools,
+                timing=timing,
+                cancel_token=cancel_token,
+                tool_choice="none",
+                cache_key=cache_key,
             )
-            for event in response:
-                if event.choices[0].delta.content:
-                    yield f"data: {event.choices[0].delta.content.replace(chr(10), '<br/>')}\n\n"
             break
         
-        response = openai.chat.completions.create(
-            model="gpt-5.2",
-            messages=messages,
+        # Every turn streams: content deltas go straight to the client while
+        # tool-call deltas are assembled until the turn finishes.
+        assistant_message, finish_reason = yield from _stream_chat_turn(
+            packer.pack(messages),
             tools=tools,
-            tool_choice="auto"
+            timing=timing,
+            cancel_token=cancel_token,
+            cache_key=cache_key,
         )
 
-        choice = response.choices[0]
-
         # FINAL ANSWER (no more tools)
-        if choice.finish_reason != "tool_calls":
-            final_text = choice.message.content or ""
-            for chunk in final_text.split("\n"):
-                yield f"data: {chunk}<br/>\n\n"
+        if finish_reason != "tool_calls" or not assistant_message.get("tool_calls"):
             break
 
         # Check tool call count before processing
-        num_tool_calls = len(choice.message.tool_calls) if choice.message.tool_calls else 0
+        num_tool_calls = len(assistant_message["tool_calls"])
         total_tool_calls += num_tool_calls
         
         # Safety check: prevent exceeding OpenAI's limit
         if total_tool_calls >= MAX_TOOL_CALLS:
             # Silently force final response - no user notification
-            response = openai.chat.completions.create(
-                model="gpt-5.2",
-                messages=messages + [{"role": "user", "content": "You have gathered sufficient information. Please provide your final comprehensive answer now."}],
-                stream=True
+            yield from _stream_chat_turn(
+                packer.pack(messages + [{"role": "user", "content": FORCE_FINAL_ANSWER_PROMPT}]),
+                tools=tools,
+                timing=timing,
+                cancel_token=cancel_token,
+                tool_choice="none",
+                cache_key=cache_key,
             )
-            for event in response:
-                if event.choices[0].delta.content:
-                    yield f"data: {event.choices[0].delta.content.replace(chr(10), '<br/>')}\n\n"
             break
 
         # ASSISTANT REQUESTED TOOLS
-        messages.append(choice.message)
-
-        for tool_call in choice.message.tool_calls:
-            name = tool_call.function.name
-            args = json.loads(tool_call.function.arguments)
-
-            print(f"[DEBUG] Executing {name} with {args}")
-
-            if name == "resources_tool":
-                output = resources_tool(
-                    query=args.get("query", ""),
-                    organization=organization,
-                    location=args.get("location"),
-                    k=args.get("k", 5),
-                    saved_indices=saved_resources,
-                    documents=documents_resources,
-                    metadata=metadata_resources,
-                    geo_trees=geo_trees,
-                    geo_indices=geo_indices,
-                    embedding_model=embedding_model
-                )
-
-            elif name == "library_tool":
-                output = library_tool(
-                    query=args.get("query", ""),
-                    category=args.get("category", "peer"),
-                    saved_indices_peer=saved_articles,
-                    documents_peer=documents_articles,
-                    embedding_model=embedding_model
-                )
-
-            elif name == "directions_tool":
-                output = directions_tool(
-                    origin=args.get("origin", ""),
-                    destination=args.get("destination", ""),
-                    mode=args.get("mode", "driving")
-                )
-
-            elif name == "calculator_tool":
-                output = calculator_tool(
-                    expression=args.get("expression", "0")
-                )
-
-            elif name == "web_search_tool":
-                output = web_search_tool(
-                    query=args.get("query", "")
-                )
-
-            elif name == "check_eligibility":
-                output = check_eligibility(
-                    program=args.get("program", ""),
-                    household_size=args.get("household_size", 1),
-                    monthly_income=args.get("monthly_income", 0),
-                    location=args.get("location")
-                )
-
-            else:
-                output = "Error: Unknown tool."
+        messages.append(assistant_message)
+
+        # Tools in one turn run concurrently; outputs keep the call order
+        outputs = _run_tool_calls(
+            assistant_message["tool_calls"], organization, cancel_token, memo, speculation
+        )
 
+        for tool_call, output in zip(assistant_message["tool_calls"], outputs):
             messages.append({
                 "role": "tool",
-                "tool_call_id": tool_call.id,
+                "tool_call_id": tool_call["id"],
                 "content": output
             })
 
+    if timing["first_token"] is not None:
+        print(f"[Tool Loop] First token after {timing['first_token'] - timing['start']:.2f}s "
+              f"({iteration_count} iterations, {total_tool_calls} tool calls)")
+    _log_tool_loop_usage(timing)
+
     yield "[DONE]\n\n"
 
 def _construct_response_old(
@@ -751,6 +1156,7 @@ def _construct_response_old(
     all_messages: list,
     model: str,
     organization: str,
+    cancel_token=None,
 ):
     """
     Old version: recreate the legacy goals/questions/resources pipeline
@@ -758,30 +1164,50 @@ def _construct_response_old(
     """
     # 1) Run the legacy questions/resources pipeline
     #    This uses internal prompts, RAG over resources, and refinement.
+    timeline = StageTimeline()
     goals, resources, full_response, external_resources, raw_prompt = fetch_goals_and_resources(
         situation=situation,
         all_messages=all_messages,
         organization=organization,
         k=25,
+        timeline=timeline,
     )
 
+    # Skip the orchestration call if the user left while the pipeline ran
+    check_cancelled(cancel_token, llm_calls_saved=1)
+
     # 2) Stream the final response using the legacy orchestration logic.
     #    We explicitly pass model="copilot" to take the full orchestration path.
-    return _legacy_construct_response(
-        situation=situation,
-        all_messages=all_messages,
-        model="copilot",
-        organization=organization,
-        full_response=full_response,
-        external_resources=external_resources,
-        raw_prompt=raw_prompt,
+    return _cancellable(
+        _legacy_construct_response(
+            situation=situation,
+            all_messages=all_messages,
+            model="copilot",
+            organization=organization,
+            full_response=full_response,
+            external_resources=external_resources,
+            raw_prompt=raw_prompt,
+            timeline=timeline,
+        ),
+        cancel_token,
     )
 
+
+def _cancellable(generator, cancel_token):
+    """Stop pulling from a chunk generator once `cancel_token` is set."""
+    try:
+        for chunk in generator:
+            check_cancelled(cancel_token)
+            yield chunk
+    finally:
+        generator.close()
+
 def _construct_response_vanilla(
     situation: str,
     all_messages: list,
     model: str,
     organization: str,
+    cancel_token=None,
 ):
     """Vanilla GPT: Simple prompt → GPT call (no RAG, no tools)."""
     # Build messages with simple system prompt
@@ -794,16 +1220,338 @@ def _construct_response_vanilla(
     messages.append({"role": "user", "content": situation})
     
     # Call GPT without tools, without RAG
-    response = openai.chat.completions.create(
-        model="gpt-5.2",
+    check_cancelled(cancel_token, llm_calls_saved=1)
+    response = llm_client.create(
+        "vanilla",
         messages=messages,
         stream=True
     )
     
     for event in response:
+        if cancel_token is not None and cancel_token.cancelled:
+            response.close()
+            check_cancelled(cancel_token)
         if event.choices[0].delta.content:
             formatted_content = event.choices[0].delta.content.replace("\n", "<br/>")
             yield f"data: {formatted_content}\n\n"
     
     yield "[DONE]\n\n"
 
+
+# ============================================================================
+# Asyncio generation path
+# ============================================================================
+
+# Tools that are pure, cheap arithmetic and can run on the event loop directly
+_INLINE_TOOLS = {"calculator_tool", "check_eligibility"}
+
+
+async def _run_tool_call_async(tool_call: dict, organization: str, memo=None, speculation=None) -> str:
+    """
+    Async adapter around `_execute_tool_call`.
+
+    Blocking work (embedding encodes, FAISS searches, geocoding and HTTP
+    clients) is offloaded to the bounded `_TOOL_EXECUTOR`; trivial tools run
+    inline. Each call is bounded by its entry in `TOOL_TIMEOUTS`, calls
+    already answered in this conversation come from `memo`, and similar
+    resource/library searches are served by `speculation`.
+    """
+    name = tool_call["function"]["name"]
+    try:
+        args = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError:
+        return f"Error: Invalid arguments for {name}."
+
+    cached = memo.get(name, args, organization) if memo is not None else None
+    if cached is not None:
+        return cached
+
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    timeout = TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+    try:
+        speculative = None
+        if speculation is not None and name in speculation.tools:
+            # Comparing queries encodes them, so keep it off the event loop
+            speculative = await loop.run_in_executor(_TOOL_EXECUTOR, speculation.claim, name, args)
+        if speculative is not None:
+            output = await asyncio.wait_for(asyncio.wrap_future(speculative), timeout=timeout)
+        elif name in _INLINE_TOOLS:
+            output = _execute_tool_call(name, args, organization)
+        else:
+            output = await asyncio.wait_for(
+                loop.run_in_executor(_TOOL_EXECUTOR, _execute_tool_call, name, args, organization),
+                timeout=timeout,
+            )
+        if memo is not None:
+            memo.put(name, args, organization, output, time.perf_counter() - started)
+        return output
+    except asyncio.TimeoutError:
+        print(f"[Tool Timeout] {name} exceeded {timeout}s")
+        metrics.increment("tool_timeouts_total", tool=name)
+        return f"Error: {name} timed out. Try again or use another tool."
+    except Exception as e:
+        print(f"[Tool Error] {name}: {e}")
+        return f"Error: {name} failed: {e}"
+
+
+async def _run_tool_calls_async(
+    tool_calls: list, organization: str, cancel_token=None, memo=None, speculation=None
+) -> list:
+    """Run one turn's tool calls concurrently, capped at `TOOL_CONCURRENCY`."""
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+
+    async def run_one(tool_call):
+        async with semaphore:
+            check_cancelled(cancel_token, tool_calls_saved=1)
+            return await _run_tool_call_async(tool_call, organization, memo, speculation)
+
+    outputs = await asyncio.gather(*(run_one(tool_call) for tool_call in tool_calls))
+    metrics.observe("tool_turn_seconds", time.perf_counter() - started)
+    return list(outputs)
+
+
+async def _stream_chat_turn_async(
+    messages: list,
+    tools: list = None,
+    timing: dict = None,
+    result: dict = None,
+    cancel_token=None,
+    tool_choice: str = "auto",
+    cache_key: str = None,
+):
+    """
+    Async counterpart of `_stream_chat_turn`.
+
+    Async generators cannot return values, so the assembled assistant message
+    and finish reason are stored in `result["message"]` and
+    `result["finish_reason"]`.
+    """
+    request = _chat_turn_request(messages, tools, tool_choice, cache_key)
+
+    check_cancelled(cancel_token, llm_calls_saved=1)
+    response = await llm_client.acreate(_turn_route(tools, tool_choice), **request)
+
+    content_parts = []
+    tool_calls = {}
+    finish_reason = None
+
+    async for event in response:
+        if cancel_token is not None and cancel_token.cancelled:
+            await response.close()
+            check_cancelled(cancel_token)
+        if event.usage is not None:
+            _record_usage(event.usage, timing)
+        if not event.choices:
+            continue
+        choice = event.choices[0]
+        delta = choice.delta
+
+        if delta.content:
+            if timing is not None and timing["first_token"] is None:
+                timing["first_token"] = time.perf_counter()
+            content_parts.append(delta.content)
+            yield f"data: {delta.content.replace(chr(10), '<br/>')}\n\n"
+
+        for tool_delta in delta.tool_calls or []:
+            entry = tool_calls.setdefault(
+                tool_delta.index,
+                {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+            )
+            if tool_delta.id:
+                entry["id"] = tool_delta.id
+            if tool_delta.function is not None:
+                if tool_delta.function.name:
+                    entry["function"]["name"] += tool_delta.function.name
+                if tool_delta.function.arguments:
+                    entry["function"]["arguments"] += tool_delta.function.arguments
+
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+
+    assistant_message = {"role": "assistant", "content": "".join(content_parts) or None}
+    if tool_calls:
+        assistant_message["tool_calls"] = [tool_calls[i] for i in sorted(tool_calls)]
+
+    if result is not None:
+        result["message"] = assistant_message
+        result["finish_reason"] = finish_reason
+
+
+async def _construct_response_new_async(
+    situation: str,
+    all_messages: list,
+    model: str,
+    organization: str,
+    cancel_token=None,
+    conversation_id: str = None,
+):
+    """Asyncio implementation of the tool loop in `_construct_response_new`."""
+    fast_answer = fast_path.answer(situation, organization)
+    if fast_answer is not None:
+        for chunk in fast_answer:
+            yield chunk
+        return
+    memo = tool_memo.memo_for(conversation_id)
+    # Building the request may embed the question for reference retrieval
+    messages, tools = await asyncio.get_running_loop().run_in_executor(
+        _TOOL_EXECUTOR, _build_tool_loop_request, situation, all_messages, organization
+    )
+    speculation = _start_prefetch(situation, organization)
+    packer = context_packer.ContextPacker(conversation_id, len(all_messages))
+    try:
+        async for chunk in _tool_loop_async(
+            messages, tools, organization, cancel_token, memo, speculation, packer
+        ):
+            yield chunk
+    finally:
+        if speculation is not None:
+            speculation.finish()
+
+
+async def _tool_loop_async(messages, tools, organization, cancel_token, memo, speculation, packer):
+    """Asyncio implementation of `_tool_loop`."""
+    MAX_TOOL_CALLS = 100
+    MAX_ITERATIONS = 25
+    total_tool_calls = 0
+    iteration_count = 0
+    timing = {"start": time.perf_counter(), "first_token": None}
+    cache_key = f"tool-loop-{organization}"
+
+    while True:
+        iteration_count += 1
+
+        if iteration_count > MAX_ITERATIONS:
+            async for chunk in _stream_chat_turn_async(
+                packer.pack(messages + [{"role": "user", "content": FORCE_FINAL_ANSWER_PROMPT}]),
+                tools=tools,
+                timing=timing,
+                cancel_token=cancel_token,
+                tool_choice="none",
+                cache_key=cache_key,
+            ):
+                yield chunk
+            break
+
+        turn = {}
+        async for chunk in _stream_chat_turn_async(
+            packer.pack(messages), tools=tools, timing=timing, result=turn,
+            cancel_token=cancel_token, cache_key=cache_key,
+        ):
+            yield chunk
+        assistant_message = turn["message"]
+
+        if turn["finish_reason"] != "tool_calls" or not assistant_message.get("tool_calls"):
+            break
+
+        total_tool_calls += len(assistant_message["tool_calls"])
+
+        if total_tool_calls >= MAX_TOOL_CALLS:
+            async for chunk in _stream_chat_turn_async(
+                packer.pack(messages + [{"role": "user", "content": FORCE_FINAL_ANSWER_PROMPT}]),
+                tools=tools,
+                timing=timing,
+                cancel_token=cancel_token,
+                tool_choice="none",
+                cache_key=cache_key,
+            ):
+                yield chunk
+            break
+
+        messages.append(assistant_message)
+        outputs = await _run_tool_calls_async(
+            assistant_message["tool_calls"], organization, cancel_token, memo, speculation
+        )
+
+        for tool_call, output in zip(assistant_message["tool_calls"], outputs):
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "content": output
+            })
+
+    if timing["first_token"] is not None:
+        print(f"[Tool Loop] First token after {timing['first_token'] - timing['start']:.2f}s "
+              f"({iteration_count} iterations, {total_tool_calls} tool calls)")
+    _log_tool_loop_usage(timing)
+
+    yield "[DONE]\n\n"
+
+
+async def _construct_response_vanilla_async(
+    situation: str,
+    all_messages: list,
+    model: str,
+    organization: str,
+    cancel_token=None,
+):
+    """Asyncio implementation of `_construct_response_vanilla`."""
+    system_prompt = "You are a helpful assistant for CSPNJ peer providers. Answer questions based on your general knowledge."
+    messages = [{"role": "system", "content": system_prompt}]
+    messages += all_messages
+    messages.append({"role": "user", "content": situation})
+
+    # Same route and request as the blocking path
+    check_cancelled(cancel_token, llm_calls_saved=1)
+    response = await llm_client.acreate("vanilla", messages=messages, stream=True)
+
+    async for event in response:
+        if cancel_token is not None and cancel_token.cancelled:
+            await response.close()
+            check_cancelled(cancel_token)
+        if event.choices and event.choices[0].delta.content:
+            formatted_content = event.choices[0].delta.content.replace("\n", "<br/>")
+            yield f"data: {formatted_content}\n\n"
+
+    yield "[DONE]\n\n"
+
+
+async def _iterate_in_executor(make_generator):
+    """
+    Drive a blocking generator from async code without blocking the loop.
+
+    Used for the legacy pipeline, which is built on synchronous helpers;
+    each `next()` runs on the bounded tool executor.
+    """
+    loop = asyncio.get_running_loop()
+    generator = await loop.run_in_executor(_TOOL_EXECUTOR, make_generator)
+    sentinel = object()
+    while True:
+        chunk = await loop.run_in_executor(_TOOL_EXECUTOR, next, generator, sentinel)
+        if chunk is sentinel:
+            break
+        yield chunk
+
+
+async def construct_response_async(
+    situation: str,
+    all_messages: list,
+    model: str,
+    organization: str,
+    version: str = "new",
+    cancel_token=None,
+    conversation_id: str = None,
+):
+    """
+    Asyncio variant of `construct_response`.
+
+    Yields the same `data:` chunks as the threaded path, but LLM calls go
+    through the async OpenAI client so no OS thread is held per request.
+    """
+    print(f"[construct_response_async] Version received: {version}")
+    if version == "old":
+        generator = _iterate_in_executor(
+            lambda: _construct_response_old(situation, all_messages, model, organization, cancel_token)
+        )
+    elif version == "vanilla":
+        generator = _construct_response_vanilla_async(
+            situation, all_messages, model, organization, cancel_token
+        )
+    else:
+        generator = _construct_response_new_async(
+            situation, all_messages, model, organization, cancel_token, conversation_id
+        )
+
+    async for chunk in generator:
+        yield chunk
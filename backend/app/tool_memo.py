@@ -0,0 +1,113 @@
+"""Per-conversation memo of tool results.
+
+Each turn rebuilds the tool-loop messages from the chat history without the
+previous turns' tool outputs. Follow-up questions therefore often re-issue
+the same `resources_tool`, `library_tool`, `directions_tool` or
+`check_eligibility` call. `ToolMemo` remembers each output under the tool
+name plus canonicalized arguments for a per-tool TTL: short where the answer
+can change (directions, web search), long where it cannot within a
+conversation (eligibility rules, library articles).
+"""
+
+import json
+import os
+import re
+import threading
+
+from app import metrics
+from app.cache_utils import TTLCache
+
+# Seconds a memoized output stays valid, per tool; tools not listed are never
+# memoized (calculator_tool is cheaper to run than to look up)
+TOOL_MEMO_TTLS = {
+    "directions_tool": 15 * 60,
+    "web_search_tool": 10 * 60,
+    "resources_tool": 60 * 60,
+    "library_tool": 6 * 3600,
+    "check_eligibility": 24 * 3600,
+}
+
+# Argument defaults applied by `_execute_tool_call`, so an omitted argument
+# and its explicit default share one memo entry
+TOOL_ARG_DEFAULTS = {
+    "resources_tool": {"k": 5},
+    "library_tool": {"category": "peer"},
+    "directions_tool": {"mode": "driving"},
+    "check_eligibility": {"household_size": 1, "monthly_income": 0},
+}
+
+MAX_ENTRIES_PER_CONVERSATION = int(os.environ.get("TOOL_MEMO_MAX_ENTRIES", 128))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _canonical_value(value):
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip().lower()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _canonical_value(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_canonical_value(v) for v in value]
+    return value
+
+
+def canonical_key(name: str, args: dict, organization: str) -> str:
+    """Stable memo key for a tool call: name, organization and normalized args."""
+    merged = {**TOOL_ARG_DEFAULTS.get(name, {}), **(args or {})}
+    canonical = _canonical_value(merged)
+    return json.dumps([name, organization or "", canonical], sort_keys=True, separators=(",", ":"))
+
+
+class ToolMemo:
+    """Tool outputs remembered for one conversation."""
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self._entries = TTLCache(MAX_ENTRIES_PER_CONVERSATION, ttl_seconds=None)
+
+    def get(self, name: str, args: dict, organization: str):
+        """Return the memoized output for this call, or None."""
+        if name not in TOOL_MEMO_TTLS:
+            return None
+        entry = self._entries.get(canonical_key(name, args, organization))
+        if entry is None:
+            metrics.increment("tool_memo_misses_total", tool=name)
+            return None
+        output, seconds = entry
+        metrics.increment("tool_memo_hits_total", tool=name)
+        metrics.increment("tool_memo_seconds_saved_total", seconds, tool=name)
+        print(f"[Tool Memo] Reused {name} output for {self.conversation_id}")
+        return output
+
+    def put(self, name: str, args: dict, organization: str, output: str, seconds: float):
+        """Remember a successful output and how long it took to produce."""
+        if name not in TOOL_MEMO_TTLS or not isinstance(output, str) or output.startswith("Error"):
+            return
+        self._entries.set(
+            canonical_key(name, args, organization),
+            (output, seconds),
+            ttl_seconds=TOOL_MEMO_TTLS[name],
+        )
+
+
+# conversation id -> ToolMemo; idle conversations age out with the longest TTL
+_MEMOS = TTLCache(
+    int(os.environ.get("TOOL_MEMO_MAX_CONVERSATIONS", 1000)),
+    ttl_seconds=max(TOOL_MEMO_TTLS.values()),
+    name="tool_memos",
+)
+_MEMOS_LOCK = threading.Lock()
+
+
+def memo_for(conversation_id: str):
+    """Return the conversation's `ToolMemo`, or None without a conversation id."""
+    if not conversation_id:
+        return None
+    with _MEMOS_LOCK:
+        memo = _MEMOS.get(conversation_id)
+        if memo is None:
+            memo = ToolMemo(conversation_id)
+        _MEMOS.set(conversation_id, memo)
+    return memo
@@ -0,0 +1,120 @@
+"""Fast, rule-based priority triage for incoming chat messages.
+
+`classify_priority` tags each message as "crisis", "urgent" or "routine" so
+the generation scheduler can let safety-related conversations skip the
+queue. It uses phrase patterns with negation and tense checks (no spaCy, no
+LLM) and runs in well under a millisecond for typical chat messages. Routine
+lookups that merely mention a need ("where is the nearest food bank?") stay
+routine; only an unmet need or a present risk is prioritised.
+"""
+
+import re
+import time
+
+from app import metrics
+
+PRIORITY_CRISIS = "crisis"
+PRIORITY_URGENT = "urgent"
+PRIORITY_ROUTINE = "routine"
+
+# Highest priority first
+PRIORITIES = (PRIORITY_CRISIS, PRIORITY_URGENT, PRIORITY_ROUTINE)
+
+# Phrases that indicate risk to someone's safety right now
+CRISIS_PATTERNS = re.compile(
+    r"\b("
+    r"suicid\w*|kill(?:ing)? (?:my|him|her|them)sel(?:f|ves)|end(?:ing)? (?:my|his|her|their) life"
+    r"|(?:want|wants|wanted) to die|better off dead|no reason to live|take (?:my|his|her|their) own life"
+    r"|self[- ]?harm\w*|cut(?:ting)? (?:my|him|her|them)sel(?:f|ves)|hurt(?:ing)? (?:my|him|her|them)sel(?:f|ves)"
+    r"|overdos\w*|od(?:'e?|e)d"
+    r"|(?:being|been|was|is) (?:abused|assaulted|raped|beaten)|domestic violence|sexual assault"
+    r"|(?:threaten\w*|going) to (?:kill|hurt)|homicid\w*"
+    # 988 only as the crisis line, not inside amounts or phone numbers
+    r"|(?:call|text|dial|contact)(?:ed|ing|s)? (?:the )?988|988 (?:lifeline|hotline|crisis)"
+    r")\b"
+)
+
+# Crisis phrases in a sentence with one of these describe history, not the present
+HISTORICAL_MARKERS = re.compile(
+    r"\b(?:history|histories|years? ago|in (?:19|20)\d\d|back in|used to|in the past|previous(?:ly)?"
+    r"|former(?:ly)?|as a (?:teen|teenager|kid|child)|when (?:i|he|she|they|we) (?:was|were))\b"
+)
+
+# Lemmas for basic needs that cannot wait; shared with
+# `generate_outreach.keyword_map["extremely pressing"]`. Triage itself only
+# counts them as part of an unmet need (URGENT_PATTERNS): "food" or
+# "shelter" alone is usually a routine benefit or resource lookup.
+URGENT_KEYWORDS = {"food", "hungry", "unsafe", "shelter"}
+
+_NEED_CUE = (
+    r"(?:no|without|out of|ran out of|run out of|running out of|need|needs|needed|needing|lost (?:our|my|their)"
+    r"|can't afford|cannot afford|can't get|cannot get|don't have|doesn't have|didn't have|haven't had"
+    r"|hasn't had|have nothing|has nothing|nothing)"
+)
+_NEED_OBJECT = (
+    r"(?:food(?!\s+(?:stamps?|banks?|pantr\w*|benefits?|assistance|programs?))|groceries|meals?"
+    r"|shelter(?!\s+(?:list|rules|hours))|(?:a )?place to (?:stay|sleep|live)|somewhere to (?:stay|sleep|live))"
+)
+
+# Unmet basic needs or immediate housing/safety problems happening now
+URGENT_PATTERNS = re.compile(
+    r"\b(?:"
+    + _NEED_CUE + r" (?:\w+ ){0,2}?" + _NEED_OBJECT
+    + r"|hungry|starv\w*|haven't eaten|hasn't eaten|unsafe|not safe (?:at home|here|there)"
+    r"|nowhere to (?:stay|sleep|go|live)|(?:sleeping|sleep|living) (?:outside|in (?:my|our|their|a|the) car|on the streets?)"
+    r"|(?:am|are|is|i'm|im|we're|they're|he's|she's|became|become|becoming|being) (?:now |about to be |going to be )?homeless"
+    r"|(?:getting|being|got|been) evicted|eviction notice|(?:facing|face|faces) eviction|locked out"
+    r"|(?:is|it's|its|this is|having) an? emergency"
+    r")\b"
+)
+
+# Words that negate what follows ("not hungry", "don't need food", "I am not
+# suicidal"). "no" is absent on purpose: "no food" is the urgent case.
+NEGATIONS = {
+    "not", "never", "dont", "don't", "isnt", "isn't", "arent", "aren't", "doesnt", "doesn't",
+    "wasnt", "wasn't", "didnt", "didn't", "denies", "denied", "longer",  # "no longer homeless"
+}
+
+_TOKEN_RE = re.compile(r"[a-z']+")
+_SENTENCE_RE = re.compile(r"[.!?;\n]+")
+
+
+def _negated(prefix: str) -> bool:
+    """Whether the 3 words before a match negate it."""
+    return any(token in NEGATIONS for token in _TOKEN_RE.findall(prefix)[-3:])
+
+
+def _matches(pattern, text: str, skip_historical: bool = False) -> bool:
+    """True if `pattern` matches somewhere that is neither negated nor (optionally) historical."""
+    for sentence in _SENTENCE_RE.split(text):
+        if skip_historical and HISTORICAL_MARKERS.search(sentence):
+            continue
+        for match in pattern.finditer(sentence):
+            if not _negated(sentence[:match.start()]):
+                return True
+    return False
+
+
+def classify_priority(text: str) -> str:
+    """
+    Classify a chat message for generation-queue priority.
+
+    Args:
+        text: Raw user message
+
+    Returns:
+        One of "crisis", "urgent" or "routine"
+    """
+    started = time.perf_counter()
+    lowered = (text or "").lower()
+
+    if _matches(CRISIS_PATTERNS, lowered, skip_historical=True):
+        priority = PRIORITY_CRISIS
+    elif _matches(URGENT_PATTERNS, lowered):
+        priority = PRIORITY_URGENT
+    else:
+        priority = PRIORITY_ROUTINE
+
+    metrics.observe("triage_seconds", time.perf_counter() - started)
+    metrics.increment("triage_total", priority=priority)
+    return priority
@@ -1,10 +1,11 @@
 """Small utility wrappers for PDF handling and OpenAI/ChatGPT access."""
 
-import openai
 import PyPDF2
 from fpdf import FPDF
 from pathlib import Path
 
+from app import llm_client
+
 BASE_DIR = Path(__file__).parent.parent
 
 def write_text_pdf(text,pdf_loc):
@@ -26,7 +27,7 @@ def write_text_pdf(text,pdf_loc):
 
 
 def call_chatgpt_api(system_prompt,prompt,stream=True):
-    """Run ChatGPT with the 4o-mini model for a system prompt
+    """Run ChatGPT with the `quick` model route for a system prompt
     
     Arguments:
         system_prompt: String, what the main system prompt is
@@ -35,8 +36,8 @@ def call_chatgpt_api(system_prompt,prompt,stream=True):
 
     Returns: String, result from ChatGPT"""
 
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini",  
+    response = llm_client.create(
+        "quick",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt}
@@ -51,28 +52,33 @@ def call_chatgpt_api(system_prompt,prompt,stream=True):
         return response.choices[0].message.content
 
 
-def call_chatgpt_api_all_chats(all_chats,stream=True,max_tokens=750,response_format=None):
-    """Run ChatGPT with the 4o-mini model for a system prompt
+def call_chatgpt_api_all_chats(all_chats,stream=True,max_tokens=750,response_format=None,purpose="chat",cache=None):
+    """Run ChatGPT with the model routed for `purpose`
     
     Arguments:
         all_chats: List of dictionaries, 
             each with a role and content field
         stream: Boolean, whether to return a stream response
         max_tokens: Integer, maximum number of tokens from OpenAI
+        purpose: String, model route name (see model_router) and metric label
+        cache: Optional template name and version (e.g. "goal:v1") to serve
+            this non-streaming call from the LLM cache (see llm_cache)
     
     Returns: Either a Stream or String, result from ChatGPT"""
 
     if response_format is not None:
-        response = openai.chat.completions.create(
-            model="gpt-5.2",  
+        response = llm_client.create(
+            purpose,
+            cache=cache,
             messages=all_chats,
             stream=stream,
             # max_tokens=max_tokens,
             response_format=response_format
         )
     else:
-        response = openai.chat.completions.create(
-            model="gpt-5.2",  
+        response = llm_client.create(
+            purpose,
+            cache=cache,
             messages=all_chats,
             stream=stream,
             # max_tokens=max_tokens,
@@ -143,8 +149,8 @@ def call_chatgpt_with_functions(messages, functions, stream=False, max_tokens=75
     Wrapper around OpenAI’s function-calling API.
     Always returns a single ChatCompletion object.
     """
-    response = openai.chat.completions.create(
-        model="gpt-4o-mini", 
+    response = llm_client.create(
+        "functions",
         messages=messages,
         functions=functions,
         function_call="auto",
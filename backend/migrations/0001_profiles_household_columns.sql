@@ -0,0 +1,10 @@
+-- Household size and monthly income on service user profiles, used by the
+-- caseload eligibility screen (/eligibility_screen/) and profile updates.
+-- Both are nullable: unknown values leave the household unscreened.
+--
+-- Apply once per database:
+--     psql "$DATABASE_URL" -f backend/migrations/0001_profiles_household_columns.sql
+
+ALTER TABLE profiles
+    ADD COLUMN IF NOT EXISTS household_size INTEGER,
+    ADD COLUMN IF NOT EXISTS monthly_income NUMERIC;
@@ -0,0 +1,79 @@
+"""Measure single and batch throughput of the eligibility engine.
+
+Generates random households across all programs and Section 8 locations,
+then times:
+
+* `check_eligibility` (the tool: evaluate one household and render its message);
+* `engine.evaluate` one household at a time;
+* `engine.evaluate_many` on the whole batch.
+
+Usage:
+    python scripts/benchmark_eligibility.py --households 1000 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.eligibility import get_engine  # noqa: E402
+
+PROGRAMS = ["snap", "food stamps", "tanf", "medicaid", "ssdi", "ssdi blind", "ssi", "section 8"]
+
+
+def make_households(count, seed=0):
+    rng = random.Random(seed)
+    locations = [None] + list(get_engine().programs["section8"]["locations"]) + ["Paterson, NJ"]
+    return [
+        {
+            "program": rng.choice(PROGRAMS),
+            "household_size": rng.randint(1, 12),
+            "monthly_income": round(rng.uniform(0, 9000), 2),
+            "location": rng.choice(locations),
+        }
+        for _ in range(count)
+    ]
+
+
+def _rate(count, seconds):
+    return f"{count / seconds:>12,.0f}/s  ({seconds * 1e6 / count:.2f} us each)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--households", type=int, nargs="+", default=[1000, 100000])
+    args = parser.parse_args()
+
+    # Imported here: loading app.tools also sets up the geocoding clients
+    from app.tools import check_eligibility
+
+    engine = get_engine()
+    print(f"Rules version {engine.version}")
+    for count in args.households:
+        households = make_households(count)
+
+        started = time.perf_counter()
+        for h in households:
+            check_eligibility(h["program"], h["household_size"], h["monthly_income"], h["location"])
+        tool_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for h in households:
+            engine.evaluate(h["program"], h["household_size"], h["monthly_income"], h["location"])
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        engine.evaluate_many(households)
+        batch_seconds = time.perf_counter() - started
+
+        print(f"\n{count:,} households")
+        print(f"  check_eligibility tool  {_rate(count, tool_seconds)}")
+        print(f"  evaluate (single)       {_rate(count, single_seconds)}")
+        print(f"  evaluate_many (batch)   {_rate(count, batch_seconds)}")
+
+
+if __name__ == "__main__":
+    main()
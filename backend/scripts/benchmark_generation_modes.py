@@ -0,0 +1,231 @@
+"""Compare concurrent-session capacity of the thread and asyncio generation paths.
+
+Drives the real `_background_stream` (GENERATION_MODE=thread: one OS thread
+per request, emits via run_coroutine_threadsafe) and `_async_stream`
+(GENERATION_MODE=async: one task per request, awaited emits), including PHI
+scrubbing, `construct_response` / `construct_response_async`, chunk parsing,
+`TextStream` coalescing and the session store.
+
+Only the edges are stubbed:
+
+* `llm_client.create` / `acreate` return fake streams that wait
+  `--llm-latency` seconds (blocking in `create`, awaited in `acreate`, like
+  the real clients) and then yield `--tokens` chunks `--token-interval` apart;
+* `sio.emit` counts events instead of sending them;
+* database writes (`record_generation`, audit logging) and the sidebar update
+  are no-ops.
+
+Sessions whose answer is the error message are reported as `failed`.
+`peak_threads` is sampled every 10 ms while the sessions run. Importing the
+app loads the embedding model and indices, as the server does on start-up.
+
+Usage:
+    python scripts/benchmark_generation_modes.py --sessions 50 200 1000
+    python scripts/benchmark_generation_modes.py --version new --sessions 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("SESSION_STORE", "memory")
+
+from app import all_endpoints, generation, llm_client  # noqa: E402
+from app.audit_logger import AuditLogger  # noqa: E402
+from app.cancellation import CancellationToken  # noqa: E402
+from app.streaming import TextStream  # noqa: E402
+
+SAMPLE_SECONDS = 0.01
+# Start of the text a generation shows the user when it fails
+FAILURE_PREFIX = "Sorry, something went wrong"
+
+
+def _chunk(content, finish_reason=None):
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=None
+    )
+
+
+def _completion(content=""):
+    message = SimpleNamespace(content=content, tool_calls=None, parsed=None)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None
+    )
+
+
+class _FakeStream:
+    """Blocking stand-in for an OpenAI chat completion stream."""
+
+    def __init__(self, args):
+        self._args = args
+
+    def __iter__(self):
+        time.sleep(self._args.llm_latency)  # HTTP round trip held by this thread
+        for i in range(self._args.tokens):
+            yield _chunk(f"token{i} ")
+            time.sleep(self._args.token_interval)
+        yield _chunk(None, "stop")
+
+    def close(self):
+        pass
+
+
+class _FakeAsyncStream:
+    """Asyncio stand-in for an OpenAI chat completion stream."""
+
+    def __init__(self, args):
+        self._args = args
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._args.llm_latency)
+        for i in range(self._args.tokens):
+            yield _chunk(f"token{i} ")
+            await asyncio.sleep(self._args.token_interval)
+        yield _chunk(None, "stop")
+
+    async def close(self):
+        pass
+
+
+def _stub_edges(args, emitted):
+    """Replace the LLM client, socket emits and persistence with local fakes."""
+    def create(purpose, **request):
+        if request.get("stream"):
+            return _FakeStream(args)
+        time.sleep(args.llm_latency)
+        return _completion()
+
+    async def acreate(purpose, **request):
+        if request.get("stream"):
+            return _FakeAsyncStream(args)
+        await asyncio.sleep(args.llm_latency)
+        return _completion()
+
+    async def emit(event, payload=None, room=None, **kwargs):
+        emitted[event] = emitted.get(event, 0) + 1
+
+    llm_client.create = create
+    llm_client.acreate = acreate
+    all_endpoints.sio.emit = emit
+    AuditLogger.log_gpt_request = staticmethod(lambda **kwargs: None)
+    generation.record_generation = lambda *a, **kw: None
+    all_endpoints.record_generation = lambda *a, **kw: None
+    generation.schedule_update = lambda *a, **kw: None
+    all_endpoints.schedule_update_async = lambda *a, **kw: None
+
+
+def _new_session(loop):
+    """Arguments shared by both stream functions, plus the `ActiveGeneration`."""
+    conversation_id = f"bench-{uuid.uuid4().hex}"
+    generation_id = uuid.uuid4().hex
+    active = all_endpoints.ActiveGeneration(
+        generation_id,
+        f"sid-{generation_id}",
+        CancellationToken(all_endpoints.GENERATION_DEADLINE_SECONDS),
+        TextStream(all_endpoints._room_sender(generation_id), loop),
+    )
+    message = {"role": "user", "content": "What food pantries are open near Trenton tonight?"}
+    all_endpoints.session_store.append(conversation_id, message, hydrate=False)
+    metadata = {"conversation_id": conversation_id, "username": "benchmark"}
+    return active, message, metadata
+
+
+async def _sample_threads(peak, done):
+    while not done.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(SAMPLE_SECONDS)
+
+
+async def run_thread_mode(sessions, args):
+    loop = asyncio.get_running_loop()
+    latencies, failures = [], []
+
+    def run(active, message, metadata):
+        started = time.perf_counter()
+        all_endpoints._background_stream(
+            active.sid, message["content"], [message], args.model, args.organization,
+            loop, metadata, None, args.version, started, active,
+        )
+        latencies.append(time.perf_counter() - started)
+        failures.append(active.stream.text.startswith(FAILURE_PREFIX))
+
+    peak, done = [threading.active_count()], asyncio.Event()
+    sampler = asyncio.create_task(_sample_threads(peak, done))
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=run, args=_new_session(loop), daemon=True)
+        for _ in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        await asyncio.sleep(SAMPLE_SECONDS)
+    wall = time.perf_counter() - started
+    done.set()
+    await sampler
+    return wall, latencies, sum(failures), peak[0]
+
+
+async def run_async_mode(sessions, args):
+    loop = asyncio.get_running_loop()
+    latencies, failures = [], []
+
+    async def run(active, message, metadata):
+        started = time.perf_counter()
+        await all_endpoints._async_stream(
+            active.sid, message["content"], [message], args.model, args.organization,
+            metadata, None, args.version, started, active,
+        )
+        latencies.append(time.perf_counter() - started)
+        failures.append(active.stream.text.startswith(FAILURE_PREFIX))
+
+    peak, done = [threading.active_count()], asyncio.Event()
+    sampler = asyncio.create_task(_sample_threads(peak, done))
+    started = time.perf_counter()
+    await asyncio.gather(*(run(*_new_session(loop)) for _ in range(sessions)))
+    wall = time.perf_counter() - started
+    done.set()
+    await sampler
+    return wall, latencies, sum(failures), peak[0]
+
+
+def _report(mode, sessions, result, emitted):
+    wall, latencies, failed, threads = result
+    p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    mean = statistics.mean(latencies) if latencies else 0.0
+    print(
+        f"{mode:>6} | sessions={sessions:<5} done={len(latencies):<5} failed={failed:<4} wall={wall:6.2f}s "
+        f"mean={mean:6.2f}s p95={p95:6.2f}s peak_threads={threads} "
+        f"complete_events={emitted.get('generation_complete', 0)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--version", choices=["vanilla", "new"], default="vanilla")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--organization", default="cspnj")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    emitted = {}
+    _stub_edges(args, emitted)
+    for sessions in args.sessions:
+        for mode, runner in (("thread", run_thread_mode), ("async", run_async_mode)):
+            emitted.clear()
+            _report(mode, sessions, asyncio.run(runner(sessions, args)), emitted)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare end-to-end tool-loop latency across model route configurations.
+
+Each configuration is a `MODEL_ROUTES` document (see `app.model_router`)
+given as NAME=JSON or NAME=path. Every sample question is answered through
+`_construct_response_new` under each configuration, in rotation. The script
+then reports time to first answer chunk, total time, and LLM calls per route.
+It calls the real endpoints, so it costs tokens.
+
+Usage:
+    python scripts/benchmark_model_routes.py --org cspnj --repeat 3
+    python scripts/benchmark_model_routes.py \\
+        --config 'baseline={}' \\
+        --config 'fast-planning={"routes": {"planning": [{"model": "gpt-4o-mini"}]}}'
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import metrics, model_router  # noqa: E402
+from app.submodules import _construct_response_new  # noqa: E402
+
+DEFAULT_CONFIGS = [
+    "baseline={}",
+    'fast-planning={"routes": {"planning": [{"model": "gpt-4o-mini"}]}}',
+]
+
+SAMPLE_QUESTIONS = [
+    "My client just lost their job in Newark and needs food this week. What can they do?",
+    "Is a family of 4 earning $3,100 a month eligible for SNAP in New Jersey?",
+    "Where can someone in Camden get free mental health counseling?",
+    "How would he get from Trenton train station to the Mercer County Board of Social Services by bus?",
+]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_once(question, org):
+    started = time.perf_counter()
+    first_chunk = None
+    for chunk in _construct_response_new(question, [], "new", org):
+        if first_chunk is None and chunk.startswith("data:"):
+            first_chunk = time.perf_counter() - started
+    return first_chunk, time.perf_counter() - started
+
+
+def route_calls(before, after):
+    """LLM calls per route between two metric snapshots."""
+    calls = {}
+    for key, summary in after["summaries"].items():
+        if key.startswith("llm_call_seconds{"):
+            route = key[len("llm_call_seconds{purpose="):-1]
+            count = summary["count"] - before["summaries"].get(key, {}).get("count", 0)
+            if count:
+                calls[route] = count
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", action="append", help="NAME=JSON or NAME=path (repeatable)")
+    parser.add_argument("--org", default="cspnj")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("questions", nargs="*")
+    args = parser.parse_args()
+
+    configs = []
+    for spec in args.config or DEFAULT_CONFIGS:
+        name, _, value = spec.partition("=")
+        configs.append((name, model_router.load_config(value)))
+    questions = args.questions or SAMPLE_QUESTIONS
+
+    results = {name: {"first": [], "total": [], "calls": {}} for name, _ in configs}
+    for _ in range(args.repeat):
+        for question in questions:
+            # Alternate configurations per question so drift affects all equally
+            for name, config in configs:
+                model_router.configure(config)
+                before = metrics.snapshot()
+                first, total = run_once(question, args.org)
+                for route, count in route_calls(before, metrics.snapshot()).items():
+                    results[name]["calls"][route] = results[name]["calls"].get(route, 0) + count
+                if first is not None:
+                    results[name]["first"].append(first)
+                results[name]["total"].append(total)
+                print(f"{name:>16}  first {first or 0:6.2f}s  total {total:6.2f}s  {question[:50]}")
+
+    runs = args.repeat * len(questions)
+    print(f"\n{'config':>16}  {'first p50':>9}  {'first p95':>9}  {'total p50':>9}  {'total p95':>9}  calls/answer")
+    for name, result in results.items():
+        first, total = result["first"] or [0], result["total"]
+        calls = ", ".join(f"{route} {count / runs:.1f}" for route, count in sorted(result["calls"].items()))
+        print(
+            f"{name:>16}  {statistics.median(first):8.2f}s  {_percentile(first, 0.95):8.2f}s  "
+            f"{statistics.median(total):8.2f}s  {_percentile(total, 0.95):8.2f}s  {calls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
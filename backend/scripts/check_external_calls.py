@@ -0,0 +1,137 @@
+"""Check pooling, caching and circuit breaking of the external tool calls.
+
+Starts a local stand-in for the Brave search API and the Google Maps
+directions endpoint, points `web_search_tool` and `directions_tool` at it
+and checks that:
+
+* uncached searches reuse one keep-alive connection;
+* a repeated search (different case and spacing) and a repeated directions
+  request within the 15-minute bucket are served from the cache;
+* after `EXTERNAL_BREAKER_FAILURES` upstream errors the tool answers
+  "unavailable" immediately, without reaching the upstream;
+* after the reset period one trial call closes the circuit again;
+* a hung upstream costs one timeout, not the old 10 s per call.
+
+No real API is contacted.
+
+Usage:
+    python scripts/check_external_calls.py
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+STANDIN_URL = f"http://127.0.0.1:{_server.server_address[1]}"
+
+# Must be set before the app modules read them
+os.environ.update(
+    BRAVE_SEARCH_URL=f"{STANDIN_URL}/search",
+    GOOGLE_MAPS_BASE_URL=STANDIN_URL,
+    BRAVE_API_KEY="standin",
+    GOOGLE_API_KEY="AIzaStandInKey",
+    EXTERNAL_BREAKER_FAILURES="3",
+    EXTERNAL_BREAKER_RESET_SECONDS="2",
+    WEB_SEARCH_TIMEOUT_SECONDS="1",
+)
+
+from app import external_calls  # noqa: E402
+from app.tools import directions_tool, web_search_tool  # noqa: E402
+
+
+class StandIn:
+    mode = "ok"  # ok / error / hang
+    hits = {"search": 0, "directions": 0}
+    connections = set()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        StandIn.connections.add(self.client_address)
+        if self.path.startswith("/search"):
+            StandIn.hits["search"] += 1
+            if StandIn.mode == "error":
+                return self._send(503, {"error": "unavailable"})
+            if StandIn.mode == "hang":
+                time.sleep(3)
+            body = {"web": {"results": [{"title": "Stand-in result", "url": "https://example.org", "description": "ok"}]}}
+        else:
+            StandIn.hits["directions"] += 1
+            step = {"html_instructions": "Head <b>north</b>", "duration": {"text": "5 mins"}, "travel_mode": "DRIVING"}
+            leg = {"duration": {"text": "5 mins"}, "distance": {"text": "1 mi"}, "steps": [step]}
+            body = {"status": "OK", "routes": [{"legs": [leg]}]}
+        self._send(200, body)
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def check(label, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}{'  (' + detail + ')' if detail else ''}")
+    return ok
+
+
+def main():
+    _server.RequestHandlerClass = Handler
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    results = []
+
+    for i in range(5):
+        web_search_tool(f"food pantry near trenton {i}")
+    results.append(check("searches share one connection", len(StandIn.connections) == 1,
+                         f"{len(StandIn.connections)} connections for 5 calls"))
+
+    before = StandIn.hits["search"]
+    web_search_tool("Food Pantry   near Trenton 0")
+    results.append(check("repeated search served from cache", StandIn.hits["search"] == before))
+
+    directions_tool("Trenton, NJ", "Newark, NJ", "transit")
+    directions_tool("trenton, nj", "Newark, NJ", "transit")
+    results.append(check("repeated directions served from cache", StandIn.hits["directions"] == 1))
+
+    StandIn.mode = "error"
+    for i in range(3):
+        web_search_tool(f"failing query {i}")
+    before = StandIn.hits["search"]
+    started = time.perf_counter()
+    answer = web_search_tool("another query")
+    elapsed = time.perf_counter() - started
+    results.append(check("open circuit answers without the upstream",
+                         StandIn.hits["search"] == before and "unavailable" in answer,
+                         f"{elapsed * 1000:.1f} ms: {answer!r}"))
+
+    StandIn.mode = "ok"
+    time.sleep(external_calls.BREAKER_RESET_SECONDS + 0.1)
+    answer = web_search_tool("recovered query")
+    results.append(check("trial call closes the circuit",
+                         external_calls.web_search.breaker.state == "closed" and "Stand-in" in answer))
+
+    StandIn.mode = "hang"
+    started = time.perf_counter()
+    web_search_tool("hanging query")
+    elapsed = time.perf_counter() - started
+    results.append(check("hung upstream bounded by the provider timeout",
+                         elapsed < external_calls.web_search.timeout + 0.5, f"{elapsed:.2f}s"))
+
+    _server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Check the precision of `app.fast_path.answer` on labelled messages.
+
+Each case is a message, an organization and whether the fast path should
+serve it. Messages with a second question, a negated or past eligibility
+decision, extra household members, or an organization the rules file does
+not cover must fall through to the tool loop. Reports precision (served
+messages that should have been served) and recall.
+
+Usage:
+    python scripts/check_fast_path.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ["FAST_PATH_ENABLED"] = "1"
+
+from app import fast_path  # noqa: E402
+
+CASES = [
+    # Self-contained questions the fast path should answer
+    ("is a family of 3 earning $2,000/month eligible for snap?", "cspnj", True),
+    ("Would a household of 4 with $3,100 a month qualify for SNAP?", "cspnj", True),
+    ("is a 2-person household making 24k a year eligible for medicaid", "cspnj", True),
+    ("what's 1450*12", "cspnj", True),
+    ("what is 3*4", "georgia", True),
+    # Organizations the loaded rules do not cover
+    ("is a family of 3 earning $2,000/month eligible for snap in georgia?", "georgia", False),
+    ("is a family of 3 earning $2,000/month eligible for snap?", None, False),
+    # Negated or past decisions
+    ("my client is not eligible for SNAP, family of 4 earning $3000/month, what else can they get?", "cspnj", False),
+    ("they lost SNAP, do they qualify for an appeal? family of 2 earning $1500/month", "cspnj", False),
+    ("family of 3 earning $2,000/month was denied snap, are they eligible?", "cspnj", False),
+    # Second questions
+    ("is a family of 3 earning $2,000/month eligible for SNAP? also what about housing", "cspnj", False),
+    ("is a family of 3 earning $2,000/month eligible for SNAP and where do they apply", "cspnj", False),
+    ("is a family of 3 earning $2,000/month eligible for SNAP? How long does it take?", "cspnj", False),
+    # Household members the size slot does not account for
+    ("is a household of 4 adults with 2 children earning $3000/month eligible for snap?", "cspnj", False),
+    ("family of 3 with a new baby earning $2500/month, eligible for snap?", "cspnj", False),
+    # Missing or ambiguous slots
+    ("is a family earning $2,000/month eligible for snap?", "cspnj", False),
+    ("is a family of 3 eligible for snap and medicaid?", "cspnj", False),
+]
+
+
+def main():
+    served_right = served_wrong = missed = 0
+    for message, organization, expected in CASES:
+        served = fast_path.answer(message, organization) is not None
+        ok = served == expected
+        if served:
+            served_right += ok
+            served_wrong += not ok
+        elif expected:
+            missed += 1
+        label = "serve" if expected else "skip"
+        print(f"{'PASS' if ok else 'FAIL'}  {label:>5}  {organization or '-':>7}  {message!r}")
+
+    served = served_right + served_wrong
+    precision = served_right / served if served else 1.0
+    recall = served_right / (served_right + missed) if served_right + missed else 1.0
+    print(f"\nprecision {precision:.2f} ({served_right}/{served} served correctly), recall {recall:.2f}")
+    sys.exit(0 if not served_wrong and not missed else 1)
+
+
+if __name__ == "__main__":
+    main()
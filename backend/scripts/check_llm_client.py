@@ -0,0 +1,213 @@
+"""Check deadlines, retries and hedging of `app.llm_client` against a fake server.
+
+Starts a local OpenAI-compatible stand-in for `/v1/chat/completions` whose
+responses are scripted per request (ok, an error status, or a slow answer)
+and checks that:
+
+* 5xx and 429 responses are retried and the call succeeds;
+* 400 responses are not retried;
+* retries stop after `LLM_MAX_ATTEMPTS`;
+* a response slower than the read deadline times out and is retried;
+* a streaming call retries opening the stream;
+* with hedging on, a slow first request is beaten by the hedge (blocking
+  and asyncio paths);
+* a routed call fails over from a failing endpoint to a healthy one, and
+  the failing candidate is then benched.
+
+No real API is contacted.
+
+Usage:
+    python scripts/check_llm_client.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+_server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+
+# Must be set before the clients are created
+os.environ.update(
+    OPENAI_BASE_URL=f"http://127.0.0.1:{_server.server_address[1]}/v1",
+    SECRET_KEY="standin",
+    LLM_READ_TIMEOUT_SECONDS="1",
+    LLM_BACKOFF_BASE_SECONDS="0.05",
+    LLM_MAX_ATTEMPTS="3",
+)
+
+import openai  # noqa: E402
+
+from app import llm_client, metrics, model_router  # noqa: E402
+
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+
+class FakeOpenAI:
+    script = []  # behaviours for upcoming requests: "ok", a status code, or ("slow", seconds)
+    requests = 0
+    down_prefix = None  # requests under this path prefix answer 503
+    lock = threading.Lock()
+
+    @classmethod
+    def next(cls):
+        with cls.lock:
+            cls.requests += 1
+            return cls.script.pop(0) if cls.script else "ok"
+
+    @classmethod
+    def reset(cls, *script):
+        with cls.lock:
+            cls.script = list(script)
+            cls.requests = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client timed out or cancelled a losing hedge
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        behaviour = FakeOpenAI.next()
+        if FakeOpenAI.down_prefix and self.path.startswith(FakeOpenAI.down_prefix):
+            behaviour = 503
+        if isinstance(behaviour, tuple):
+            time.sleep(behaviour[1])
+            behaviour = "ok"
+        if behaviour != "ok":
+            return self._send(behaviour, {"error": {"message": f"scripted {behaviour}", "type": "test"}})
+        if body.get("stream"):
+            return self._stream()
+        self._send(200, {
+            "id": "cmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "fake answer"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+        })
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self):
+        events = [
+            {"id": "cmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+             "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            for word in ("fake ", "streamed ", "answer")
+        ]
+        data = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        data = data.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def check(label, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}{'  (' + detail + ')' if detail else ''}")
+    return ok
+
+
+def expect_error(fn):
+    try:
+        fn()
+    except openai.APIError as e:
+        return e
+    return None
+
+
+def main():
+    _server.RequestHandlerClass = Handler
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    results = []
+
+    FakeOpenAI.reset(500, 429, "ok")
+    answer = llm_client.create("check", **REQUEST).choices[0].message.content
+    results.append(check("5xx and 429 are retried", answer == "fake answer" and FakeOpenAI.requests == 3,
+                         f"{FakeOpenAI.requests} requests"))
+
+    FakeOpenAI.reset(400)
+    error = expect_error(lambda: llm_client.create("check", **REQUEST))
+    results.append(check("400 is not retried", error is not None and FakeOpenAI.requests == 1,
+                         f"{FakeOpenAI.requests} requests"))
+
+    FakeOpenAI.reset(503, 503, 503, "ok")
+    error = expect_error(lambda: llm_client.create("check", **REQUEST))
+    results.append(check("retries stop after LLM_MAX_ATTEMPTS", error is not None and FakeOpenAI.requests == 3,
+                         f"{FakeOpenAI.requests} requests"))
+
+    FakeOpenAI.reset(("slow", 2), "ok")
+    started = time.perf_counter()
+    answer = llm_client.create("check", **REQUEST).choices[0].message.content
+    elapsed = time.perf_counter() - started
+    results.append(check("read deadline times out and retries", answer == "fake answer" and elapsed < 1.8,
+                         f"{elapsed:.2f}s, {FakeOpenAI.requests} requests"))
+
+    FakeOpenAI.reset(502, "ok")
+    stream = llm_client.create("check_stream", stream=True, **REQUEST)
+    text = "".join(event.choices[0].delta.content or "" for event in stream if event.choices)
+    results.append(check("opening a stream is retried", text == "fake streamed answer",
+                         f"{FakeOpenAI.requests} requests"))
+
+    llm_client.HEDGE_ENABLED = True
+    llm_client.HEDGE_DEFAULT_SECONDS = 0.2
+    FakeOpenAI.reset(("slow", 0.9), "ok")
+    started = time.perf_counter()
+    llm_client.create("check_hedge", **REQUEST)
+    elapsed = time.perf_counter() - started
+    hedges = metrics.snapshot()["counters"].get("llm_hedges_total{purpose=check_hedge,winner=hedge}", 0)
+    results.append(check("hedge beats a slow first request", elapsed < 0.6 and hedges == 1, f"{elapsed:.2f}s"))
+
+    FakeOpenAI.reset(("slow", 0.9), "ok")
+    started = time.perf_counter()
+    asyncio.run(llm_client.acreate("check_hedge_async", **REQUEST))
+    elapsed = time.perf_counter() - started
+    results.append(check("async hedge beats a slow first request", elapsed < 0.6, f"{elapsed:.2f}s"))
+
+    llm_client.HEDGE_ENABLED = False
+    base_url = os.environ["OPENAI_BASE_URL"].rsplit("/v1", 1)[0]
+    router = model_router.configure({
+        "endpoints": {
+            "east": {"base_url": f"{base_url}/east/v1"},
+            "west": {"base_url": f"{base_url}/west/v1"},
+        },
+        "routes": {"check_route": [{"model": "fake", "endpoint": "east"}, {"model": "fake", "endpoint": "west"}]},
+    })
+    FakeOpenAI.reset()
+    FakeOpenAI.down_prefix = "/east/"
+    answers = [llm_client.create("check_route", messages=REQUEST["messages"]) for _ in range(6)]
+    east = router.routes["check_route"][0]
+    results.append(check("routed calls fail over and bench the failing endpoint",
+                         len(answers) == 6 and not east.healthy(time.monotonic()),
+                         f"{FakeOpenAI.requests} requests for 6 calls"))
+    FakeOpenAI.down_prefix = None
+
+    summaries = metrics.snapshot()["summaries"]
+    attempts = summaries.get("llm_attempts{purpose=check}", {})
+    print(f"\nllm_attempts{{purpose=check}}: mean {attempts.get('mean', 0):.2f}, max {attempts.get('max')}")
+    calls = summaries.get("llm_call_seconds{purpose=check}", {})
+    print(f"llm_call_seconds{{purpose=check}}: p50 {calls.get('p50', 0):.3f}s, p95 {calls.get('p95', 0):.3f}s")
+
+    _server.shutdown()
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
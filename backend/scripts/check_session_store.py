@@ -0,0 +1,93 @@
+"""Check hydrate-on-append and clear for the session store backends.
+
+For each backend, a conversation whose earlier turns exist only in the
+`messages` table (stood in for by a fake loader) must:
+
+* keep those turns when the first new message is appended, without a
+  `get` first (the path after a restart or on another node);
+* not be hydrated when appended with `hydrate=False` (new conversations);
+* give concurrent appends distinct positions (no lost or failed writes);
+* be empty after `clear`.
+
+The memory backend always runs. The Postgres backend runs when `--postgres`
+is given, against `DATABASE_URL`, using throwaway conversation ids in the
+`session_messages` table that are cleared afterwards.
+
+Usage:
+    python scripts/check_session_store.py
+    python scripts/check_session_store.py --postgres
+"""
+
+import argparse
+import concurrent.futures
+import os
+import secrets
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.session_store import MemorySessionStore, PostgresSessionStore  # noqa: E402
+
+EARLIER = [
+    {"role": "user", "content": "earlier question"},
+    {"role": "assistant", "content": "earlier answer"},
+]
+
+
+def check(label, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}{'  (' + detail + ')' if detail else ''}")
+    return ok
+
+
+def run_checks(name, make_store):
+    loads = []
+
+    def loader(conversation_id):
+        loads.append(conversation_id)
+        return list(EARLIER) if conversation_id.startswith("existing") else []
+
+    store = make_store(loader)
+    suffix = secrets.token_hex(4)
+    existing, new, busy = f"existing-{suffix}", f"new-{suffix}", f"existing-busy-{suffix}"
+    results = []
+    try:
+        message = {"role": "user", "content": "new question"}
+        store.append(existing, message)
+        history = store.get(existing)
+        results.append(check(f"{name}: append hydrates an existing conversation",
+                             history == EARLIER + [message], f"{len(history)} messages"))
+
+        store.append(new, message, hydrate=False)
+        results.append(check(f"{name}: append with hydrate=False skips the loader",
+                             store.get(new, hydrate=False) == [message] and new not in loads))
+
+        turns = [{"role": "user", "content": f"turn {i}"} for i in range(20)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda turn: store.append(busy, turn), turns))
+        history = store.get(busy)
+        results.append(check(f"{name}: concurrent appends all land once",
+                             history[:2] == EARLIER and sorted(m["content"] for m in history[2:])
+                             == sorted(t["content"] for t in turns), f"{len(history)} messages"))
+
+        store.clear(existing)
+        results.append(check(f"{name}: clear empties the conversation",
+                             store.get(existing, hydrate=False) == []))
+    finally:
+        for conversation_id in (existing, new, busy):
+            store.clear(conversation_id)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--postgres", action="store_true", help="also check the Postgres backend")
+    args = parser.parse_args()
+
+    results = run_checks("memory", lambda loader: MemorySessionStore(loader=loader))
+    if args.postgres:
+        results += run_checks("postgres", lambda loader: PostgresSessionStore(loader=loader))
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
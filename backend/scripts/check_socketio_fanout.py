@@ -0,0 +1,110 @@
+"""Check that emits reach sockets connected to a different server process.
+
+A "listener" server registers a fake socket in room `fanout-check`. A second
+server emits to that room through the client manager configured by
+SOCKETIO_MESSAGE_QUEUE. The check passes when the listener's socket receives
+the event. With SOCKETIO_MESSAGE_QUEUE=memory both servers run in this
+interpreter (the local stand-in). With redis://... or postgres they run in
+separate processes, which is the real multi-node setup.
+
+Usage:
+    SOCKETIO_MESSAGE_QUEUE=postgres python scripts/check_socketio_fanout.py
+    SOCKETIO_MESSAGE_QUEUE=memory python scripts/check_socketio_fanout.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import socketio  # noqa: E402
+
+from app.socketio_manager import create_client_manager  # noqa: E402
+
+ROOM = "fanout-check"
+EVENT = "generation_delta"
+
+
+async def _start_server():
+    server = socketio.AsyncServer(async_mode="asgi", client_manager=create_client_manager())
+    server.manager_initialized = True
+    server.manager.set_server(server)
+    server.manager.initialize()
+    await asyncio.sleep(0.5)  # let the pub/sub listener subscribe
+    return server
+
+
+async def _listen(received, ready, timeout):
+    server = await _start_server()
+    packets = []
+
+    async def capture(eio_sid, pkt):
+        packets.append(pkt.data)
+
+    server._send_eio_packet = capture
+    sid = await server.manager.connect("fanout-eio", "/")
+    await server.enter_room(sid, ROOM)
+    ready.set()
+
+    deadline = time.monotonic() + timeout
+    while not packets and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    received.extend(packets)
+
+
+async def _emit(seq):
+    server = await _start_server()
+    await server.emit(EVENT, {"seq": seq, "delta": "x" * 20000}, room=ROOM)
+    await asyncio.sleep(0.5)  # let the publish flush
+
+
+def _listener_process(queue, ready, timeout):
+    received = []
+    asyncio.run(_listen(received, ready, timeout))
+    queue.put(received)
+
+
+def _emitter_process(ready):
+    ready.wait(30)
+    asyncio.run(_emit(1))
+
+
+async def _check_in_process(timeout):
+    received, ready = [], asyncio.Event()
+    listener = asyncio.create_task(_listen(received, ready, timeout))
+    await ready.wait()
+    await _emit(1)
+    await listener
+    return received
+
+
+def main():
+    queue_url = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")
+    if not queue_url:
+        sys.exit("Set SOCKETIO_MESSAGE_QUEUE (memory, redis://..., postgres)")
+    timeout = 10
+
+    started = time.perf_counter()
+    if queue_url == "memory":
+        received = asyncio.run(_check_in_process(timeout))
+    else:
+        results, ready = multiprocessing.Queue(), multiprocessing.Event()
+        listener = multiprocessing.Process(target=_listener_process, args=(results, ready, timeout))
+        emitter = multiprocessing.Process(target=_emitter_process, args=(ready,))
+        listener.start()
+        emitter.start()
+        emitter.join()
+        received = results.get(timeout=timeout + 5)
+        listener.join()
+
+    elapsed = time.perf_counter() - started
+    if not received:
+        sys.exit(f"FAIL: nothing delivered across servers via {queue_url} ({elapsed:.1f}s)")
+    print(f"OK: {len(received)} packet(s), {len(received[0])} bytes, delivered via {queue_url} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Check `app.triage.classify_priority` on phrases that are easy to misclassify.
+
+Covers false crisis matches ("odd", amounts containing 988, negated or
+historical mentions), real crisis phrasing ("OD'd", "call 988"), routine
+benefit and resource lookups that mention a need word, and negation
+handling for basic needs ("I have no food" is urgent, "I'm not hungry" is
+routine).
+
+Usage:
+    python scripts/check_triage.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.triage import classify_priority  # noqa: E402
+
+CASES = [
+    # Crisis phrasing
+    ("He OD'd last night and is in the ER", "crisis"),
+    ("my brother overdosed on fentanyl", "crisis"),
+    ("She said she wants to die", "crisis"),
+    ("should I call 988 for her?", "crisis"),
+    ("she texted the 988 lifeline yesterday", "crisis"),
+    # Look-alikes that are not crises
+    ("that seems odd to me", "routine"),
+    ("My rent is $988 a month", "routine"),
+    ("call me at 609-988-1234 about the application", "routine"),
+    ("I am not suicidal", "routine"),
+    ("my client had an overdose history in 2015", "routine"),
+    ("he used to self-harm as a teenager", "routine"),
+    # Negated or past mentions do not hide a present risk in the same message
+    ("I am not suicidal but I want to die", "crisis"),
+    # Routine lookups that mention a need word
+    ("How do I apply for food stamps in Georgia?", "routine"),
+    ("Where is the nearest food bank?", "routine"),
+    ("what shelters are near Trenton", "routine"),
+    ("Can you summarize the emergency assistance program rules?", "routine"),
+    ("what are the eviction laws in NJ?", "routine"),
+    ("I need food stamps info for my client", "routine"),
+    # Unmet basic needs are urgent, including when phrased with "no"
+    ("I have no food for my kids", "urgent"),
+    ("we are without shelter tonight", "urgent"),
+    ("I don't have food at home", "urgent"),
+    ("we are getting evicted friday", "urgent"),
+    ("my client needs shelter tonight", "urgent"),
+    ("they ran out of food yesterday", "urgent"),
+    ("she is homeless and has nowhere to sleep", "urgent"),
+    ("the kids are hungry", "urgent"),
+    # Negated needs are routine
+    ("I'm not hungry, just need help with a resume", "routine"),
+    ("we don't need shelter anymore, thanks", "routine"),
+    ("she is no longer homeless", "routine"),
+]
+
+
+def main():
+    failures = 0
+    for text, expected in CASES:
+        got = classify_priority(text)
+        ok = got == expected
+        failures += not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {expected:>7}  {text!r}{'' if ok else f'  (got {got})'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
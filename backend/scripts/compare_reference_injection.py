@@ -0,0 +1,64 @@
+"""Compare full vs section-level injection of an organization's reference docs.
+
+For each sample question, prints the reference tokens each mode adds to
+every tool-loop call and the sections retrieval picked. No OpenAI calls are
+made. For latency, run the app with REFERENCE_INJECTION=full and =sections
+and compare `generation_ttft_seconds` and `prompt_tokens` on /metrics.
+
+Usage:
+    python scripts/compare_reference_injection.py --org georgia
+    python scripts/compare_reference_injection.py --org georgia "Can I get SNAP as a student?"
+"""
+
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.context_packer import count_tokens  # noqa: E402
+from app.rag_utils import get_embedding_model  # noqa: E402
+from app.reference_docs import REFERENCE_DOCUMENTS, ReferenceIndex, full_reference  # noqa: E402
+
+SAMPLE_QUESTIONS = [
+    "I'm a single mom with two kids making $2,500 a month, do we qualify for food stamps?",
+    "How much SNAP would a household of 4 get each month?",
+    "My client is 62 and disabled, is there a different income limit?",
+    "Does she have to work to keep getting benefits? She's 35 with no kids.",
+    "Can a college student get SNAP in Georgia?",
+    "Where does he apply and how long does it take?",
+    "Can we deduct rent and utilities from income?",
+    "Do savings or a car count against eligibility?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--org", default="georgia", choices=sorted(REFERENCE_DOCUMENTS))
+    parser.add_argument("questions", nargs="*")
+    args = parser.parse_args()
+
+    model = get_embedding_model()
+    index = ReferenceIndex(
+        REFERENCE_DOCUMENTS[args.org],
+        lambda texts: model.encode(texts, convert_to_numpy=True),
+    )
+    full_tokens = count_tokens(full_reference(args.org))
+    print(f"{args.org}: {len(index.sections)} sections, {full_tokens} tokens when injected whole\n")
+
+    section_tokens = []
+    for question in args.questions or SAMPLE_QUESTIONS:
+        sections = index.top_sections(question)
+        tokens = sum(count_tokens(text) for _, text in sections)
+        section_tokens.append(tokens)
+        headings = ", ".join(text.splitlines()[0].lstrip("# ") for _, text in sections)
+        print(f"{tokens:5d} tokens  {question}\n             -> {headings}")
+
+    mean = statistics.mean(section_tokens)
+    print(f"\nMean reference tokens per call: {mean:.0f} (sections) vs {full_tokens} (full), "
+          f"{1 - mean / full_tokens:.0%} fewer")
+
+
+if __name__ == "__main__":
+    main()
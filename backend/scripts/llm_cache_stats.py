@@ -0,0 +1,49 @@
+"""Report (or clear) the content-addressed LLM cache.
+
+Prints stored entries and lifetime hits per template for the cache selected
+by `LLM_CACHE` (see `app.llm_cache`). Per-process hit rates are on /metrics
+as `llm_cache_hit_rate{template}`.
+
+Usage:
+    python scripts/llm_cache_stats.py
+    python scripts/llm_cache_stats.py --clear refine_resources:v1
+    python scripts/llm_cache_stats.py --clear-all
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import llm_cache  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clear", metavar="TEMPLATE", help="drop the entries of one template")
+    parser.add_argument("--clear-all", action="store_true", help="drop every entry")
+    args = parser.parse_args()
+
+    cache = llm_cache.get_cache()
+    if cache is None:
+        print("LLM cache is off (set LLM_CACHE=postgres or sqlite)")
+        return
+    if args.clear_all:
+        cache.clear()
+        print("Cleared all entries")
+    elif args.clear:
+        cache.clear(args.clear)
+        print(f"Cleared {args.clear}")
+
+    stats = cache.stats()
+    if not stats:
+        print("Cache is empty")
+        return
+    print(f"{'template':<28}  {'entries':>8}  {'hits':>8}  {'hits/entry':>10}")
+    for template, row in sorted(stats.items()):
+        print(f"{template:<28}  {row['entries']:>8}  {row['hits']:>8}  {row['hits'] / row['entries']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -77,6 +77,9 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
 
   const inputRef = useRef(null);
   const conversationEndRef = useRef(null);
+  // Id, text and last sequence number of the answer being streamed
+  // (generation_delta); `active` until generation_complete, for resuming
+  const streamRef = useRef({ id: null, seq: 0, text: '', active: false });
 
   const [socket, setSocket] = useState(null);
   const [isGenerating, setIsGenerating] = useState(false);
@@ -106,7 +109,25 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
     const newSocket = io(socketServerUrl, SOCKET_CONFIG);
     setSocket(newSocket);
 
-    newSocket.on('connect', () => console.log('[Socket.io] Connected'));
+    newSocket.on('connect', () => {
+      console.log('[Socket.io] Connected');
+      const stream = streamRef.current;
+      if (stream.active && stream.id) {
+        // Reconnected mid-answer: pick up where we left off on the new socket
+        newSocket.emit('resume_generation', { generation_id: stream.id, last_seq: stream.seq });
+      } else if (stream.active) {
+        // Dropped while still queued; the server discarded the request
+        stream.active = false;
+        setIsGenerating(false);
+      }
+    });
+    newSocket.on('generation_started', (data) => {
+      streamRef.current.id = data.generation_id;
+    });
+    newSocket.on('resume_failed', () => {
+      streamRef.current.active = false;
+      setIsGenerating(false);
+    });
     newSocket.on('conversation_id', (data) => setConversationID(data.conversation_id));
     newSocket.on('welcome', (data) => console.log('[Socket.io] Welcome:', data));
 
@@ -116,7 +137,7 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
           const last = prev[prev.length - 1];
           if (last?.sender === 'bot') {
             const updated = [...prev];
-            updated[updated.length - 1].text = data.chunk;
+            updated[updated.length - 1] = { ...last, text: data.chunk };
             return updated;
           }
           return [...prev, { sender: 'bot', text: data.chunk }];
@@ -124,12 +145,62 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
       }
     });
 
+    newSocket.on('generation_delta', (data) => {
+      const stream = streamRef.current;
+      if (data.seq <= stream.seq) {
+        return; // already applied (e.g. replayed after a reconnect)
+      } else if (typeof data.text === 'string') {
+        // Full snapshot: always authoritative, also resyncs after a missed delta
+        stream.text = data.text;
+      } else if (data.seq === stream.seq + 1) {
+        stream.text += data.delta;
+      } else {
+        return; // out of sequence; the next snapshot will catch us up
+      }
+      stream.seq = data.seq;
+      const text = stream.text;
+      setConversation(prev => {
+        const last = prev[prev.length - 1];
+        if (last?.sender === 'bot') {
+          const updated = [...prev];
+          updated[updated.length - 1] = { ...last, text };
+          return updated;
+        }
+        return [...prev, { sender: 'bot', text }];
+      });
+    });
+
     newSocket.on('goals_update', (data) => {
       setGoals(data.goals);
       setResources(data.resources);
     });
 
-    newSocket.on('generation_complete', () => setIsGenerating(false));
+    const setBotPlaceholder = (text) => {
+      setConversation(prev => {
+        const last = prev[prev.length - 1];
+        if (last?.sender === 'bot') {
+          const updated = [...prev];
+          updated[updated.length - 1] = { ...last, text };
+          return updated;
+        }
+        return [...prev, { sender: 'bot', text }];
+      });
+    };
+
+    newSocket.on('generation_queued', (data) => {
+      setBotPlaceholder(`Waiting for an available assistant (position ${data.position} in line)...`);
+    });
+
+    newSocket.on('generation_rejected', (data) => {
+      setBotPlaceholder(data.message);
+      streamRef.current.active = false;
+      setIsGenerating(false);
+    });
+
+    newSocket.on('generation_complete', () => {
+      streamRef.current.active = false;
+      setIsGenerating(false);
+    });
     newSocket.on('error', (e) => console.error('[Socket.io] Error:', e));
     newSocket.on('disconnect', (r) => console.log('[Socket.io] Disconnected:', r));
 
@@ -198,6 +269,7 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
     setChatConvo(prev => [...prev, { role: 'user', content: messageText }]);
     setInputText('');
     setIsGenerating(true);
+    streamRef.current = { id: null, seq: 0, text: '', active: true };
 
     console.log('[GenericChat] start_generation, service_user_id:', selectedServiceUser);
     socket.emit('start_generation', {
@@ -210,9 +282,14 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
       username: user.username,
       service_user_id: selectedServiceUser || null,
       version,
+      protocol: 'delta',
     });
   }, [inputText, isGenerating, socket, chatConvo, conversationID, organization, user, tool, version, selectedServiceUser, setConversation, setChatConvo, setInputText]);
 
+  const handleStop = useCallback(() => {
+    if (socket && isGenerating) socket.emit('stop_generation', {});
+  }, [socket, isGenerating]);
+
   const handleKeyDown = useCallback((e) => {
     if (e.key === 'Enter' && !e.shiftKey) { e.preventDefault(); handleSubmit(); }
   }, [handleSubmit]);
@@ -237,6 +314,7 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
     if (socket) {
       socket.emit('reset_session', {
         reason: 'service_user_switch',
+        conversation_id: conversationID,
         previous_service_user_id: selectedServiceUser || 'general',
         new_service_user_id: pendingServiceUser || 'general',
       });
@@ -244,7 +322,7 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
     setSelectedServiceUser(pendingServiceUser);
     setPendingServiceUser(null);
     setShowResetWarning(false);
-  }, [socket, selectedServiceUser, pendingServiceUser, setConversation, setChatConvo, setSelectedServiceUser]);
+  }, [socket, conversationID, selectedServiceUser, pendingServiceUser, setConversation, setChatConvo, setSelectedServiceUser]);
 
   const cancelServiceUserSwitch = useCallback(() => {
     setPendingServiceUser(null);
@@ -262,11 +340,12 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
     if (socket) {
       socket.emit('reset_session', {
         reason: 'new_session',
+        conversation_id: conversationID,
         previous_service_user_id: selectedServiceUser || 'general',
         new_service_user_id: selectedServiceUser || 'general',
       });
     }
-  }, [socket, selectedServiceUser, setConversation, setChatConvo]);
+  }, [socket, conversationID, selectedServiceUser, setConversation, setChatConvo]);
 
   const exportChatToPDF = useCallback(() => {
     const doc = new jsPDF(PDF_CONFIG);
@@ -404,7 +483,9 @@ function GenericChat({ context, title, socketServerUrl, showLocation, tool }) {
             placeholder={submitted ? 'Write a follow-up to update...' : "Describe the service user's situation..."}
             value={inputText} onChange={handleInputChange} onKeyDown={handleKeyDown}
             rows={1} style={{ overflow: 'hidden', resize: 'none' }} />
-          <button className="submit-button" onClick={handleSubmit}>➤</button>
+          {isGenerating
+            ? <button className="submit-button" onClick={handleStop} title="Stop generating">■</button>
+            : <button className="submit-button" onClick={handleSubmit}>➤</button>}
         </div>
 
         {showResetWarning && (